@@ -0,0 +1,6 @@
+"""Benchmarks of the hot paths of locations, the chunker and the interpreter (against the in-process FakeClient) on
+synthetic data. Run them with:
+
+    python -m benchmarks --scale 100k --output results.json --compare baseline.json
+"""
+from .suite import BENCHMARKS, benchmark, measure, run, compare, save, load
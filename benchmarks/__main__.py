@@ -0,0 +1,32 @@
+import argparse
+import sys
+from . import data, suite
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Runs the benchmark suite.')
+    parser.add_argument('--scale', default='1k', help='one of {} or a number'.format(', '.join(data.SCALES)))
+    parser.add_argument('--only', nargs='+', choices=sorted(suite.BENCHMARKS), help='the benchmarks to run')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='path of the JSON file to write the results to')
+    parser.add_argument('--compare', help='a previous results file, exits with 1 when there are regressions')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='allowed relative slowdown (default 0.1)')
+    args = parser.parse_args(argv)
+
+    results = suite.run(args.scale, args.only, args.repeat)
+    for name, result in results['results'].items():
+        print('{:40} n={:<9} best={:9.4f}s {:14.0f} ops/s'.format(name, result['n'], result['best'],
+                                                                  result['ops_per_second']))
+    if args.output:
+        suite.save(results, args.output)
+
+    if args.compare:
+        comparison = suite.compare(args.compare, results, args.tolerance)
+        for name, ratio in sorted(comparison['ratios'].items()):
+            print('{:40} {:6.2f}x{}'.format(name, ratio, ' REGRESSION' if name in comparison['regressions'] else ''))
+        return 1 if comparison['regressions'] else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
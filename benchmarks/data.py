@@ -0,0 +1,40 @@
+import numpy as np
+from locations import Origin, Destination, TravelMatrix, import_values
+
+SCALES = {'1k': 1000, '100k': 100000, '1M': 1000000}
+LONDON = (51.507, -0.128)
+
+
+def coordinates(n, seed=0, spread=0.3):
+    """n random (lat, lng) points within about spread degrees of central London."""
+    random = np.random.default_rng(seed)
+    return LONDON[0] + random.uniform(-spread, spread, n), LONDON[1] + random.uniform(-spread, spread, n)
+
+
+def places(n, prefix='address', seed=0):
+    """A dict of n synthetic addresses to (lat, lng), in the format FakeClient expects."""
+    lat, lng = coordinates(n, seed)
+    return {'{} {}'.format(prefix, i): (a, b) for i, (a, b) in enumerate(zip(lat.tolist(), lng.tolist()))}
+
+
+def study(n_origins, n_destinations, matrix=None, seed=0):
+    """Returns (matrix, origins, destinations) with geo coordinates but no times."""
+    matrix = TravelMatrix() if matrix is None else matrix
+    lat, lng = coordinates(n_origins + n_destinations, seed)
+    locations = [{'lat': a, 'lng': b} for a, b in zip(lat.tolist(), lng.tolist())]
+    origins = [Origin(postcode='EC4M 8AD', geo=geo, matrix=matrix) for geo in locations[:n_origins]]
+    destinations = [Destination(postcode='SW1A 1AA', geo=geo, matrix=matrix) for geo in locations[n_origins:]]
+    return matrix, origins, destinations
+
+
+def times(n_origins, n_destinations, modes, seed=0):
+    """Random travel times in minutes, a (n_origins x n_destinations) array per mode."""
+    random = np.random.default_rng(seed)
+    return {mode: random.uniform(5, 90, (n_origins, n_destinations)) for mode in modes}
+
+
+def filled_study(n_origins, n_destinations, seed=0):
+    """A study with times for all pairs and modes."""
+    matrix, origins, destinations = study(n_origins, n_destinations, seed=seed)
+    import_values(origins, destinations, times(n_origins, n_destinations, matrix.modes, seed))
+    return matrix, origins, destinations
@@ -0,0 +1,197 @@
+import datetime
+import json
+import platform
+import time
+import numpy as np
+from chunker import Chunker
+from locations import assign_current_destinations, SpatialIndex
+from google_maps_interpreter.fake_client import FakeInterpreter
+from . import data
+
+BENCHMARKS = {}
+
+
+def benchmark(name, limit=None):
+    """Registers a benchmark. The function takes the size n and does its setup, it returns the callable to time and
+    optionally the number of operations one call does (n by default). limit caps n for benchmarks that would take too
+    long at the largest scales, the n actually used is part of the result."""
+    def register(fn):
+        BENCHMARKS[name] = (fn, limit)
+        return fn
+    return register
+
+
+@benchmark('locations.set_times', limit=200000)
+def bench_set_times(n):
+    _, origins, destinations = data.study(n, 1)
+    destination = destinations[0]
+    values = np.random.default_rng(0).uniform(5, 90, n).tolist()
+
+    def run():
+        for origin, value in zip(origins, values):
+            origin.set_times('car', value, destination)
+    return run
+
+
+@benchmark('locations.current_destination', limit=10000)
+def bench_current_destination(n):
+    _, origins, destinations = data.filled_study(n, 10)
+
+    def run():
+        for origin in origins:
+            origin.current_destination = destinations[0]
+    return run
+
+
+@benchmark('locations.current_destination_single', limit=200000)
+def bench_current_destination_single(n, calls=1000):
+    # A single origin moving between destinations, this shouldn't get slower as the study grows.
+    _, origins, destinations = data.filled_study(n, 10)
+    origin = origins[0]
+
+    def run():
+        for i in range(calls):
+            origin.current_destination = destinations[i % len(destinations)]
+    return run, calls
+
+
+@benchmark('locations.assign_current_destinations', limit=200000)
+def bench_assign_current_destinations(n):
+    _, origins, destinations = data.filled_study(n, 10)
+    current = [destinations[i % 10] for i in range(n)]
+
+    def run():
+        assign_current_destinations(origins, current)
+    return run
+
+
+@benchmark('locations.avg_time', limit=200000)
+def bench_avg_time(n, calls=1000):
+    _, _, destinations = data.filled_study(n, 10)
+
+    def run():
+        for _ in range(calls // len(destinations)):
+            for destination in destinations:
+                destination.avg_time('car')
+    return run, calls
+
+
+@benchmark('spatial.knn', limit=1000000)
+def bench_spatial_knn(n, queries=1000):
+    index = SpatialIndex.from_coordinates(*data.coordinates(n))
+    lat, lng = data.coordinates(queries, seed=1)
+
+    def run():
+        index.query_knn(lat, lng, k=5)
+    return run, queries
+
+
+@benchmark('chunker.list', limit=1000000)
+def bench_chunker_list(n):
+    items = list(range(n))
+
+    def run():
+        for chunk in Chunker(items)(50):
+            for _ in chunk:
+                pass
+    return run
+
+
+@benchmark('chunker.array', limit=1000000)
+def bench_chunker_array(n):
+    items = np.arange(n)
+
+    def run():
+        for chunk in Chunker(items)(50):
+            chunk.sum()
+    return run
+
+
+@benchmark('chunker.generator', limit=1000000)
+def bench_chunker_generator(n):
+    def run():
+        for chunk in Chunker(i for i in range(n))(50):
+            for _ in chunk:
+                pass
+    return run
+
+
+@benchmark('interpreter.geocode', limit=100000)
+def bench_geocode(n):
+    places = data.places(n)
+    interpreter = FakeInterpreter(places=places)
+    addresses = list(places)
+
+    def run():
+        interpreter.geocode(addresses)
+    return run
+
+
+@benchmark('interpreter.dist_matrix', limit=10000)
+def bench_dist_matrix(n, n_destinations=10):
+    places = data.places(n, 'origin')
+    destinations = data.places(n_destinations, 'destination', seed=1)
+    places.update(destinations)
+    interpreter = FakeInterpreter(places=places)
+    origins = [address for address in places if address.startswith('origin')]
+
+    def run():
+        interpreter.dist_matrix(origins, list(destinations))
+    return run, n * n_destinations
+
+
+def measure(name, n, repeat=3):
+    """Runs a single benchmark and returns its result: the n used, the best and mean wall time of the repeats in
+    seconds and the operations per second of the best run."""
+    fn, limit = BENCHMARKS[name]
+    n = n if limit is None else min(n, limit)
+    prepared = fn(n)
+    run, ops = prepared if isinstance(prepared, tuple) else (prepared, n)
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    return {'n': n, 'ops': ops, 'repeat': repeat, 'best': best, 'mean': sum(timings) / repeat,
+            'ops_per_second': ops / best if best else float('inf')}
+
+
+def run(scale='1k', names=None, repeat=3):
+    """Runs the benchmarks (all of them by default) at a scale, a key of data.SCALES or a number. Returns a JSON
+    serialisable dict with the environment and a result per benchmark."""
+    n = data.SCALES[scale] if scale in data.SCALES else int(scale)
+    names = list(BENCHMARKS) if names is None else names
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        raise ValueError('Unknown benchmarks: {}'.format(', '.join(sorted(unknown))))
+    return {'scale': str(scale),
+            'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.platform(),
+            'results': {name: measure(name, n, repeat) for name in names}}
+
+
+def compare(baseline, current, tolerance=0.1):
+    """Compares two results of run (dicts or paths to JSON files). Returns a dict with per benchmark that is in both
+    and was run with the same n the ratio of the current to the baseline best time, and a list of the regressions:
+    benchmarks more than tolerance (relative) slower."""
+    baseline, current = (load(result) if isinstance(result, str) else result for result in (baseline, current))
+    ratios = {}
+    for name, result in current['results'].items():
+        old = baseline['results'].get(name)
+        if old is not None and old['n'] == result['n'] and old['best']:
+            ratios[name] = result['best'] / old['best']
+    return {'ratios': ratios, 'regressions': sorted(name for name, ratio in ratios.items() if ratio > 1 + tolerance)}
+
+
+def save(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
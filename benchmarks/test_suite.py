@@ -0,0 +1,49 @@
+import json
+import os
+import tempfile
+import unittest
+from benchmarks import BENCHMARKS, run, compare, save, load
+from benchmarks.__main__ import main
+
+
+class TestSuite(unittest.TestCase):
+
+    def test_run(self):
+        results = run(scale=60, repeat=1)
+        self.assertEqual(set(results['results']), set(BENCHMARKS))
+        for result in results['results'].values():
+            self.assertEqual(set(result), {'n', 'ops', 'repeat', 'best', 'mean', 'ops_per_second'})
+            self.assertGreater(result['ops_per_second'], 0)
+        self.assertEqual(results['results']['interpreter.dist_matrix']['ops'], 600)
+        json.dumps(results)
+
+    def test_limits(self):
+        # Every benchmark is bounded, so a large numeric scale can't make the suite run for hours.
+        self.assertEqual([name for name, (_, limit) in BENCHMARKS.items() if limit is None], [])
+
+        with self.assertRaises(ValueError):
+            run(scale=10, names=['unknown'])
+
+    def test_compare(self):
+        baseline = {'results': {'a': {'n': 10, 'best': 1.0}, 'b': {'n': 10, 'best': 1.0},
+                                'c': {'n': 10, 'best': 1.0}}}
+        current = {'results': {'a': {'n': 10, 'best': 1.5}, 'b': {'n': 10, 'best': 1.05},
+                               'c': {'n': 20, 'best': 3.0}}}
+        comparison = compare(baseline, current)
+        self.assertEqual(comparison['regressions'], ['a'])
+        self.assertEqual(set(comparison['ratios']), {'a', 'b'})
+
+    def test_main(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.json')
+            self.assertEqual(main(['--scale', '20', '--only', 'chunker.list', '--repeat', '1', '--output', path]), 0)
+            results = load(path)
+            self.assertEqual(list(results['results']), ['chunker.list'])
+
+            results['results']['chunker.list']['best'] /= 100
+            save(results, path)
+            self.assertEqual(main(['--scale', '20', '--only', 'chunker.list', '--compare', path]), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,28 +1,95 @@
+import itertools
+from collections.abc import Iterable, Mapping, Sequence
+import numpy as np
+
+
+class SequenceView(Sequence):
+    """A read-only view on sequence[start:stop] that doesn't copy the items. Slicing a view returns another view."""
+
+    __slots__ = ('sequence', 'start', 'stop')
+
+    def __init__(self, sequence, start, stop):
+        self.sequence = sequence
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return SequenceView(self.sequence, self.start + start, self.start + max(start, stop))
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError('SequenceView index out of range')
+        return self.sequence[self.start + item]
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __repr__(self):
+        return 'SequenceView({!r})'.format(list(self))
+
+
 class Chunker:
-    """Accepts a list to initialise the object. Used to return the list chopped in 'chunks' and returned in a list of
-    lists."""
+    """Accepts any iterable to initialise the object. Used to return it chopped in 'chunks'. Chunks of sized inputs
+    don't copy: NumPy arrays give array slices (views), bytes-like objects memoryviews, strings slices and other
+    sequences (lists, tuples...) a SequenceView. Any other iterable, e.g. a generator reading lines from a file, is
+    consumed lazily and yields lists so memory stays constant regardless of the input size."""
 
     def __init__(self, to_chunk_list):
 
-        try:
-            to_chunk_list[0:5]
-        except (KeyError, TypeError):
+        if isinstance(to_chunk_list, Mapping) or not isinstance(to_chunk_list, Iterable):
             raise TypeError('{} object is not subscriptable'.format(to_chunk_list.__class__.__name__))
 
         self.list = to_chunk_list
 
     def __call__(self, size):
-        """Takes a size as argument and returns a list of list with the inner list being the size passed as argument.
-        All inner lists together form the original list."""
+        """Takes a size as argument and yields chunks of that size (the last one may be smaller). All chunks
+        together form the original input."""
+        return self.get_chunks(size)
 
-        chunks, last_chunk = len(self.list)//size, len(self.list)%size
+    def _check_size(self, size):
+        if not isinstance(size, int) or size < 1:
+            raise ValueError('size should be a positive integer got {}'.format(size))
 
-        first_elem = 0
-        for chunk in range(chunks):
-            last_elem = first_elem + size
-            yield self.list[first_elem:last_elem]
-            first_elem = last_elem
+    def get_chunks(self, size):
+        """Yields the input in chunks of size, see the class docstring for the type of the chunks."""
+        self._check_size(size)
+        to_chunk = self.list
+
+        if isinstance(to_chunk, np.ndarray) or isinstance(to_chunk, str):
+            for start, stop in self.ranges(size):
+                yield to_chunk[start:stop]
+        elif isinstance(to_chunk, (bytes, bytearray, memoryview)):
+            view = memoryview(to_chunk)
+            for start, stop in self.ranges(size):
+                yield view[start:stop]
+        elif isinstance(to_chunk, Sequence):
+            for start, stop in self.ranges(size):
+                yield SequenceView(to_chunk, start, stop)
+        else:
+            iterator = iter(to_chunk)
+            chunk = list(itertools.islice(iterator, size))
+            while chunk:
+                yield chunk
+                chunk = list(itertools.islice(iterator, size))
+
+    def ranges(self, size):
+        """Yields (start, stop) index ranges of the chunks instead of the chunks themselves, e.g. to hand out to worker
+        processes that read the data themselves. Needs an input with a length."""
+        self._check_size(size)
+        try:
+            length = len(self.list)
+        except TypeError:
+            raise TypeError('{} object has no length, ranges needs a sized input'.format(
+                self.list.__class__.__name__))
 
-        if last_chunk:
-            last_elem = first_elem + last_chunk
-            yield self.list[first_elem:last_elem]
+        for start in range(0, length, size):
+            yield start, min(start + size, length)
@@ -0,0 +1,289 @@
+import asyncio
+import functools
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+import googlemaps
+import requests
+from googlemaps import convert
+from . import geohash, planner
+from .cache import normalize_key, params_key
+from .interpreter import GoogleInterpreter, lookup, parse_geocode, parse_reverse_geocode, parse_points, parse_element
+from .metrics import NULL_METRICS
+
+RETRY_STATUSES = {'OVER_QUERY_LIMIT', 'UNKNOWN_ERROR'}
+RETRY_HTTP_CODES = {429, 500, 503, 504}
+
+
+class TokenBucket:
+    """A token bucket rate limiter for asyncio. rate tokens are added per second up to capacity. acquire(n) waits until
+    n tokens are available and returns the time it waited. Waiters are served in order."""
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = rate if capacity is None else capacity
+        self.clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = None
+
+    def _refill(self):
+        now = self.clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens=1):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        tokens = min(tokens, self.capacity)     # A request larger than the bucket would never get through.
+        waited = 0
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                delay = (tokens - self._tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+                self._refill()
+            self._tokens -= tokens
+        return waited
+
+
+class AsyncGoogleInterpreter:
+    """An asyncio variant of the GoogleInterpreter. Requests are sent concurrently (at most concurrency at a time)
+    over a pooled requests.Session, throttled by token buckets for queries per second and distance matrix elements per
+    second. Responses with OVER_QUERY_LIMIT (or a 429/5xx) are retried with exponential backoff and full jitter.
+    Results, caching and request planning are the same as in the GoogleInterpreter.
+
+        async with AsyncGoogleInterpreter(key) as interpreter:
+            geocodes = await interpreter.geocode(addresses)
+
+    base_url can point to a local server for testing. retries and throttled count the retried requests and the
+    seconds spent waiting on the rate limiters, metrics receives the same metrics as the GoogleInterpreter's."""
+
+    MAX_ORIGINS = GoogleInterpreter.MAX_ORIGINS
+    MAX_DESTINATIONS = GoogleInterpreter.MAX_DESTINATIONS
+    MAX_ELEMENTS = GoogleInterpreter.MAX_ELEMENTS
+    CACHE_CHUNK = 100   # (Reverse) geocodes are written to the cache per this many finished requests.
+
+    def __init__(self, key, base_url='https://maps.googleapis.com', concurrency=10, queries_per_second=50,
+                 elements_per_second=1000, max_retries=5, backoff=0.5, timeout=30, cache=None, dist_cache=None,
+                 reverse_cache=None, metrics=None):
+        self.key = key
+        self.base_url = base_url.rstrip('/')
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache = cache
+        self.dist_cache = dist_cache
+        self.reverse_cache = reverse_cache
+        self.metrics = NULL_METRICS if metrics is None else metrics
+        self.queries = TokenBucket(queries_per_second)
+        self.elements = TokenBucket(elements_per_second)
+        self.retries = 0
+        self.throttled = 0
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+    async def _request(self, endpoint, path, params, elements=0):
+        """Sends a GET request to the API and returns the decoded body. Waits for the semaphore and rate limiters
+        before every attempt. endpoint is the name the request is recorded under in the metrics."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        loop = asyncio.get_running_loop()
+        params = dict(params, key=self.key)
+        get = functools.partial(self.session.get, self.base_url + path, params=params, timeout=self.timeout)
+
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                waited = await self.queries.acquire()
+                if elements:
+                    waited += await self.elements.acquire(elements)
+                self.throttled += waited
+                self.metrics.observe('throttle', waited, endpoint=endpoint)
+
+                self.metrics.count('requests', endpoint=endpoint)
+                with self.metrics.timer('request.latency', endpoint=endpoint):
+                    response = await loop.run_in_executor(self._executor, get)
+                if response.status_code in RETRY_HTTP_CODES:
+                    status = 'HTTP {}'.format(response.status_code)
+                else:
+                    response.raise_for_status()
+                    body = response.json()
+                    status = body.get('status')
+                    if status not in RETRY_STATUSES:
+                        break
+
+                if attempt < self.max_retries:
+                    self.retries += 1
+                    self.metrics.count('retries', endpoint=endpoint)
+                    await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+            else:
+                raise googlemaps.exceptions.ApiError(status, 'Gave up after {} retries'.format(self.max_retries))
+
+        if status not in ('OK', 'ZERO_RESULTS'):
+            raise googlemaps.exceptions.ApiError(status, body.get('error_message'))
+        if elements:
+            self.metrics.count('elements', elements, endpoint=endpoint)
+        return body
+
+    async def _fetch(self, pending, cache):
+        """Awaits pending, a dict of key: coroutine, in the order they finish and returns the results that were found
+        by key. Results are written to cache in chunks while the other requests are still running. A failing request
+        doesn't lose the others: failures are collected and the first one is raised once all results are cached."""
+        async def keyed(key, coroutine):
+            return key, await coroutine
+
+        fetched, chunk, errors = {}, {}, []
+        for request in asyncio.as_completed([keyed(key, coroutine) for key, coroutine in pending.items()]):
+            try:
+                key, value = await request
+            except (googlemaps.exceptions.ApiError, requests.RequestException) as error:
+                errors.append(error)
+                continue
+            if value is not None:
+                fetched[key] = chunk[key] = value
+            if cache is not None and len(chunk) >= self.CACHE_CHUNK:
+                cache.set_many(chunk)
+                chunk = {}
+        if cache is not None and chunk:
+            cache.set_many(chunk)
+        if errors:
+            raise errors[0]
+        return fetched
+
+    async def _geocode_one(self, address, **kwargs):
+        body = await self._request('geocode', '/maps/api/geocode/json', dict(kwargs, address=address))
+        return parse_geocode(body.get('results', []))
+
+    async def geocode(self, origins, **kwargs):
+        """Same as GoogleInterpreter.geocode but all addresses that aren't cached are geocoded concurrently. When some
+        requests fail the addresses that were found are cached before the error is raised."""
+        single = isinstance(origins, str)
+        origins = [origins] if single else list(origins)
+
+        keys = {origin: params_key(normalize_key(origin), kwargs) for origin in origins}
+        result, misses = lookup(self.cache, keys, self.metrics, 'geocode')
+        fetched = await self._fetch({key: self._geocode_one(origin, **kwargs) for key, origin in misses.items()},
+                                    self.cache)
+        result.update(fetched)
+
+        not_found = [origin for key, origin in misses.items() if key not in fetched]
+        if not_found:
+            raise ValueError("{} not found".format(', '.join(not_found)))
+        return {origin: result[key] for origin, key in keys.items()}
+
+    async def _reverse_geocode_one(self, lat, lng, **kwargs):
+        body = await self._request('reverse_geocode', '/maps/api/geocode/json',
+                                   dict(kwargs, latlng='{!r},{!r}'.format(lat, lng)))
+        return parse_reverse_geocode(body.get('results', []))
+
+    async def reverse_geocode(self, points, precision=7, **kwargs):
+        """Same as GoogleInterpreter.reverse_geocode but all cells that aren't cached are looked up concurrently,
+        within the concurrency and rate limits."""
+        single = isinstance(points, dict)
+        lats, lngs = parse_points(points)
+        cells, inverse = geohash.snap(lats, lngs, precision)
+        keys = {cell: params_key(cell, kwargs) for cell in cells}
+        result, misses = lookup(self.reverse_cache, keys, self.metrics, 'reverse_geocode')
+        fetched = await self._fetch({key: self._reverse_geocode_one(*geohash.decode(cell), **kwargs)
+                                     for key, cell in misses.items()}, self.reverse_cache)
+        result.update(fetched)
+
+        found = [result.get(key) for key in keys.values()]
+        if single:
+            if found[0] is None:
+                raise ValueError('{} not found'.format(points))
+            return found[0]['address']
+        return [found[i] for i in inverse]
+
+    async def _dist_tile(self, origins, destinations, **kwargs):
+        params = dict(kwargs, origins=convert.location_list(origins),
+                      destinations=convert.location_list(destinations))
+        if 'departure_time' in params:
+            params['departure_time'] = convert.time(params['departure_time'])
+        with self.metrics.timer('chunk.latency', endpoint='distance_matrix'):
+            body = await self._request('distance_matrix', '/maps/api/distancematrix/json', params,
+                                       len(origins) * len(destinations))
+        return origins, destinations, body
+
+    async def dist_matrix_iter(self, origins, destinations, **kwargs):
+        """Same as GoogleInterpreter.dist_matrix_iter but all requests of the plan are sent concurrently, cells are
+        yielded per request in the order the requests finish. When requests fail the others are still yielded and
+        cached, the first failure is raised at the end. Requests still running when the caller stops are cancelled."""
+        origins = [origins] if isinstance(origins, str) else list(origins)
+        destinations = [destinations] if isinstance(destinations, str) else list(destinations)
+
+        keys = {}
+        cached = {}
+        if self.dist_cache is not None:
+            keys = {(origin, dest): self.dist_cache.key(origin, dest, **kwargs)
+                    for origin in origins for dest in destinations}
+            cached, _ = lookup(self.dist_cache, keys, self.metrics, 'distance_matrix')
+
+        limits = {'max_origins': self.MAX_ORIGINS, 'max_destinations': self.MAX_DESTINATIONS,
+                  'max_elements': self.MAX_ELEMENTS}
+        if cached:
+            missing = []
+            for i, origin in enumerate(origins):
+                for j, dest in enumerate(destinations):
+                    if keys[(origin, dest)] in cached:
+                        yield origin, dest, cached[keys[(origin, dest)]]
+                    else:
+                        missing.append((i, j))
+            tiles = planner.plan_missing(origins, destinations, missing, **limits)
+        else:   # The whole matrix is missing, which plan tiles without going over every cell.
+            tiles = planner.tiles(origins, destinations, **limits)
+        tasks = [asyncio.ensure_future(self._dist_tile(o, d, **kwargs)) for o, d in tiles]
+        errors = []
+        try:
+            for tile in asyncio.as_completed(tasks):
+                try:
+                    origin_chunk, dest_chunk, body = await tile
+                except (googlemaps.exceptions.ApiError, requests.RequestException) as error:
+                    errors.append(error)
+                    continue
+                cells = []
+                fetched = {}
+                for origin, row in zip(origin_chunk, body['rows']):
+                    for dest, element in zip(dest_chunk, row['elements']):
+                        cell = parse_element(element)
+                        if cell is not None and keys:
+                            fetched[keys[(origin, dest)]] = cell
+                        cells.append((origin, dest, {'dist': None, 'time': None} if cell is None else cell))
+                if fetched:
+                    self.dist_cache.set_many(fetched)   # Before yielding, in case the caller stops early.
+                for cell in cells:
+                    yield cell
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()    # Retrieves failures that weren't awaited, so they aren't logged as lost.
+        if errors:
+            raise errors[0]
+
+    async def dist_matrix(self, origins, destinations, **kwargs):
+        """Same as GoogleInterpreter.dist_matrix but all requests of the plan are sent concurrently."""
+        origins = [origins] if isinstance(origins, str) else list(origins)
+        destinations = [destinations] if isinstance(destinations, str) else list(destinations)
+
+        result = {origin: {} for origin in origins}
+        async for origin, dest, cell in self.dist_matrix_iter(origins, destinations, **kwargs):
+            result[origin][dest] = cell
+        return {origin: {dest: result[origin][dest] for dest in destinations} for origin in origins}
@@ -0,0 +1,109 @@
+import collections
+import itertools
+import json
+import os
+import time
+from chunker import Chunker
+
+JobSummary = collections.namedtuple('JobSummary', ('offset', 'resolved', 'failed', 'chunks'))
+JobSummary.__doc__ = """Progress of a GeocodeJob: offset is the number of input addresses committed to the checkpoint,
+resolved and failed split them in geocoded and dead-lettered addresses, chunks is the number of committed chunks."""
+
+
+class GeocodeJob:
+    """Geocodes a long stream of addresses with a GoogleInterpreter as a resumable batch job. Results are appended to
+    a JSON lines checkpoint file per chunk, followed by a commit line once the whole chunk is written (and fsynced), so
+    nothing is kept in memory and at most one chunk of work is lost when the job crashes. Opening a job on an existing
+    checkpoint cuts off a partially written chunk and run() skips the addresses that were already committed, so the
+    same input (in the same order) should be passed again to resume.
+
+    Addresses that aren't found or whose request fails with an API error don't stop the job, they end up in the
+    dead-letter list (dead_letters()) with the reason. Lines of the checkpoint are one of:
+
+        {"address": ..., "result": {"geo": {"lat": x, "lng": y}, "place_id": ...}}
+        {"address": ..., "error": "NOT_FOUND"}
+        {"commit": n, "offset": ..., "resolved": ..., "failed": ...}"""
+
+    def __init__(self, interpreter, path, chunk_size=50, fsync=True):
+        self.interpreter = interpreter
+        self.path = path
+        self.chunk_size = chunk_size
+        self.fsync = fsync
+        self._summary = JobSummary(0, 0, 0, 0)
+        self._recover()
+
+    @property
+    def summary(self):
+        return self._summary
+
+    def _recover(self):
+        """Reads the last commit line of the checkpoint and truncates whatever was written after it."""
+        if not os.path.exists(self.path):
+            return
+        end = position = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                position += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break       # A line cut off by a crash.
+                if 'commit' in record:
+                    end = position
+                    self._summary = JobSummary(record['offset'], record['resolved'], record['failed'],
+                                               record['commit'] + 1)
+        if end < os.path.getsize(self.path):
+            with open(self.path, 'r+b') as f:
+                f.truncate(end)
+
+    def _geocode_chunk(self, chunk):
+        """Returns the checkpoint records of a chunk, see GoogleInterpreter.try_geocode."""
+        results, errors = self.interpreter.try_geocode(chunk)
+        return [{'address': address, 'result': results[address]} if address in results
+                else {'address': address, 'error': errors[address]} for address in chunk]
+
+    def run(self, addresses, progress=None):
+        """Geocodes the addresses (any iterable, e.g. a generator reading a file) from where the checkpoint left off.
+        progress is called with the JobSummary after every committed chunk. Returns the final JobSummary."""
+        remaining = itertools.islice(iter(addresses), self.summary.offset, None)
+        pause = self.interpreter.GEOCODE_PAUSE
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for n, chunk in enumerate(Chunker(remaining).get_chunks(self.chunk_size)):
+                if n and pause:
+                    time.sleep(pause)
+                    self.interpreter.metrics.observe('throttle', pause, endpoint='geocode')
+                records = self._geocode_chunk(chunk)
+
+                failed = sum('error' in record for record in records)
+                summary = self.summary
+                summary = JobSummary(summary.offset + len(chunk), summary.resolved + len(chunk) - failed,
+                                     summary.failed + failed, summary.chunks + 1)
+                records.append({'commit': summary.chunks - 1, 'offset': summary.offset,
+                                'resolved': summary.resolved, 'failed': summary.failed})
+                f.write(''.join(json.dumps(record) + '\n' for record in records))
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+                self._summary = summary
+                if progress is not None:
+                    progress(summary)
+        return self.summary
+
+    def _records(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+
+    def results(self):
+        """Yields (address, result) for every geocoded address in the checkpoint, streamed from the file."""
+        for record in self._records():
+            if 'result' in record:
+                yield record['address'], record['result']
+
+    def dead_letters(self):
+        """Yields (address, reason) for every address that couldn't be geocoded."""
+        for record in self._records():
+            if 'error' in record:
+                yield record['address'], record['error']
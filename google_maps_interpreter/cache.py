@@ -0,0 +1,162 @@
+import hashlib
+import json
+import sqlite3
+import time
+
+
+def normalize_key(address):
+    """Returns the cache key of an address or postcode: upper case with all whitespace collapsed to single spaces."""
+    return ' '.join(str(address).split()).upper()
+
+
+def params_digest(params):
+    """A short digest of request parameters that doesn't depend on their order, or on the order of list and dict
+    values like avoid=['tolls', 'ferries'] or components={'country': 'GB'}. Parameters set to None are left out, no
+    parameters give an empty string."""
+    def canonical(value):
+        if isinstance(value, dict):
+            return sorted([str(name), str(item)] for name, item in value.items())
+        if isinstance(value, (list, tuple, set)):
+            return sorted(map(str, value))
+        return str(value)
+
+    params = {name: canonical(value) for name, value in params.items() if value is not None}
+    if not params:
+        return ''
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def params_key(key, params):
+    """Appends the digest of the request parameters to a cache key, keys of requests without parameters are left as
+    they are so caches filled before parameters were part of the key stay valid."""
+    digest = params_digest(params)
+    return '{}|{}'.format(key, digest) if digest else key
+
+
+class SQLiteCache:
+    """A persistent key-value cache backed by a SQLite file (or memory when path is ':memory:'). Values are stored as
+    JSON. Entries older than ttl seconds are treated as misses and removed, and when the cache holds more than
+    max_entries the least recently used entries are evicted. hits and misses count the lookups since creation.
+
+    Any object with get_many(keys) and set_many(items) can be used as a cache by the GoogleInterpreter, this is the
+    default implementation."""
+
+    def __init__(self, path=':memory:', ttl=None, max_entries=None, table='geocode', clock=time.time):
+        if not table.isidentifier():
+            raise ValueError('table should be a valid identifier got {}'.format(table))
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.table = table
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._db = sqlite3.connect(path)
+        self._db.execute('CREATE TABLE IF NOT EXISTS {} (key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+                         'created REAL NOT NULL, accessed REAL NOT NULL)'.format(table))
+        self._db.execute('CREATE INDEX IF NOT EXISTS {0}_accessed ON {0} (accessed)'.format(table))
+        self._db.commit()
+
+    def __len__(self):
+        return self._db.execute('SELECT COUNT(*) FROM {}'.format(self.table)).fetchone()[0]
+
+    def __contains__(self, key):
+        return key in self.get_many([key], count=False)
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def get_many(self, keys, count=True):
+        """Returns a dict with the keys that are in the cache and not expired. Keys that are missing are simply left
+        out. Found entries are marked as used for the LRU eviction."""
+        keys = list(dict.fromkeys(keys))
+        now = self.clock()
+        found = {}
+        expired = []
+        for start in range(0, len(keys), 500):      # Stay below SQLite's limit on the number of parameters.
+            chunk = keys[start:start + 500]
+            rows = self._db.execute('SELECT key, value, created FROM {} WHERE key IN ({})'.format(
+                self.table, ','.join('?' * len(chunk))), chunk)
+            for key, value, created in rows:
+                if self.ttl is not None and now - created > self.ttl:
+                    expired.append(key)
+                else:
+                    found[key] = json.loads(value)
+
+        if expired:
+            self._db.executemany('DELETE FROM {} WHERE key = ?'.format(self.table), [(key,) for key in expired])
+        if found:
+            self._db.executemany('UPDATE {} SET accessed = ? WHERE key = ?'.format(self.table),
+                                 [(now, key) for key in found])
+        self._db.commit()
+
+        if count:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def set_many(self, items):
+        """Stores a dict of key: value pairs, overwriting existing keys, and evicts the least recently used entries
+        when the cache grows beyond max_entries."""
+        now = self.clock()
+        self._db.executemany('INSERT OR REPLACE INTO {} (key, value, created, accessed) VALUES (?, ?, ?, ?)'.format(
+            self.table), [(key, json.dumps(value), now, now) for key, value in items.items()])
+        if self.max_entries is not None:
+            self._db.execute('DELETE FROM {0} WHERE key IN (SELECT key FROM {0} ORDER BY accessed, rowid '
+                             'LIMIT max(0, (SELECT COUNT(*) FROM {0}) - ?))'.format(self.table), (self.max_entries,))
+        self._db.commit()
+
+    def clear(self):
+        self._db.execute('DELETE FROM {}'.format(self.table))
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+
+class DistanceCache:
+    """Caches distance matrix cells by (origin, destination, mode, departure time bucket). origin and destination are
+    the strings sent to the API, normalized, so passing 'place_id:...' strings keys the cells by place id. Departure
+    times are rounded down to buckets of bucket seconds so that requests for e.g. 08:05 and 08:10 share their cells.
+    With symmetric=True A->B and B->A share a cell, which is fine for modes where the direction doesn't matter.
+    Any other request parameters (avoid, units, transit_mode, traffic_model, ...) are part of the key as a digest.
+
+    cache is any object with get_many(keys) and set_many(items), a SQLiteCache by default."""
+
+    def __init__(self, cache=None, bucket=900, symmetric=False):
+        self.cache = SQLiteCache(table='distance_matrix') if cache is None else cache
+        self.bucket = bucket
+        self.symmetric = symmetric
+
+    def departure_bucket(self, departure_time=None):
+        if departure_time is None:
+            return 'none'
+        if departure_time == 'now':
+            departure_time = time.time()
+        elif hasattr(departure_time, 'timestamp'):
+            departure_time = departure_time.timestamp()
+        return str(int(departure_time // self.bucket))
+
+    def key(self, origin, destination, mode=None, departure_time=None, **params):
+        origin, destination = normalize_key(origin), normalize_key(destination)
+        if self.symmetric and destination < origin:
+            origin, destination = destination, origin
+        return params_key('|'.join([origin, destination, mode or 'driving', self.departure_bucket(departure_time)]),
+                          params)
+
+    def get_many(self, keys):
+        return self.cache.get_many(keys)
+
+    def set_many(self, items):
+        self.cache.set_many(items)
+
+    @property
+    def hits(self):
+        return self.cache.hits
+
+    @property
+    def misses(self):
+        return self.cache.misses
@@ -0,0 +1,164 @@
+import collections
+import json
+import math
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import googlemaps
+from .interpreter import GoogleInterpreter
+
+SPEEDS = {'driving': 12.0, 'walking': 1.4, 'bicycling': 4.5, 'transit': 8.0}  # m/s
+REVERSE_RADIUS = 1000   # m, reverse geocoding finds the nearest place within this radius.
+
+
+def _straight_line(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * 6371000 * math.asin(math.sqrt(h))
+
+
+class FakeClient(googlemaps.Client):
+    """An in-process stand-in for googlemaps.Client that answers from a dict instead of the API. It's used by the
+    tests and can be mixed in under the GoogleInterpreter to run it without a key or network, see FakeInterpreter.
+
+    places maps an address to a (lat, lng) tuple. calls counts the upstream requests per method and elements the
+    number of distance matrix elements billed. Distances are 1.3 times the straight line distance and times follow
+    from a fixed speed per mode. The API's limits per distance matrix request are enforced. Reverse geocoding returns
+    the nearest place within REVERSE_RADIUS meters."""
+
+    def __init__(self, *args, places=None, **kwargs):
+        kwargs.setdefault('key', 'AIzaFakeKey')
+        super().__init__(*args, **kwargs)
+        self.places = {} if places is None else places
+        self.calls = collections.Counter()
+        self.elements = 0
+
+    def geocode(self, address=None, *args, **kwargs):
+        self.calls['geocode'] += 1
+        if address not in self.places:
+            return []
+        lat, lng = self.places[address]
+        return [{'geometry': {'location': {'lat': lat, 'lng': lng}},
+                 'place_id': 'place-{}'.format(address),
+                 'formatted_address': address}]
+
+    def reverse_geocode(self, latlng, *args, **kwargs):
+        self.calls['reverse_geocode'] += 1
+        lat, lng = map(float, googlemaps.convert.latlng(latlng).split(','))
+        distance, address = min(((_straight_line(lat, lng, *place), address) for address, place in self.places.items()),
+                                default=(None, None))
+        if distance is None or distance > REVERSE_RADIUS:
+            return []
+        return [{'geometry': {'location': dict(zip(('lat', 'lng'), self.places[address]))},
+                 'place_id': 'place-{}'.format(address),
+                 'formatted_address': address}]
+
+    def _distance(self, origin, destination):
+        return 1.3 * _straight_line(*self.places[origin], *self.places[destination])
+
+    def distance_matrix(self, origins, destinations, mode=None, *args, **kwargs):
+        self.calls['distance_matrix'] += 1
+        origins = [origins] if isinstance(origins, str) else origins
+        destinations = [destinations] if isinstance(destinations, str) else destinations
+        if len(origins) > 25 or len(destinations) > 25 or len(origins) * len(destinations) > 100:
+            raise googlemaps.exceptions.ApiError('MAX_DIMENSIONS_EXCEEDED')
+        self.elements += len(origins) * len(destinations)
+
+        rows = []
+        for origin in origins:
+            elements = []
+            for destination in destinations:
+                if origin not in self.places or destination not in self.places:
+                    elements.append({'status': 'NOT_FOUND'})
+                    continue
+                distance = self._distance(origin, destination)
+                elements.append({'status': 'OK',
+                                 'distance': {'value': round(distance)},
+                                 'duration': {'value': round(distance / SPEEDS[mode or 'driving'])}})
+            rows.append({'elements': elements})
+        return {'status': 'OK', 'origin_addresses': origins, 'destination_addresses': destinations, 'rows': rows}
+
+
+class FakeInterpreter(GoogleInterpreter, FakeClient):
+    """A GoogleInterpreter answering from a FakeClient. The fake has no QPS limit so geocoding doesn't pause between
+    chunks of requests."""
+
+    GEOCODE_PAUSE = 0
+
+
+class PlacesTestCase(unittest.TestCase):
+    """A TestCase with N_ORIGINS origins spread north and N_DESTINATIONS destinations spread east of a common point,
+    for the tests of the (async) interpreter against a FakeInterpreter or FakeServer. Subclasses change the counts
+    by overriding the class attributes."""
+
+    N_ORIGINS = 30
+    N_DESTINATIONS = 20
+
+    def setUp(self):
+        self.origins = ['origin {}'.format(i) for i in range(self.N_ORIGINS)]
+        self.destinations = ['destination {}'.format(i) for i in range(self.N_DESTINATIONS)]
+        self.places = {origin: (51.5 + i / 100, -0.1) for i, origin in enumerate(self.origins)}
+        self.places.update({dest: (51.5, -0.1 + i / 100) for i, dest in enumerate(self.destinations)})
+
+
+class FakeServer:
+    """A local HTTP server speaking the (reverse) geocode and distance matrix endpoints of the API, answering from a
+    FakeClient. The first over_query_limit requests are answered with OVER_QUERY_LIMIT. Use it as a context manager,
+    url is the base url to pass to the client.
+
+        with FakeServer(places) as server:
+            interpreter = AsyncGoogleInterpreter('key', base_url=server.url)"""
+
+    def __init__(self, places=None, over_query_limit=0):
+        self.client = FakeClient(places=places)
+        self.over_query_limit = over_query_limit
+        self.requests = 0
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                body = json.dumps(fake.respond(url.path, params)).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{}'.format(self._server.server_address[1])
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def respond(self, path, params):
+        with self._lock:
+            self.requests += 1
+            if self.requests <= self.over_query_limit:
+                return {'status': 'OVER_QUERY_LIMIT', 'results': []}
+
+        if path == '/maps/api/geocode/json':
+            if 'latlng' in params:
+                results = self.client.reverse_geocode(params['latlng'])
+            else:
+                results = self.client.geocode(params.get('address'))
+            return {'status': 'OK' if results else 'ZERO_RESULTS', 'results': results}
+        if path == '/maps/api/distancematrix/json':
+            try:
+                return self.client.distance_matrix(params['origins'].split('|'), params['destinations'].split('|'),
+                                                   params.get('mode'))
+            except googlemaps.exceptions.ApiError as error:
+                return {'status': error.status, 'rows': []}
+        return {'status': 'INVALID_REQUEST'}
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,90 @@
+import numpy as np
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+MAX_PRECISION = 12  # 60 bits, so a cell fits an uint64.
+
+_DECODE = {char: value for value, char in enumerate(BASE32)}
+
+
+def _check(precision):
+    if not 1 <= precision <= MAX_PRECISION:
+        raise ValueError('precision should be between 1 and {} got {}'.format(MAX_PRECISION, precision))
+
+
+def _bit_counts(precision):
+    """Bits for longitude and latitude, longitude gets the odd one as the geohash starts with a longitude bit."""
+    bits = 5 * precision
+    return (bits + 1) // 2, bits // 2
+
+
+def encode_many(lats, lngs, precision=7):
+    """Returns the geohash cells of arrays of coordinates as uint64 integers (the 5 * precision geohash bits), which
+    are a lot cheaper to compare and deduplicate than strings. See to_strings for the geohashes themselves."""
+    _check(precision)
+    lats, lngs = np.asarray(lats, dtype=np.float64), np.asarray(lngs, dtype=np.float64)
+    lng_bits, lat_bits = _bit_counts(precision)
+    x = np.clip(np.floor((lngs + 180) / 360 * 2 ** lng_bits), 0, 2 ** lng_bits - 1).astype(np.uint64)
+    y = np.clip(np.floor((lats + 90) / 180 * 2 ** lat_bits), 0, 2 ** lat_bits - 1).astype(np.uint64)
+
+    codes = np.zeros(np.broadcast(x, y).shape, dtype=np.uint64)
+    for bit in range(5 * precision):   # Interleaved from the most significant bit: lng, lat, lng, ...
+        source, n_bits = (x, lng_bits) if bit % 2 == 0 else (y, lat_bits)
+        shift = np.uint64(n_bits - 1 - bit // 2)
+        codes = (codes << np.uint64(1)) | ((source >> shift) & np.uint64(1))
+    return codes
+
+
+def to_strings(codes, precision=7):
+    """Turns cells from encode_many into geohash strings."""
+    codes = np.asarray(codes, dtype=np.uint64)
+    chars = np.empty(codes.shape + (precision,), dtype=np.uint8)
+    alphabet = np.frombuffer(BASE32.encode('ascii'), dtype=np.uint8)
+    for i in range(precision):
+        chars[..., i] = alphabet[(codes >> np.uint64(5 * (precision - 1 - i))) & np.uint64(31)]
+    return [code.decode('ascii') for code in chars.reshape(-1, precision).view('S{}'.format(precision)).ravel()]
+
+
+def encode(lat, lng, precision=7):
+    """The geohash of a single coordinate, e.g. encode(51.5034, -0.1276) == 'gcpuvpg'."""
+    return to_strings(encode_many([lat], [lng], precision), precision)[0]
+
+
+def bounds(geohash):
+    """Returns the (south, west, north, east) bounds of the cell of a geohash."""
+    if not 1 <= len(geohash) <= MAX_PRECISION:
+        raise ValueError('Not a geohash: {}'.format(geohash))
+    code = 0
+    for char in geohash.lower():
+        if char not in _DECODE:
+            raise ValueError('Not a geohash: {}'.format(geohash))
+        code = code << 5 | _DECODE[char]
+
+    lng_bits, lat_bits = _bit_counts(len(geohash))
+    x = y = 0
+    for bit in range(5 * len(geohash)):
+        value = code >> (5 * len(geohash) - 1 - bit) & 1
+        if bit % 2 == 0:
+            x = x << 1 | value
+        else:
+            y = y << 1 | value
+    lng_size, lat_size = 360 / 2 ** lng_bits, 180 / 2 ** lat_bits
+    south, west = y * lat_size - 90, x * lng_size - 180
+    return south, west, south + lat_size, west + lng_size
+
+
+def decode(geohash):
+    """Returns the (lat, lng) center of the cell of a geohash."""
+    south, west, north, east = bounds(geohash)
+    return (south + north) / 2, (west + east) / 2
+
+
+def snap(lats, lngs, precision=7):
+    """Snaps coordinates to geohash cells of precision characters (7 is about 150 x 150m, 8 about 40 x 20m) to look up
+    nearby points once. Returns (cells, inverse): the distinct geohashes, in order of first appearance, and per point
+    the index of its cell."""
+    codes = encode_many(lats, lngs, precision).ravel()
+    unique, first, inverse = np.unique(codes, return_index=True, return_inverse=True)
+    order = np.argsort(first, kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return to_strings(unique[order], precision), rank[inverse.ravel()]
@@ -1,6 +1,95 @@
+import inspect
 import googlemaps
 import time
-from ..chunker import Chunker
+import numpy as np
+from chunker import Chunker
+from . import geohash, planner
+from .cache import normalize_key, params_key
+from .metrics import NULL_METRICS
+
+# The endpoint requests to a path are recorded under in the metrics, like AsyncGoogleInterpreter does.
+ENDPOINTS = {'/maps/api/geocode/json': 'geocode', '/maps/api/distancematrix/json': 'distance_matrix'}
+
+# Errors of a single request that shouldn't stop a batch of them, see GoogleInterpreter.try_geocode.
+API_ERRORS = (googlemaps.exceptions.ApiError, googlemaps.exceptions.HTTPError, googlemaps.exceptions.Timeout,
+              googlemaps.exceptions.TransportError)
+
+
+def call_params(method, args, kwargs, leading=1):
+    """Returns the arguments of a call to a googlemaps.Client method by name, without the client and the leading
+    arguments (the address, point or origins and destinations). Positional and keyword arguments then give the same
+    cache keys, e.g. dist_matrix(origins, destinations, 'walking') and the same with mode='walking'."""
+    bound = inspect.signature(method).bind(None, *[None] * leading, *args, **kwargs)
+    return dict(list(bound.arguments.items())[1 + leading:])
+
+
+def lookup(cache, keys, metrics, endpoint):
+    """Looks up keys, a dict of the requested items and their cache key, in cache (which may be None) and records
+    the cache hits and misses under endpoint. Returns (result, misses): the cached values by key, and the keys that
+    aren't cached with the first item that has them, so items sharing a key are only sent once."""
+    misses = {}
+    for item, key in keys.items():
+        misses.setdefault(key, item)
+    if cache is None:
+        return {}, misses
+    result = cache.get_many(misses)
+    misses = {key: item for key, item in misses.items() if key not in result}
+    metrics.count('cache.hits', len(result), endpoint=endpoint)
+    metrics.count('cache.misses', len(misses), endpoint=endpoint)
+    return result, misses
+
+
+def parse_geocode(raw_result):
+    """Turns the raw results of a geocode request into {'geo': {'lat':x, 'lng':y}, 'place_id': place_id} or None when
+    nothing was found."""
+    if len(raw_result) == 0:
+        return None
+    return {'geo': raw_result[0]['geometry']['location'], 'place_id': raw_result[0]['place_id']}
+
+
+def parse_reverse_geocode(raw_result):
+    """Turns the raw results of a reverse geocode request into {'address': formatted address, 'place_id': place_id}
+    or None when nothing was found."""
+    if len(raw_result) == 0:
+        return None
+    return {'address': raw_result[0]['formatted_address'], 'place_id': raw_result[0]['place_id']}
+
+
+def parse_points(points):
+    """Turns a point ({'lat': x, 'lng': y}) or a list of points (dicts or (lat, lng) pairs) into lists of latitudes
+    and longitudes. An (n, 2) array of (lat, lng) rows is split without a loop, for millions of points."""
+    if isinstance(points, np.ndarray):
+        if points.ndim != 2 or points.shape[1] != 2:
+            raise ValueError('An array of points should have the shape (n, 2) got {}'.format(points.shape))
+        lats, lngs = points[:, 0], points[:, 1]
+        if not ((np.abs(lats) <= 90) & (np.abs(lngs) <= 180)).all():
+            raise ValueError('Not all points are valid coordinates')
+        return lats, lngs
+    if isinstance(points, dict):
+        points = [points]
+    if isinstance(points, str):
+        raise ValueError('Points should be dicts with keys lat and lng or (lat, lng) pairs got {}'.format(points))
+    lats, lngs = [], []
+    for point in points:
+        if isinstance(point, dict):
+            try:
+                lat, lng = point['lat'], point['lng']
+            except KeyError:
+                raise KeyError("Points should be dicts with keys 'lat', 'lng'")
+        else:
+            lat, lng = point
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValueError('Not a valid point: {}, {}'.format(lat, lng))
+        lats.append(lat)
+        lngs.append(lng)
+    return lats, lngs
+
+
+def parse_element(element):
+    """Turns an element of a distance matrix response into {'dist': x, 'time': y} or None when it wasn't found."""
+    if element['status'] != 'OK':
+        return None
+    return {'dist': element['distance']['value'], 'time': element['duration']['value']}
 
 
 class GoogleInterpreter(googlemaps.Client):
@@ -8,58 +97,207 @@ class GoogleInterpreter(googlemaps.Client):
     here: https://github.com/googlemaps/google-maps-services-python. This class processes the raw return values from
     the client in a more user friendly manner."""
 
+    MAX_ORIGINS = planner.MAX_ORIGINS
+    MAX_DESTINATIONS = planner.MAX_DESTINATIONS
+    MAX_ELEMENTS = planner.MAX_ELEMENTS
+    GEOCODE_PAUSE = 1  # Seconds between chunks of 50 geocode requests, to not exceed Google's QPS limit of 50.
+
+    def __init__(self, *args, cache=None, dist_cache=None, reverse_cache=None, metrics=None, **kwargs):
+        """cache is an optional object with get_many(keys) and set_many(items), e.g. a cache.SQLiteCache. When set,
+        geocode results are stored by their normalized address and only addresses that aren't cached yet are sent to
+        the API. dist_cache does the same for the cells of dist_matrix and should be a cache.DistanceCache, and
+        reverse_cache for the geohash cells of reverse_geocode (e.g. a SQLiteCache with its own table). metrics
+        receives the request counts, latencies, elements billed, retries, cache hits and throttling, see
+        metrics.MetricsCollector. Nothing is recorded by default."""
+        self.metrics = NULL_METRICS if metrics is None else metrics
+        super().__init__(*args, **kwargs)
+        self.cache = cache
+        self.dist_cache = dist_cache
+        self.reverse_cache = reverse_cache
+
+    def _request(self, url, params, first_request_time=None, retry_counter=0, *args, **kwargs):
+        """Counts the retries of the underlying client, which retries by calling _request again. The client's own
+        pause to stay within queries_per_second happens in here too: it's part of request.latency, not of throttle,
+        which only holds the pauses between chunks of geocode requests."""
+        if retry_counter:
+            endpoint = ENDPOINTS.get(url, url)
+            if endpoint == 'geocode' and 'latlng' in dict(params):
+                endpoint = 'reverse_geocode'
+            self.metrics.count('retries', endpoint=endpoint)
+        return super()._request(url, params, first_request_time, retry_counter, *args, **kwargs)
+
+    def _geocode_one(self, address, *args, **kwargs):
+        self.metrics.count('requests', endpoint='geocode')
+        with self.metrics.timer('request.latency', endpoint='geocode'):
+            return parse_geocode(super().geocode(address, *args, **kwargs))
+
     def geocode(self, origins, *args, **kwargs):
         """Takes a list of addresses and returns a dict, using the address as key and the geo coordinates in a dict as
-        value: {address: {'geo': {'lat':x, 'lng':y}, 'place_id': place_id}}"""
-        if isinstance(origins, str):
-            raw_result = super().geocode(origins, *args, **kwargs)
-            if len(raw_result) == 0:
-                raise ValueError("{} not found".format(origins))
-            result = {origins: {'geo': raw_result[0]['geometry']['location'], 'place_id': raw_result[0]['place_id']}}
-            return result
-
-        chunker = Chunker(origins)
-        chunked_origins = chunker.get_chunks(50)  # Need to chunk to not exceed Google's QPS limit of 50.
-        result = {}
-
-        for n, chunk in enumerate(chunked_origins):
-            raw_result = super().geocode(chunk, *args, **kwargs)
-            temp_result = {chunk[i]: {'geo': raw_result[i]['geometry']['location'],
-                                      'place_id': raw_result[i]['place_id']}
-                           for i in chunk}
-
-            if len(temp_result) < chunk:  # python client simply throws not found errors out.
+        value: {address: {'geo': {'lat':x, 'lng':y}, 'place_id': place_id}}. Addresses are looked up in the cache
+        first (when there is one), duplicates and cached addresses are only sent once/not at all."""
+        single = isinstance(origins, str)
+        origins = [origins] if single else list(origins)
+
+        params = call_params(googlemaps.Client.geocode, args, kwargs)
+        keys = {origin: params_key(normalize_key(origin), params) for origin in origins}
+        result, misses = lookup(self.cache, keys, self.metrics, 'geocode')
+
+        chunker = Chunker(list(misses))
+        for n, chunk in enumerate(chunker.get_chunks(50)):  # Need to chunk to not exceed Google's QPS limit of 50.
+            if n and self.GEOCODE_PAUSE:
+                time.sleep(self.GEOCODE_PAUSE)
+                self.metrics.observe('throttle', self.GEOCODE_PAUSE, endpoint='geocode')
+            fetched = {}
+            with self.metrics.timer('chunk.latency', endpoint='geocode'):
+                for key in chunk:
+                    found = self._geocode_one(misses[key], *args, **kwargs)
+                    if found is None:
+                        break
+                    fetched[key] = found
+
+            if self.cache is not None:
+                self.cache.set_many(fetched)    # Also when a chunk fails, so the quota spent isn't lost.
+            result.update(fetched)
+
+            if len(fetched) < len(chunk):  # python client simply throws not found errors out.
+                if single:
+                    raise ValueError("{} not found".format(misses[chunk[len(fetched)]]))
                 raise ValueError("Origin not found in between element {} and {}".format(n*50, n*50 + 50))
 
-            result = {**result, **temp_result}
-            time.sleep(1)
+        return {origin: result[key] for origin, key in keys.items()}
+
+    def try_geocode(self, addresses, *args, **kwargs):
+        """Like geocode, but addresses that aren't found or whose request fails with an API error don't stop the
+        others. Returns (results, errors): results maps the geocoded addresses to their result, errors maps the others
+        to the reason, 'NOT_FOUND' or the error. Only the results are cached."""
+        params = call_params(googlemaps.Client.geocode, args, kwargs)
+        keys = {address: params_key(normalize_key(address), params) for address in addresses}
+        found, misses = lookup(self.cache, keys, self.metrics, 'geocode')
+
+        errors = {}
+        for n, chunk in enumerate(Chunker(list(misses)).get_chunks(50)):
+            if n and self.GEOCODE_PAUSE:
+                time.sleep(self.GEOCODE_PAUSE)
+                self.metrics.observe('throttle', self.GEOCODE_PAUSE, endpoint='geocode')
+            fetched = {}
+            with self.metrics.timer('chunk.latency', endpoint='geocode'):
+                for key in chunk:
+                    try:
+                        result = self._geocode_one(misses[key], *args, **kwargs)
+                    except API_ERRORS as e:
+                        errors[key] = '{}: {}'.format(e.__class__.__name__, e)
+                        continue
+                    if result is None:
+                        errors[key] = 'NOT_FOUND'
+                    else:
+                        fetched[key] = result
+            if fetched and self.cache is not None:
+                self.cache.set_many(fetched)
+            found.update(fetched)
+
+        return ({address: found[key] for address, key in keys.items() if key in found},
+                {address: errors[key] for address, key in keys.items() if key in errors})
 
-        return result
+    def _reverse_geocode_one(self, lat, lng, *args, **kwargs):
+        self.metrics.count('requests', endpoint='reverse_geocode')
+        with self.metrics.timer('request.latency', endpoint='reverse_geocode'):
+            return parse_reverse_geocode(super().reverse_geocode((lat, lng), *args, **kwargs))
 
-    def reverse_geocode(self, origins, *args, **kwargs):
-        """Takes a dict of geocode parameters and returns the address. Multiple geocodes not yet implemented."""
-        pass
+    def reverse_geocode(self, points, *args, precision=7, **kwargs):
+        """Takes a point {'lat': x, 'lng': y} and returns its address, or a list of points (dicts or (lat, lng) pairs)
+        and returns a list with per point {'address': address, 'place_id': place_id} or None when nothing was found.
+
+        Points are snapped to geohash cells of precision characters (7 is about 150 x 150m, see geohash.snap) and
+        every cell is looked up once, at its center, so nearby points share an address. Cells are looked up in the
+        reverse_cache first (when there is one), the others are sent in chunks of 50 like geocode."""
+        single = isinstance(points, dict)
+        lats, lngs = parse_points(points)
+        cells, inverse = geohash.snap(lats, lngs, precision)
+        params = call_params(googlemaps.Client.reverse_geocode, args, kwargs)
+        keys = {cell: params_key(cell, params) for cell in cells}
+        result, misses = lookup(self.reverse_cache, keys, self.metrics, 'reverse_geocode')
+
+        for n, chunk in enumerate(Chunker(list(misses)).get_chunks(50)):
+            if n and self.GEOCODE_PAUSE:
+                time.sleep(self.GEOCODE_PAUSE)
+                self.metrics.observe('throttle', self.GEOCODE_PAUSE, endpoint='reverse_geocode')
+            fetched = {}
+            with self.metrics.timer('chunk.latency', endpoint='reverse_geocode'):
+                for key in chunk:
+                    found = self._reverse_geocode_one(*geohash.decode(misses[key]), *args, **kwargs)
+                    if found is not None:
+                        fetched[key] = found
+            if fetched and self.reverse_cache is not None:
+                self.reverse_cache.set_many(fetched)
+            result.update(fetched)
+
+        found = [result.get(key) for key in keys.values()]
+        if single:
+            if found[0] is None:
+                raise ValueError('{} not found'.format(points))
+            return found[0]['address']
+        return [found[i] for i in inverse]
+
+    def dist_matrix_iter(self, origins, destinations, *args, **kwargs):
+        """Yields (origin, destination, {'time':x, 'dist':y}) for every cell of the origins x destinations matrix, as
+        soon as the request it is part of has finished. Cached cells (when the interpreter has a dist_cache) come
+        first, the missing cells are fetched in the fewest requests within the API's limits (see planner.plan). Cells
+        that couldn't be calculated have None as time and dist."""
+        origins = [origins] if isinstance(origins, str) else list(origins)
+        destinations = [destinations] if isinstance(destinations, str) else list(destinations)
+
+        keys = {}
+        cached = {}
+        if self.dist_cache is not None:
+            params = call_params(googlemaps.Client.distance_matrix, args, kwargs, leading=2)
+            keys = {(origin, dest): self.dist_cache.key(origin, dest, **params)
+                    for origin in origins for dest in destinations}
+            cached, _ = lookup(self.dist_cache, keys, self.metrics, 'distance_matrix')
+
+        limits = {'max_origins': self.MAX_ORIGINS, 'max_destinations': self.MAX_DESTINATIONS,
+                  'max_elements': self.MAX_ELEMENTS}
+        if cached:
+            missing = []
+            for i, origin in enumerate(origins):
+                for j, dest in enumerate(destinations):
+                    if keys[(origin, dest)] in cached:
+                        yield origin, dest, cached[keys[(origin, dest)]]
+                    else:
+                        missing.append((i, j))
+            tiles = planner.plan_missing(origins, destinations, missing, **limits)
+        else:   # The whole matrix is missing, which plan tiles without going over every cell.
+            tiles = planner.tiles(origins, destinations, **limits)
+        for origin_chunk, dest_chunk in tiles:
+            with self.metrics.timer('chunk.latency', endpoint='distance_matrix'):
+                self.metrics.count('requests', endpoint='distance_matrix')
+                self.metrics.count('elements', len(origin_chunk) * len(dest_chunk), endpoint='distance_matrix')
+                with self.metrics.timer('request.latency', endpoint='distance_matrix'):
+                    raw_result = super().distance_matrix(origin_chunk, dest_chunk, *args, **kwargs)
+                cells = []
+                fetched = {}
+                for origin, row in zip(origin_chunk, raw_result['rows']):
+                    for dest, element in zip(dest_chunk, row['elements']):
+                        cell = parse_element(element)
+                        if cell is not None and keys:
+                            fetched[keys[(origin, dest)]] = cell
+                        cells.append((origin, dest, {'dist': None, 'time': None} if cell is None else cell))
+                if fetched:
+                    self.dist_cache.set_many(fetched)
+            yield from cells    # Outside the timer, so the time the caller spends on the cells isn't counted.
 
     def dist_matrix(self, origins, destinations, *args, **kwargs):
         """Takes a list of origins and destinations and a set of parameters (please check the Python client for
         Google maps API to get more info on the parameters) and returns a nested dictionary storing the origin as key
         with another dict as value which in turn has each destination as key with another dict as value storing both
         time to travel and distance between the two. e.g. {origin: {destination: {'time':x, 'dist':y}, dest2...},
-        origin2...}"""
-
-        if destinations > 25:
-            raise ValueError("Can't calculate to more than 25 destinations at a time")
-
-        origin_chunk_size = 100//len(destinations) if len(destinations) < 4 else 25
-        chunker = Chunker(origins)
-        chunked_origins = chunker.get_chunks(origin_chunk_size)
+        origin2...}. Cells that couldn't be calculated have None as time and dist.
 
-        result = {}
-        for chunk in chunked_origins:
-            raw_result = super().distance_matrix(chunk, destinations, *args, **kwargs)
-            for i, dest in enumerate(raw_result['rows']):
-                result[chunk[i]] = {destinations[n]: {'dist': dest['elements'][n]['distance']['value'],
-                                                      'time': dest['elements'][n]['times']['value']}
-                                    for n in dest['elements']}
+        Any number of origins and destinations can be passed, they are split in requests by dist_matrix_iter. When the
+        interpreter has a dist_cache only the missing cells are fetched."""
+        origins = [origins] if isinstance(origins, str) else list(origins)
+        destinations = [destinations] if isinstance(destinations, str) else list(destinations)
 
-        return result
+        result = {origin: {} for origin in origins}
+        for origin, dest, cell in self.dist_matrix_iter(origins, destinations, *args, **kwargs):
+            result[origin][dest] = cell
+        return {origin: {dest: result[origin][dest] for dest in destinations} for origin in origins}
@@ -0,0 +1,162 @@
+import atexit
+import bisect
+import json
+import sys
+import threading
+import time
+
+# Upper bounds (seconds) of the latency histogram buckets, roughly 1-2-5 steps from 1ms to 60s.
+LATENCY_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 60)
+
+
+class _NullTimer:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class NullMetrics:
+    """The metrics interface of the interpreters, which does nothing. It's the default so instrumentation costs a
+    method call per request at most. Implement the same methods (or subclass MetricsCollector) to send the metrics
+    somewhere else.
+
+    count adds to a counter (requests, elements billed, cache hits, retries), observe records a value in a histogram
+    (seconds spent throttling) and timer is a context manager that observes the time spent in its block (latency per
+    request and per chunk). Tags are keyword arguments, e.g. endpoint='geocode'."""
+
+    enabled = False
+
+    def count(self, name, value=1, **tags):
+        pass
+
+    def observe(self, name, value, **tags):
+        pass
+
+    def timer(self, name, **tags):
+        return _NULL_TIMER
+
+
+NULL_METRICS = NullMetrics()
+
+
+class Histogram:
+    """Counts observations per bucket (bounds are the upper bounds of the buckets, everything above the last bound
+    goes in an overflow bucket) next to their count, sum, min and max."""
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        """The upper bound of the bucket holding the q quantile (the max for the overflow bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.bounds + (self.max,), self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {'count': self.count, 'sum': self.sum, 'min': self.min, 'max': self.max,
+                'mean': self.sum / self.count if self.count else None,
+                'p50': self.quantile(0.5), 'p90': self.quantile(0.9), 'p99': self.quantile(0.99),
+                'buckets': dict(zip([str(bound) for bound in self.bounds] + ['inf'], self.buckets))}
+
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'tags', 'start')
+
+    def __init__(self, metrics, name, tags):
+        self.metrics = metrics
+        self.name = name
+        self.tags = tags
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.name, time.perf_counter() - self.start, **self.tags)
+        return False
+
+
+def _key(name, tags):
+    if not tags:
+        return name
+    return '{}{{{}}}'.format(name, ','.join('{}={}'.format(key, tags[key]) for key in sorted(tags)))
+
+
+class MetricsCollector(NullMetrics):
+    """Keeps all metrics in memory: counters and histograms by name and tags. snapshot() returns them as a JSON
+    serialisable dict with keys like 'request.latency{endpoint=geocode}', dump() writes that to a file and
+    dump_at_exit() does so when the process exits, for batch jobs. Thread safe."""
+
+    enabled = True
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counters = {}
+        self.histograms = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def count(self, name, value=1, **tags):
+        key = _key(name, tags)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **tags):
+        key = _key(name, tags)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.bounds)
+            histogram.add(value)
+
+    def timer(self, name, **tags):
+        return _Timer(self, name, tags)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.started = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            return {'started': self.started,
+                    'duration': time.time() - self.started,
+                    'counters': dict(self.counters),
+                    'histograms': {key: histogram.to_dict() for key, histogram in self.histograms.items()}}
+
+    def dump(self, path=None):
+        """Writes the snapshot as JSON to path, or to stderr when there is no path."""
+        snapshot = json.dumps(self.snapshot(), indent=2, sort_keys=True)
+        if path is None:
+            sys.stderr.write(snapshot + '\n')
+        else:
+            with open(path, 'w') as f:
+                f.write(snapshot)
+
+    def dump_at_exit(self, path=None):
+        atexit.register(self.dump, path)
@@ -0,0 +1,94 @@
+import collections
+import re
+
+# Outward code (area, district and an optional sub-district letter) followed by the inward code (sector and unit).
+POSTCODE = re.compile(r'^([A-Z]{1,2}[0-9][A-Z0-9]?)([0-9][ABD-HJLNP-UW-Z]{2})$')
+POSTCODE_IN_TEXT = re.compile(r'\b([A-Z]{1,2}[0-9][A-Z0-9]?) ?([0-9][ABD-HJLNP-UW-Z]{2})\b')
+
+ABBREVIATIONS = {
+    'RD': 'ROAD', 'AVE': 'AVENUE', 'AV': 'AVENUE', 'LN': 'LANE', 'DR': 'DRIVE', 'CT': 'COURT', 'PL': 'PLACE',
+    'SQ': 'SQUARE', 'CRES': 'CRESCENT', 'GDNS': 'GARDENS', 'GRN': 'GREEN', 'GRV': 'GROVE', 'TER': 'TERRACE',
+    'TERR': 'TERRACE', 'CL': 'CLOSE', 'PK': 'PARK', 'HSE': 'HOUSE', 'BLDG': 'BUILDING', 'FLR': 'FLOOR',
+    'APT': 'APARTMENT', 'UPR': 'UPPER', 'LWR': 'LOWER', 'GT': 'GREAT', 'NTH': 'NORTH', 'STH': 'SOUTH',
+}
+
+GeocodeSummary = collections.namedtuple('GeocodeSummary', ('locations', 'unique', 'resolved', 'errors'))
+GeocodeSummary.__doc__ = """Outcome of geocode_locations: locations is the number of locations that needed a geocode,
+unique the number of distinct keys sent to the interpreter, resolved the number of locations that got one and errors
+maps the keys that failed to the reason."""
+
+
+def normalize_postcode(postcode):
+    """Returns the canonical form of a UK postcode, upper case with a single space before the inward code
+    ('sw1a2aa' -> 'SW1A 2AA'), or None when it isn't a valid postcode."""
+    compact = ''.join(str(postcode).split()).upper()
+    match = POSTCODE.match(compact)
+    if match is None:
+        return None
+    return '{} {}'.format(*match.groups())
+
+
+def _expand(part):
+    tokens = part.split()
+    for i, token in enumerate(tokens):
+        if token == 'ST':
+            # 'St' is Saint in front of a name ("12 St Johns Wood") and Street after one ("High St").
+            saint = i + 1 < len(tokens) and (i == 0 or tokens[i - 1].isdigit())
+            tokens[i] = 'SAINT' if saint else 'STREET'
+        else:
+            tokens[i] = ABBREVIATIONS.get(token, token)
+    return ' '.join(tokens)
+
+
+def normalize_address(address):
+    """Returns the canonical form of an address: upper case, punctuation other than commas removed, whitespace
+    collapsed, common street abbreviations spelled out (RD -> ROAD, AVE -> AVENUE, ST -> STREET or SAINT) and a
+    postcode in it in its canonical form, e.g. '10  Downing St., london sw1a2aa' -> '10 DOWNING STREET, LONDON SW1A
+    2AA'."""
+    text = re.sub(r"[^\w\s,]", ' ', str(address).upper())
+    parts = (_expand(part) for part in text.split(','))
+    text = ', '.join(part for part in parts if part)
+    return POSTCODE_IN_TEXT.sub(r'\1 \2', text)
+
+
+def location_key(location, precision='address'):
+    """The canonical query of a location, locations with the same key are geocoded once. With precision 'address' it
+    is the normalized address followed by the postcode (when it isn't part of the address already), with precision
+    'postcode' it's the postcode only, so everyone in a postcode shares one geocode. Falls back to whatever the
+    location has, and to the raw postcode when it isn't a valid one."""
+    if precision not in ('address', 'postcode'):
+        raise ValueError("precision should be 'address' or 'postcode' got {}".format(precision))
+    postcode = None
+    if location.postcode:
+        postcode = normalize_postcode(location.postcode) or ' '.join(str(location.postcode).split()).upper()
+    if precision == 'postcode' and postcode or not location.address:
+        return postcode
+    address = normalize_address(location.address)
+    if postcode and postcode not in address:
+        address = '{}, {}'.format(address, postcode)
+    return address
+
+
+def group_locations(locations, precision='address'):
+    """Groups the locations by their key: returns {key: [location, ...]} in order of first appearance. Keys are
+    hashed by the dict, so grouping is linear in the number of locations."""
+    groups = {}
+    for location in locations:
+        groups.setdefault(location_key(location, precision), []).append(location)
+    return groups
+
+
+def geocode_locations(interpreter, locations, precision='address', overwrite=False):
+    """Geocodes the locations with the interpreter, sending every distinct key (see location_key) once and setting
+    geo and google_place_id on all locations sharing it. Locations that already have a geo are skipped unless
+    overwrite is set. Keys that can't be geocoded are reported in the summary, their locations are left as they are.
+    Returns a GeocodeSummary."""
+    groups = group_locations((location for location in locations if overwrite or location.geo is None), precision)
+    results, errors = interpreter.try_geocode(groups)
+    resolved = 0
+    for key, result in results.items():
+        for location in groups[key]:
+            location.geo = result['geo']
+            location.google_place_id = result['place_id']
+        resolved += len(groups[key])
+    return GeocodeSummary(sum(len(group) for group in groups.values()), len(groups), resolved, errors)
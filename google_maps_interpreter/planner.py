@@ -0,0 +1,87 @@
+import math
+
+MAX_ORIGINS = 25
+MAX_DESTINATIONS = 25
+MAX_ELEMENTS = 100
+
+
+def _bands(n, n_other, max_band, max_other, max_elements):
+    """Splits n items in bands and every band in chunks of the other axis. Returns the cheapest list of band widths
+    and the number of requests it takes. A band of width w can be combined with min(max_other, max_elements // w)
+    items of the other axis per request, so narrow and wide bands can be mixed to fill the element limit. Solved with
+    dynamic programming over n."""
+    def cost(width):
+        return math.ceil(n_other / min(max_other, max_elements // width, n_other))
+
+    widths = range(1, min(max_band, max_elements, n) + 1)
+    best = [0] + [math.inf] * n
+    choice = [0] * (n + 1)
+    for m in range(1, n + 1):
+        for width in widths:
+            if width > m:
+                break
+            calls = best[m - width] + cost(width)
+            if calls < best[m]:
+                best[m], choice[m] = calls, width
+
+    bands = []
+    m = n
+    while m:
+        bands.append(choice[m])
+        m -= choice[m]
+    return bands[::-1], best[n]
+
+
+def plan(n_origins, n_destinations, max_origins=MAX_ORIGINS, max_destinations=MAX_DESTINATIONS,
+         max_elements=MAX_ELEMENTS):
+    """Tiles an n_origins x n_destinations distance matrix in requests that respect the limits on origins,
+    destinations and elements per request. Both splitting the destinations in bands (and the origins within every
+    band) and the other way around are planned, the one with the fewest requests is returned as a list of
+    (origin slice, destination slice)."""
+    if not n_origins or not n_destinations:
+        return []
+
+    dest_bands, dest_calls = _bands(n_destinations, n_origins, max_destinations, max_origins, max_elements)
+    origin_bands, origin_calls = _bands(n_origins, n_destinations, max_origins, max_destinations, max_elements)
+
+    tiles = []
+    if dest_calls <= origin_calls:
+        start = 0
+        for width in dest_bands:
+            size = min(max_origins, max_elements // width)
+            for origin_start in range(0, n_origins, size):
+                tiles.append((slice(origin_start, min(origin_start + size, n_origins)), slice(start, start + width)))
+            start += width
+    else:
+        start = 0
+        for width in origin_bands:
+            size = min(max_destinations, max_elements // width)
+            for dest_start in range(0, n_destinations, size):
+                tiles.append((slice(start, start + width), slice(dest_start, min(dest_start + size, n_destinations))))
+            start += width
+    return tiles
+
+
+def tiles(origins, destinations, **limits):
+    """Same as plan but returns the tiles as (origins, destinations) lists."""
+    return [(origins[o], destinations[d]) for o, d in plan(len(origins), len(destinations), **limits)]
+
+
+def plan_missing(origins, destinations, missing, **limits):
+    """Plans the requests to fetch only the missing (origin index, destination index) cells. Origins missing the same
+    set of destinations are grouped together so each group is a full rectangle, this is compared with simply fetching
+    the rectangle of every origin and destination with a missing cell and the plan with the fewest requests is
+    returned as a list of (origins, destinations)."""
+    groups = {}
+    for i, j in missing:
+        groups.setdefault(i, set()).add(j)
+    by_signature = {}
+    for i, columns in groups.items():
+        by_signature.setdefault(tuple(sorted(columns)), []).append(i)
+
+    grouped = []
+    for columns, rows in by_signature.items():
+        grouped.extend(tiles([origins[i] for i in rows], [destinations[j] for j in columns], **limits))
+    rectangle = tiles([origins[i] for i in sorted(groups)],
+                      [destinations[j] for j in sorted({j for _, j in missing})], **limits)
+    return rectangle if len(rectangle) <= len(grouped) else grouped
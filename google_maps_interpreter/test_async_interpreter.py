@@ -0,0 +1,151 @@
+import asyncio
+import gc
+import time
+import unittest
+import googlemaps
+from google_maps_interpreter import planner
+from google_maps_interpreter.async_interpreter import AsyncGoogleInterpreter, TokenBucket
+from google_maps_interpreter.cache import DistanceCache, SQLiteCache
+from google_maps_interpreter.fake_client import FakeServer, PlacesTestCase
+
+
+class DenyingServer(FakeServer):
+    """Denies the geocode requests for the addresses in denied, and the distance matrix requests with one of them as
+    an origin."""
+
+    def __init__(self, places, denied):
+        super().__init__(places)
+        self.denied = denied
+
+    def respond(self, path, params):
+        if params.get('address') in self.denied or self.denied & set(params.get('origins', '').split('|')):
+            return {'status': 'REQUEST_DENIED', 'results': [], 'rows': []}
+        return super().respond(path, params)
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_rate(self):
+        async def run():
+            bucket = TokenBucket(rate=100, capacity=10)
+            start = time.monotonic()
+            for _ in range(30):
+                await bucket.acquire()
+            return time.monotonic() - start
+
+        self.assertGreaterEqual(asyncio.run(run()), 0.18)
+
+
+class TestAsyncGoogleInterpreter(PlacesTestCase):
+
+    def run_with(self, server, coroutine, **kwargs):
+        async def run():
+            async with AsyncGoogleInterpreter('key', base_url=server.url, queries_per_second=1000, backoff=0.01,
+                                              **kwargs) as interpreter:
+                return await coroutine(interpreter), interpreter
+        return asyncio.run(run())
+
+    def test_geocode(self):
+        cache = SQLiteCache()
+        with FakeServer(self.places) as server:
+            result, _ = self.run_with(server, lambda i: i.geocode(self.origins + ['ORIGIN 1']), cache=cache)
+            self.assertEqual(server.requests, 30)
+            self.assertEqual(result['ORIGIN 1'], result['origin 1'])
+            self.assertEqual(result['origin 2']['geo'], {'lat': 51.52, 'lng': -0.1})
+
+            self.run_with(server, lambda i: i.geocode(self.origins[:5]), cache=cache)
+            self.assertEqual(server.requests, 30)
+
+            with self.assertRaises(ValueError):
+                self.run_with(server, lambda i: i.geocode(['bhskyf']))
+
+    def test_geocode_failure(self):
+        cache = SQLiteCache()
+        with DenyingServer(self.places, denied={'origin 7'}) as server:
+            with self.assertRaises(googlemaps.exceptions.ApiError):
+                self.run_with(server, lambda i: i.geocode(self.origins[:20]), cache=cache)
+            self.assertEqual(server.requests, 19)
+
+            # Only the denied address is sent again, the others were cached before the error was raised.
+            server.denied = set()
+            result, _ = self.run_with(server, lambda i: i.geocode(self.origins[:20]), cache=cache)
+            self.assertEqual(server.requests, 20)
+            self.assertEqual(result['origin 7']['geo'], {'lat': 51.57, 'lng': -0.1})
+
+    def test_reverse_geocode(self):
+        cache = SQLiteCache(table='reverse_geocode')
+        points = [(51.5 + i / 100 + 0.0001, -0.1001) for i in range(30)] * 3 + [(40.0, -3.7)]
+        with FakeServer(self.places) as server:
+            result, _ = self.run_with(server, lambda i: i.reverse_geocode(points), reverse_cache=cache)
+            self.assertEqual(server.requests, 31)
+            self.assertEqual([found['address'] for found in result[61:90]], self.origins[1:])
+            self.assertIsNone(result[90])
+
+            result, _ = self.run_with(server, lambda i: i.reverse_geocode({'lat': 51.52, 'lng': -0.1}),
+                                      reverse_cache=cache)
+            self.assertEqual(result, 'origin 2')
+            self.assertEqual(server.requests, 31)
+
+    def test_retry(self):
+        with FakeServer(self.places, over_query_limit=3) as server:
+            result, interpreter = self.run_with(server, lambda i: i.geocode(self.origins[:2]), concurrency=1)
+            self.assertEqual(len(result), 2)
+            self.assertEqual(interpreter.retries, 3)
+
+        with FakeServer(self.places, over_query_limit=10) as server:
+            with self.assertRaises(googlemaps.exceptions.ApiError):
+                self.run_with(server, lambda i: i.geocode('origin 1'), max_retries=2)
+
+    def test_dist_matrix(self):
+        dist_cache = DistanceCache()
+        with FakeServer(self.places) as server:
+            result, _ = self.run_with(server, lambda i: i.dist_matrix(self.origins, self.destinations),
+                                      dist_cache=dist_cache)
+            self.assertEqual(server.requests, 6)
+            self.assertEqual(list(result), self.origins)
+            self.assertEqual(list(result['origin 3']), self.destinations)
+            self.assertEqual(result['origin 0']['destination 0']['dist'], 0)
+            self.assertGreater(result['origin 5']['destination 5']['time'], 0)
+
+            self.run_with(server, lambda i: i.dist_matrix(self.origins[:10], self.destinations),
+                          dist_cache=dist_cache)
+            self.assertEqual(server.requests, 6)
+
+
+    def test_dist_matrix_failure(self):
+        dist_cache = DistanceCache()
+        tiles = planner.tiles(self.origins, self.destinations)
+        denied = sum('origin 3' in origins for origins, _ in tiles)
+        with DenyingServer(self.places, denied={'origin 3'}) as server:
+            with self.assertRaises(googlemaps.exceptions.ApiError):
+                self.run_with(server, lambda i: i.dist_matrix(self.origins, self.destinations),
+                              dist_cache=dist_cache)
+            self.assertEqual(server.requests, len(tiles) - denied)
+
+            # Only the denied tiles are sent again, the others were cached.
+            server.denied = set()
+            result, _ = self.run_with(server, lambda i: i.dist_matrix(self.origins, self.destinations),
+                                      dist_cache=dist_cache)
+            self.assertLessEqual(server.requests, len(tiles))
+            self.assertGreater(result['origin 3']['destination 0']['time'], 0)
+
+    def test_dist_matrix_stopped(self):
+        lost = []
+
+        async def first_cell(interpreter):
+            asyncio.get_running_loop().set_exception_handler(lambda loop, context: lost.append(context))
+            cells = interpreter.dist_matrix_iter(self.origins, self.destinations)
+            cell = await cells.__anext__()
+            await cells.aclose()
+            await asyncio.sleep(0.05)
+            gc.collect()
+            return cell
+
+        with DenyingServer(self.places, denied={'origin 29'}) as server:
+            (origin, destination, cell), _ = self.run_with(server, first_cell, concurrency=1)
+        self.assertIn(origin, self.origins)
+        self.assertEqual(lost, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+import googlemaps
+from google_maps_interpreter.batch import GeocodeJob, JobSummary
+from google_maps_interpreter.cache import SQLiteCache
+from google_maps_interpreter.fake_client import FakeClient, FakeInterpreter
+from google_maps_interpreter.interpreter import GoogleInterpreter
+
+
+class CrashingClient(FakeClient):
+    """Crashes (with an error the job doesn't handle) on the request after crash_after requests and answers 'api
+    error' with an ApiError."""
+
+    def __init__(self, *args, crash_after=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.crash_after = crash_after
+
+    def geocode(self, address=None, *args, **kwargs):
+        if self.calls['geocode'] == self.crash_after:
+            raise KeyboardInterrupt
+        if address == 'api error':
+            self.calls['geocode'] += 1
+            raise googlemaps.exceptions.ApiError('INVALID_REQUEST')
+        return super().geocode(address, *args, **kwargs)
+
+
+class CrashingInterpreter(GoogleInterpreter, CrashingClient):
+    GEOCODE_PAUSE = 0
+
+
+class TestGeocodeJob(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'geocode.jsonl')
+        self.places = {'address {}'.format(i): (51.5 + i / 1000, -0.1) for i in range(100)}
+        self.addresses = ['address {}'.format(i) for i in range(100)]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_run(self):
+        summaries = []
+        job = GeocodeJob(FakeInterpreter(places=self.places), self.path, chunk_size=30)
+        summary = job.run(iter(self.addresses), progress=summaries.append)
+        self.assertEqual(summary, JobSummary(100, 100, 0, 4))
+        self.assertEqual([s.offset for s in summaries], [30, 60, 90, 100])
+
+        results = dict(job.results())
+        self.assertEqual(len(results), 100)
+        self.assertEqual(results['address 10']['geo'], {'lat': 51.51, 'lng': -0.1})
+        self.assertEqual(list(job.dead_letters()), [])
+
+    def test_dead_letters(self):
+        interpreter = CrashingInterpreter(places=self.places)
+        addresses = self.addresses[:5] + ['unknown', 'api error', 'UNKNOWN ', 'address 1']
+        summary = GeocodeJob(interpreter, self.path, chunk_size=4).run(addresses)
+        self.assertEqual(summary, JobSummary(9, 6, 3, 3))
+
+        dead = list(GeocodeJob(interpreter, self.path).dead_letters())
+        self.assertEqual(dead[0], ('unknown', 'NOT_FOUND'))
+        self.assertEqual(dead[1][0], 'api error')
+        self.assertTrue(dead[1][1].startswith('ApiError'))
+        self.assertEqual(dead[2], ('UNKNOWN ', 'NOT_FOUND'))
+        self.assertEqual(interpreter.calls['geocode'], 8)
+
+    def test_resume(self):
+        crashing = CrashingInterpreter(places=self.places, crash_after=45)
+        with self.assertRaises(KeyboardInterrupt):
+            GeocodeJob(crashing, self.path, chunk_size=20).run(self.addresses)
+        with open(self.path, 'a') as f:
+            f.write('{"address": "address 40", "res')    # A line cut off by the crash.
+
+        interpreter = FakeInterpreter(places=self.places)
+        job = GeocodeJob(interpreter, self.path, chunk_size=20)
+        self.assertEqual(job.summary, JobSummary(40, 40, 0, 2))
+        self.assertEqual(job.run(self.addresses), JobSummary(100, 100, 0, 5))
+        self.assertEqual(interpreter.calls['geocode'], 60)
+        self.assertEqual([address for address, _ in job.results()], self.addresses)
+
+        self.assertEqual(job.run(self.addresses), JobSummary(100, 100, 0, 5))
+        self.assertEqual(interpreter.calls['geocode'], 60)
+
+    def test_cache(self):
+        cache = SQLiteCache()
+        interpreter = FakeInterpreter(places=self.places, cache=cache)
+        interpreter.geocode(self.addresses[:50])
+        GeocodeJob(interpreter, self.path).run(self.addresses)
+        self.assertEqual(interpreter.calls['geocode'], 100)
+        self.assertEqual(len(cache), 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from google_maps_interpreter.cache import SQLiteCache, normalize_key
+from google_maps_interpreter.fake_client import FakeInterpreter
+
+
+class TestSQLiteCache(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        self.cache = SQLiteCache(ttl=60, max_entries=3, clock=lambda: self.now)
+
+    def test_normalize_key(self):
+        self.assertEqual(normalize_key('  ec4m   8ad '), 'EC4M 8AD')
+
+    def test_get_set(self):
+        self.cache.set_many({'a': {'geo': {'lat': 1, 'lng': 2}}, 'b': 2})
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']), {'a': {'geo': {'lat': 1, 'lng': 2}}, 'b': 2})
+        self.assertEqual(self.cache.hits, 2)
+        self.assertEqual(self.cache.misses, 1)
+        self.assertEqual(self.cache.get('c', 'NA'), 'NA')
+
+    def test_ttl(self):
+        self.cache.set('a', 1)
+        self.now += 61
+        self.assertNotIn('a', self.cache)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_lru(self):
+        self.cache.set_many({'a': 1, 'b': 2, 'c': 3})
+        self.now += 1
+        self.cache.get('a')
+        self.now += 1
+        self.cache.set('d', 4)
+        self.assertEqual(set(self.cache.get_many(['a', 'b', 'c', 'd'])), {'a', 'c', 'd'})
+
+    def test_persistent(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'geocode.sqlite')
+            cache = SQLiteCache(path)
+            cache.set('a', 1)
+            cache.close()
+            self.assertEqual(SQLiteCache(path).get('a'), 1)
+
+
+class TestCachedGeocode(unittest.TestCase):
+
+    def setUp(self):
+        places = {'EC4M 8AD': (51.513723, -0.099858), 'SW1A 1AA': (51.501009, -0.141588)}
+        self.cache = SQLiteCache()
+        self.interpreter = FakeInterpreter(places=places, cache=self.cache)
+
+    def test_single(self):
+        self.assertEqual(self.interpreter.geocode('EC4M 8AD'),
+                         {'EC4M 8AD': {'geo': {'lat': 51.513723, 'lng': -0.099858}, 'place_id': 'place-EC4M 8AD'}})
+        with self.assertRaises(ValueError):
+            self.interpreter.geocode('bhskyf')
+
+    def test_only_misses_upstream(self):
+        self.interpreter.geocode('EC4M 8AD')
+        result = self.interpreter.geocode(['ec4m 8ad', 'SW1A 1AA', 'EC4M  8AD', 'SW1A 1AA'])
+
+        self.assertEqual(self.interpreter.calls['geocode'], 2)
+        self.assertEqual(result['ec4m 8ad'], result['EC4M  8AD'])
+        self.assertEqual(result['SW1A 1AA']['geo'], {'lat': 51.501009, 'lng': -0.141588})
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_params(self):
+        self.interpreter.geocode('EC4M 8AD')
+        self.interpreter.geocode('EC4M 8AD', region='uk')
+        self.interpreter.geocode('EC4M 8AD', components={'country': 'GB'}, language='en')
+        self.assertEqual(self.interpreter.calls['geocode'], 3)
+        self.interpreter.geocode('EC4M 8AD', None, None, None, 'uk')
+        self.interpreter.geocode(['EC4M 8AD'], language='en', components={'country': 'GB'})
+        self.assertEqual(self.interpreter.calls['geocode'], 3)
+
+    def test_failed_chunk_keeps_found(self):
+        with self.assertRaises(ValueError):
+            self.interpreter.geocode(['EC4M 8AD', 'bhskyf'])
+        self.assertIn('EC4M 8AD', self.cache)
+
+    @mock.patch('time.sleep')
+    @mock.patch.object(FakeInterpreter, 'GEOCODE_PAUSE', 1)
+    def test_chunks(self, sleep):
+        places = {'address {}'.format(i): (i, i) for i in range(120)}
+        interpreter = FakeInterpreter(places=places)
+        result = interpreter.geocode(list(places))
+
+        self.assertEqual(len(result), 120)
+        self.assertEqual(sleep.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import datetime
+import unittest
+from unittest import mock
+from google_maps_interpreter import planner
+from google_maps_interpreter.cache import DistanceCache
+from google_maps_interpreter.fake_client import FakeInterpreter, PlacesTestCase
+
+
+class TestDistMatrix(PlacesTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.dist_cache = DistanceCache()
+        self.interpreter = FakeInterpreter(places=self.places, dist_cache=self.dist_cache)
+
+    def test_uncached(self):
+        interpreter = FakeInterpreter(places=self.places)
+        result = interpreter.dist_matrix(self.origins[:4], self.destinations[:3])
+        self.assertEqual(list(result), self.origins[:4])
+        self.assertEqual(list(result['origin 0']), self.destinations[:3])
+        self.assertEqual(set(result['origin 0']['destination 1']), {'time', 'dist'})
+        self.assertEqual(interpreter.calls['distance_matrix'], 1)
+        self.assertEqual(interpreter.dist_matrix('origin 0', 'unknown'), {'origin 0': {'unknown': {'dist': None,
+                                                                                                   'time': None}}})
+
+    def test_large(self):
+        interpreter = FakeInterpreter(places=self.places)
+        result = interpreter.dist_matrix(self.origins, self.destinations + self.origins[:10])
+        self.assertEqual(len(result), 30)
+        self.assertEqual(len(result['origin 29']), 30)
+        self.assertEqual(interpreter.calls['distance_matrix'], 9)
+
+        cells = list(interpreter.dist_matrix_iter(self.origins[:4], self.destinations[:2]))
+        self.assertEqual(len(cells), 8)
+
+    def test_partial_hits(self):
+        first = self.interpreter.dist_matrix(self.origins[:10], self.destinations[:10])
+        self.assertEqual(self.interpreter.elements, 100)
+
+        second = self.interpreter.dist_matrix(self.origins[:20], self.destinations[:10])
+        self.assertEqual(self.interpreter.elements, 200)   # Only the 10 new origins are fetched.
+        self.assertEqual(self.interpreter.calls['distance_matrix'], 2)
+        self.assertEqual({o: second[o] for o in self.origins[:10]}, first)
+
+        self.interpreter.dist_matrix(self.origins[:20], self.destinations[:10])
+        self.assertEqual(self.interpreter.calls['distance_matrix'], 2)
+        self.assertEqual(self.dist_cache.hits, 100 + 200)
+
+    def test_full_grid(self):
+        # Without cached cells the whole grid is tiled at once, plan_missing only runs for partial hits.
+        with mock.patch.object(planner, 'plan_missing', wraps=planner.plan_missing) as plan_missing:
+            FakeInterpreter(places=self.places).dist_matrix(self.origins, self.destinations)
+            self.interpreter.dist_matrix(self.origins[:10], self.destinations)
+            self.assertEqual(plan_missing.call_count, 0)
+            self.interpreter.dist_matrix(self.origins[:20], self.destinations)
+            self.assertEqual(plan_missing.call_count, 1)
+        self.assertEqual(self.interpreter.elements, 400)
+
+    def test_keys(self):
+        self.interpreter.dist_matrix(self.origins[:2], self.destinations[:2])
+        self.interpreter.dist_matrix(self.origins[:2], self.destinations[:2], mode='walking')
+        self.assertEqual(self.interpreter.elements, 8)
+
+        departure = datetime.datetime(2024, 1, 1, 8, 1)
+        self.interpreter.dist_matrix(self.origins[:2], self.destinations[:2], departure_time=departure)
+        self.interpreter.dist_matrix(self.origins[:2], self.destinations[:2],
+                                     departure_time=departure + datetime.timedelta(minutes=5))
+        self.assertEqual(self.interpreter.elements, 12)
+
+        self.interpreter.dist_matrix(self.origins[:2], self.destinations[:2], avoid=['tolls', 'ferries'])
+        self.interpreter.dist_matrix(self.origins[:2], self.destinations[:2], avoid=['ferries', 'tolls'])
+        self.interpreter.dist_matrix(self.origins[:2], self.destinations[:2], avoid='tolls')
+        self.interpreter.dist_matrix(self.origins[:2], self.destinations[:2], mode='transit', transit_mode='rail')
+        self.interpreter.dist_matrix(self.origins[:2], self.destinations[:2], mode='transit', transit_mode='bus')
+        self.assertEqual(self.interpreter.elements, 28)
+
+        driving = self.interpreter.dist_matrix('origin 0', 'origin 9')
+        walking = self.interpreter.dist_matrix('origin 0', 'origin 9', 'walking')
+        self.assertEqual(self.interpreter.elements, 30)
+        self.assertGreater(walking['origin 0']['origin 9']['time'], driving['origin 0']['origin 9']['time'])
+        self.assertEqual(self.interpreter.dist_matrix('origin 0', 'origin 9', mode='walking'), walking)
+        self.assertEqual(self.interpreter.elements, 30)
+
+        self.assertEqual(self.dist_cache.key('a', 'b', units=None), self.dist_cache.key('a', 'b'))
+        self.assertNotEqual(self.dist_cache.key('a', 'b', units='imperial'), self.dist_cache.key('a', 'b'))
+        self.assertNotEqual(self.dist_cache.key('a', 'b', traffic_model='pessimistic'),
+                            self.dist_cache.key('a', 'b', traffic_model='optimistic'))
+
+    def test_symmetric(self):
+        interpreter = FakeInterpreter(places=self.places, dist_cache=DistanceCache(symmetric=True))
+        interpreter.dist_matrix(self.origins[:2], self.destinations[:2])
+        interpreter.dist_matrix(self.destinations[:2], self.origins[:2])
+        self.assertEqual(interpreter.elements, 4)
+
+    def test_plan(self):
+        missing = [(i, j) for i in range(30) for j in range(20) if i < 5 or j < 2]
+        tiles = planner.plan_missing(self.origins, self.destinations, missing)
+        cells = {(o, d) for origins, destinations in tiles for o in origins for d in destinations}
+
+        self.assertTrue({(self.origins[i], self.destinations[j]) for i, j in missing} <= cells)
+        self.assertEqual(len(tiles), 2)
+        for origins, destinations in tiles:
+            self.assertLessEqual(len(origins) * len(destinations), 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
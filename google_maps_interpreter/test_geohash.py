@@ -0,0 +1,96 @@
+import unittest
+import numpy as np
+from google_maps_interpreter import geohash
+from google_maps_interpreter.cache import SQLiteCache
+from google_maps_interpreter.fake_client import FakeInterpreter
+from google_maps_interpreter.metrics import MetricsCollector
+
+
+class TestGeohash(unittest.TestCase):
+
+    def test_encode(self):
+        self.assertEqual(geohash.encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(geohash.encode(42.605, -5.603, 5), 'ezs42')
+        self.assertEqual(geohash.encode(-90, -180, 3), '000')
+        self.assertEqual(geohash.encode(90, 180, 3), 'zzz')
+        with self.assertRaises(ValueError):
+            geohash.encode(0, 0, 13)
+
+    def test_decode(self):
+        south, west, north, east = geohash.bounds('ezs42')
+        self.assertAlmostEqual(south, 42.5830078125)
+        self.assertAlmostEqual(east, -5.5810546875)
+        lat, lng = geohash.decode('u4pruydqqvj')
+        self.assertAlmostEqual(lat, 57.64911, places=4)
+        self.assertAlmostEqual(lng, 10.40744, places=4)
+        self.assertEqual(geohash.encode(*geohash.decode('gcpuvpg')), 'gcpuvpg')
+        with self.assertRaises(ValueError):
+            geohash.decode('gcpa')
+
+    def test_snap(self):
+        rng = np.random.default_rng(0)
+        lats, lngs = rng.uniform(51.4, 51.6, 1000), rng.uniform(-0.2, 0.0, 1000)
+        cells, inverse = geohash.snap(lats, lngs, 5)
+        self.assertEqual(len(cells), len(set(cells)))
+        self.assertEqual(cells[0], geohash.encode(lats[0], lngs[0], 5))
+        self.assertEqual([cells[i] for i in inverse], [geohash.encode(lat, lng, 5) for lat, lng in zip(lats, lngs)])
+
+
+class TestReverseGeocode(unittest.TestCase):
+
+    def setUp(self):
+        self.places = {'Downing Street': (51.5034, -0.1276), 'Fleet Street': (51.5138, -0.0984)}
+
+    def test_single(self):
+        interpreter = FakeInterpreter(places=self.places)
+        self.assertEqual(interpreter.reverse_geocode({'lat': 51.5035, 'lng': -0.1275}), 'Downing Street')
+        with self.assertRaises(ValueError):
+            interpreter.reverse_geocode({'lat': 40.0, 'lng': -3.7})
+        with self.assertRaises(ValueError):
+            interpreter.reverse_geocode('hbhd')
+        with self.assertRaises(KeyError):
+            interpreter.reverse_geocode({'lat': 51, 'lon': 0})
+        with self.assertRaises(ValueError):
+            interpreter.reverse_geocode({'lat': 115, 'lng': 158})
+
+    def test_batch(self):
+        metrics = MetricsCollector()
+        cache = SQLiteCache(table='reverse_geocode')
+        interpreter = FakeInterpreter(places=self.places, reverse_cache=cache, metrics=metrics)
+        rng = np.random.default_rng(0)
+        around = [(51.5034 + dlat, -0.1276 + dlng) for dlat, dlng in rng.uniform(-0.0003, 0.0003, (500, 2))]
+        points = around + [(51.5138, -0.0984), {'lat': 40.0, 'lng': -3.7}]
+
+        results = interpreter.reverse_geocode(points)
+        self.assertEqual(len(results), 502)
+        self.assertEqual({result['address'] for result in results[:500]}, {'Downing Street'})
+        self.assertEqual(results[500], {'address': 'Fleet Street', 'place_id': 'place-Fleet Street'})
+        self.assertIsNone(results[501])
+        cells = len(set(geohash.encode(lat, lng) for lat, lng in around)) + 2
+        self.assertEqual(interpreter.calls['reverse_geocode'], cells)
+        self.assertLess(cells, 20)
+
+        # Resolved cells come from the cache, the unresolved one is tried again.
+        results = interpreter.reverse_geocode(np.array(around[:100] + [(40.0, -3.7)]))
+        self.assertEqual(results[0]['address'], 'Downing Street')
+        self.assertEqual(interpreter.calls['reverse_geocode'], cells + 1)
+        counters = metrics.snapshot()['counters']
+        self.assertEqual(counters['requests{endpoint=reverse_geocode}'], cells + 1)
+        self.assertEqual(counters['cache.misses{endpoint=reverse_geocode}'], cells + 1)
+
+        # Other request parameters are other cache entries.
+        interpreter.reverse_geocode([(51.5138, -0.0984)], language='en')
+        interpreter.reverse_geocode([(51.5138, -0.0984)], None, None, 'en')
+        self.assertEqual(interpreter.calls['reverse_geocode'], cells + 2)
+
+    def test_precision(self):
+        interpreter = FakeInterpreter(places=self.places)
+        points = [(51.5034, -0.1276), (51.5038, -0.1270)]
+        interpreter.reverse_geocode(points, precision=5)
+        self.assertEqual(interpreter.calls['reverse_geocode'], 1)
+        interpreter.reverse_geocode(points, precision=9)
+        self.assertEqual(interpreter.calls['reverse_geocode'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
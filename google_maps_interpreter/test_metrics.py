@@ -0,0 +1,136 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+from google_maps_interpreter.async_interpreter import AsyncGoogleInterpreter
+from google_maps_interpreter.cache import DistanceCache, SQLiteCache
+from google_maps_interpreter.fake_client import FakeInterpreter, FakeServer, PlacesTestCase
+from google_maps_interpreter.interpreter import GoogleInterpreter, lookup
+from google_maps_interpreter.metrics import MetricsCollector, NullMetrics, Histogram, NULL_METRICS
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_null(self):
+        metrics = NullMetrics()
+        metrics.count('requests', endpoint='geocode')
+        with metrics.timer('request.latency'):
+            pass
+        self.assertFalse(metrics.enabled)
+        self.assertIs(FakeInterpreter().metrics, NULL_METRICS)
+
+    def test_histogram(self):
+        histogram = Histogram(bounds=(1, 2, 5))
+        for value in (0.5, 1.5, 1.5, 3, 10):
+            histogram.add(value)
+        self.assertEqual(histogram.buckets, [1, 2, 1, 1])
+        self.assertEqual(histogram.quantile(0.5), 2)
+        self.assertEqual(histogram.quantile(1), 10)
+        self.assertEqual(histogram.to_dict()['mean'], 3.3)
+        self.assertIsNone(Histogram().quantile(0.5))
+
+    def test_collector(self):
+        metrics = MetricsCollector()
+        metrics.count('requests', endpoint='geocode')
+        metrics.count('requests', 2, endpoint='geocode')
+        metrics.count('elements', 10)
+        with metrics.timer('request.latency', endpoint='geocode'):
+            pass
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['counters'], {'requests{endpoint=geocode}': 3, 'elements': 10})
+        self.assertEqual(snapshot['histograms']['request.latency{endpoint=geocode}']['count'], 1)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'metrics.json')
+            metrics.dump(path)
+            with open(path) as f:
+                self.assertEqual(json.load(f)['counters']['elements'], 10)
+
+        metrics.reset()
+        self.assertEqual(metrics.snapshot()['counters'], {})
+
+
+class TestInterpreterMetrics(PlacesTestCase):
+
+    N_ORIGINS = 60
+
+    def test_geocode(self):
+        metrics = MetricsCollector()
+        interpreter = FakeInterpreter(places=self.places, cache=SQLiteCache(), metrics=metrics)
+        interpreter.geocode(self.origins)
+        interpreter.geocode(self.origins[:10])
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['counters']['requests{endpoint=geocode}'], 60)
+        self.assertEqual(snapshot['counters']['cache.hits{endpoint=geocode}'], 10)
+        self.assertEqual(snapshot['counters']['cache.misses{endpoint=geocode}'], 60)
+        self.assertEqual(snapshot['histograms']['request.latency{endpoint=geocode}']['count'], 60)
+        self.assertEqual(snapshot['histograms']['chunk.latency{endpoint=geocode}']['count'], 2)
+
+    def test_dist_matrix(self):
+        metrics = MetricsCollector()
+        interpreter = FakeInterpreter(places=self.places, dist_cache=DistanceCache(), metrics=metrics)
+        interpreter.dist_matrix(self.origins[:10], self.destinations[:10])
+        interpreter.dist_matrix(self.origins[:10], self.destinations[:10])
+
+        counters = metrics.snapshot()['counters']
+        self.assertEqual(counters['elements{endpoint=distance_matrix}'], interpreter.elements)
+        self.assertEqual(counters['requests{endpoint=distance_matrix}'], interpreter.calls['distance_matrix'])
+        self.assertEqual(counters['cache.hits{endpoint=distance_matrix}'], 100)
+        self.assertEqual(counters['cache.misses{endpoint=distance_matrix}'], 100)
+
+    def test_lookup(self):
+        metrics = MetricsCollector()
+        cache = SQLiteCache()
+        cache.set_many({'A': 1})
+        keys = {'a': 'A', ' a ': 'A', 'b': 'B', 'B': 'B'}
+        self.assertEqual(lookup(cache, keys, metrics, 'geocode'), ({'A': 1}, {'B': 'b'}))
+        self.assertEqual(metrics.snapshot()['counters'], {'cache.hits{endpoint=geocode}': 1,
+                                                          'cache.misses{endpoint=geocode}': 1})
+
+        self.assertEqual(lookup(None, keys, metrics, 'geocode'), ({}, {'A': 'a', 'B': 'b'}))
+        self.assertEqual(metrics.snapshot()['counters']['cache.misses{endpoint=geocode}'], 1)
+
+    @mock.patch('googlemaps.client.time.sleep')
+    def test_retries(self, sleep):
+        metrics = MetricsCollector()
+        with FakeServer(self.places, over_query_limit=2) as server:
+            interpreter = GoogleInterpreter(key='AIzaFakeKey', base_url=server.url, metrics=metrics)
+            interpreter.geocode(self.origins[:2])
+            server.over_query_limit = server.requests + 1
+            interpreter.reverse_geocode({'lat': 51.5, 'lng': -0.1})
+            server.over_query_limit = server.requests + 1
+            interpreter.dist_matrix(self.origins[:2], self.destinations[:2])
+
+        counters = metrics.snapshot()['counters']
+        self.assertEqual(counters['retries{endpoint=geocode}'], 2)
+        self.assertEqual(counters['retries{endpoint=reverse_geocode}'], 1)
+        self.assertEqual(counters['retries{endpoint=distance_matrix}'], 1)
+        self.assertEqual(counters['requests{endpoint=geocode}'], 2)
+
+    def test_async(self):
+        metrics = MetricsCollector()
+
+        async def run(url):
+            async with AsyncGoogleInterpreter('key', base_url=url, queries_per_second=1000, backoff=0.01,
+                                              concurrency=1, metrics=metrics) as interpreter:
+                await interpreter.geocode(self.origins[:3])
+                await interpreter.dist_matrix(self.origins[:10], self.destinations[:10])
+                return interpreter
+
+        with FakeServer(self.places, over_query_limit=2) as server:
+            interpreter = asyncio.run(run(server.url))
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['counters']['retries{endpoint=geocode}'], 2)
+        self.assertEqual(snapshot['counters']['requests{endpoint=geocode}'], 5)
+        self.assertEqual(snapshot['counters']['elements{endpoint=distance_matrix}'], 100)
+        self.assertEqual(snapshot['histograms']['throttle{endpoint=geocode}']['count'], 5)
+        self.assertEqual(snapshot['histograms']['chunk.latency{endpoint=distance_matrix}']['count'], 1)
+        self.assertEqual(interpreter.retries, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import googlemaps
+from locations import Origin, Destination
+from google_maps_interpreter.cache import SQLiteCache
+from google_maps_interpreter.fake_client import FakeClient
+from google_maps_interpreter.interpreter import GoogleInterpreter
+from google_maps_interpreter.normalize import (normalize_postcode, normalize_address, location_key, group_locations,
+                                               geocode_locations, GeocodeSummary)
+
+
+class FailingClient(FakeClient):
+
+    def geocode(self, address=None, *args, **kwargs):
+        if address.startswith('BROKEN'):
+            self.calls['geocode'] += 1
+            raise googlemaps.exceptions.ApiError('INVALID_REQUEST')
+        return super().geocode(address, *args, **kwargs)
+
+
+class FailingInterpreter(GoogleInterpreter, FailingClient):
+    GEOCODE_PAUSE = 0
+
+
+class TestNormalize(unittest.TestCase):
+
+    def test_normalize_postcode(self):
+        self.assertEqual(normalize_postcode('sw1a2aa'), 'SW1A 2AA')
+        self.assertEqual(normalize_postcode(' EC4M   7RF '), 'EC4M 7RF')
+        self.assertEqual(normalize_postcode('m1 1ae'), 'M1 1AE')
+        self.assertEqual(normalize_postcode('B33 8TH'), 'B33 8TH')
+        self.assertIsNone(normalize_postcode('12345'))
+        self.assertIsNone(normalize_postcode('SW1A 2CI'))  # C and I are never used in the inward code.
+
+    def test_normalize_address(self):
+        self.assertEqual(normalize_address('10  Downing St., london sw1a2aa'), '10 DOWNING STREET, LONDON SW1A 2AA')
+        self.assertEqual(normalize_address('10 DOWNING STREET,LONDON,SW1A 2AA'), '10 DOWNING STREET, LONDON, SW1A 2AA')
+        self.assertEqual(normalize_address('1 St Johns Rd'), '1 SAINT JOHNS ROAD')
+        self.assertEqual(normalize_address("St. Paul's Churchyard"), 'SAINT PAUL S CHURCHYARD')
+        self.assertEqual(normalize_address('5 Park Ave, Flat 2'), '5 PARK AVENUE, FLAT 2')
+
+    def test_location_key(self):
+        origin = Origin(postcode='ec4m7rf', address='1 Fleet st')
+        self.assertEqual(location_key(origin), '1 FLEET STREET, EC4M 7RF')
+        self.assertEqual(location_key(origin, 'postcode'), 'EC4M 7RF')
+        self.assertEqual(location_key(Origin(postcode='not a postcode')), 'NOT A POSTCODE')
+        self.assertEqual(location_key(Origin(address='1 Fleet St, EC4M 7RF'), 'postcode'), '1 FLEET STREET, EC4M 7RF')
+        with self.assertRaises(ValueError):
+            location_key(origin, 'street')
+
+    def test_group_locations(self):
+        locations = [Origin(postcode='SW1A 2AA'), Origin(postcode='sw1a2aa'), Origin(postcode='EC4M 7RF'),
+                     Origin(postcode=' SW1A  2AA')]
+        groups = group_locations(locations)
+        self.assertEqual(list(groups), ['SW1A 2AA', 'EC4M 7RF'])
+        self.assertEqual(groups['SW1A 2AA'], [locations[0], locations[1], locations[3]])
+
+    def test_geocode_locations(self):
+        places = {'SW1A 2AA': (51.5034, -0.1276), 'EC4M 7RF': (51.5138, -0.0984)}
+        interpreter = FailingInterpreter(places=places, cache=SQLiteCache())
+        origins = [Origin(postcode=postcode) for postcode in ('sw1a 2aa', 'SW1A2AA', 'ec4m 7rf', 'SW1A 2AA', 'broken')]
+        destination = Destination(postcode='Ec4M7rF')
+
+        summary = geocode_locations(interpreter, origins + [destination])
+        self.assertEqual(summary, GeocodeSummary(6, 3, 5, {'BROKEN': 'ApiError: INVALID_REQUEST'}))
+        self.assertEqual(interpreter.calls['geocode'], 3)
+        self.assertEqual(origins[1].geo, {'lat': 51.5034, 'lng': -0.1276})
+        self.assertEqual(origins[3].google_place_id, 'place-SW1A 2AA')
+        self.assertEqual(destination.geo, {'lat': 51.5138, 'lng': -0.0984})
+        self.assertIsNone(origins[4].geo)
+
+        # Geocoded locations are skipped, the failed one is retried.
+        summary = geocode_locations(interpreter, origins + [destination])
+        self.assertEqual(summary, GeocodeSummary(1, 1, 0, {'BROKEN': 'ApiError: INVALID_REQUEST'}))
+        self.assertEqual(interpreter.calls['geocode'], 4)
+
+        # Overwriting is served by the cache.
+        geocode_locations(interpreter, origins[:4], overwrite=True)
+        self.assertEqual(interpreter.calls['geocode'], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import math
+import unittest
+from google_maps_interpreter import planner
+
+
+class TestPlanner(unittest.TestCase):
+
+    def check_plan(self, n_origins, n_destinations, **limits):
+        tiles = planner.plan(n_origins, n_destinations, **limits)
+        max_origins = limits.get('max_origins', planner.MAX_ORIGINS)
+        max_destinations = limits.get('max_destinations', planner.MAX_DESTINATIONS)
+        max_elements = limits.get('max_elements', planner.MAX_ELEMENTS)
+
+        covered = set()
+        for origins, destinations in tiles:
+            rows, cols = range(n_origins)[origins], range(n_destinations)[destinations]
+            self.assertLessEqual(len(rows), max_origins)
+            self.assertLessEqual(len(cols), max_destinations)
+            self.assertLessEqual(len(rows) * len(cols), max_elements)
+            cells = {(i, j) for i in rows for j in cols}
+            self.assertFalse(covered & cells)
+            covered |= cells
+        self.assertEqual(len(covered), n_origins * n_destinations)
+        return tiles
+
+    def test_optimal(self):
+        self.assertEqual(len(self.check_plan(1, 1)), 1)
+        self.assertEqual(len(self.check_plan(4, 3)), 1)
+        self.assertEqual(len(self.check_plan(100, 30)), 30)
+        self.assertEqual(len(self.check_plan(30, 100)), 30)
+        self.assertEqual(len(self.check_plan(7, 40)), 3)
+        self.assertEqual(len(planner.plan(10000, 500)), 50000)
+
+    def test_lower_bound(self):
+        for n_origins, n_destinations in [(13, 17), (26, 26), (99, 3), (3, 99), (51, 49)]:
+            tiles = self.check_plan(n_origins, n_destinations)
+            self.assertGreaterEqual(len(tiles), math.ceil(n_origins * n_destinations / 100))
+            self.assertGreaterEqual(len(tiles), math.ceil(n_destinations / 25))
+
+    def test_limits(self):
+        self.assertEqual(len(self.check_plan(10, 10, max_origins=10, max_destinations=10, max_elements=25)), 4)
+        self.assertEqual(planner.plan(0, 10), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,7 @@
+from .travel_matrix import TravelMatrix, MODES
+from .locations import (Location, Origin, Destination, assign_current_destinations, read_times, read_impacts,
+                        shared_matrix)
+from .spatial import SpatialIndex, haversine
+from .estimator import StraightLineEstimator
+from .storage import save, load, save_matrix, load_matrix, import_values, export_values, Study
+from .profiles import TravelProfiles
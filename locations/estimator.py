@@ -0,0 +1,100 @@
+import numpy as np
+from .locations import Origin, Destination, shared_matrix
+from .spatial import haversine
+from .travel_matrix import TIMES, MEASURED, ESTIMATED
+
+# Rough (intercept in minutes, minutes per km) until calibrated against measured times.
+DEFAULT_COEFFICIENTS = {'fastest': (5.0, 1.5), 'public transport': (10.0, 2.5), 'car': (5.0, 1.5)}
+
+
+def _coordinates(locations):
+    if any(location.geo is None for location in locations):
+        raise ValueError('All locations should have geo coordinates')
+    lat = np.fromiter((location.geo['lat'] for location in locations), np.float64, len(locations))
+    lng = np.fromiter((location.geo['lng'] for location in locations), np.float64, len(locations))
+    return lat, lng
+
+
+class StraightLineEstimator:
+    """Estimates travel times in minutes from the straight line (haversine) distance between two locations with a
+    linear model per mode: time = intercept + slope * km. It's meant for screening: fill all pairs locally, shortlist
+    and only send the shortlisted pairs to the distance matrix API.
+
+    The coefficients are calibrated with fit/calibrate on a sample of measured times, error holds the root mean
+    squared error of the fit per mode. Times written by fill are marked as estimated in the TravelMatrix, so they can
+    be told apart from measured times (TravelMatrix.provenance) and are overwritten by them."""
+
+    def __init__(self, coefficients=None):
+        self.coefficients = dict(DEFAULT_COEFFICIENTS if coefficients is None else coefficients)
+        self.error = {}
+
+    def fit(self, mode, distances_km, times):
+        """Fits the model of a mode by least squares on arrays of distances (km) and times (minutes)."""
+        distances_km, times = np.asarray(distances_km, np.float64), np.asarray(times, np.float64)
+        valid = ~np.isnan(distances_km) & ~np.isnan(times)
+        if valid.sum() < 2:
+            raise ValueError('At least two measured pairs are needed to fit mode {}'.format(mode))
+        slope, intercept = np.polyfit(distances_km[valid], times[valid], 1)
+        self.coefficients[mode] = (intercept.item(), slope.item())
+        residuals = times[valid] - self.predict(mode, distances_km[valid])
+        self.error[mode] = np.sqrt(np.mean(residuals ** 2)).item()
+        return self.coefficients[mode]
+
+    def calibrate(self, mode, dist_matrix_result, geocodes):
+        """Fits a mode on the result of GoogleInterpreter.dist_matrix. geocodes maps every origin and destination of
+        the result to its geocode result ({'geo': {'lat':x, 'lng':y}, ...}), as returned by GoogleInterpreter.geocode.
+        The API's seconds are converted to minutes."""
+        pairs = [(geocodes[origin]['geo'], geocodes[dest]['geo'], cell['time'])
+                 for origin, row in dist_matrix_result.items()
+                 for dest, cell in row.items() if cell['time'] is not None]
+        if not pairs:
+            raise ValueError('At least two measured pairs are needed to fit mode {}'.format(mode))
+        origin, dest, seconds = zip(*pairs)
+        distances = haversine([o['lat'] for o in origin], [o['lng'] for o in origin],
+                              [d['lat'] for d in dest], [d['lng'] for d in dest])
+        return self.fit(mode, distances, np.array(seconds, np.float64) / 60)
+
+    def calibrate_locations(self, mode, origins, destinations):
+        """Fits a mode on the measured times already set between origins and destinations."""
+        matrix, rows, cols = self._ids(origins, destinations)
+        times = matrix._data[TIMES, matrix.mode_index(mode)][np.ix_(rows, cols)]
+        measured = matrix.provenance_block(mode, rows, cols) == MEASURED
+        return self.fit(mode, self.distances(origins, destinations)[measured], times[measured])
+
+    def predict(self, mode, distances_km):
+        intercept, slope = self.coefficients[mode]
+        return np.maximum(intercept + slope * np.asarray(distances_km, np.float64), 0)
+
+    @staticmethod
+    def distances(origins, destinations):
+        """The haversine distance matrix (origins x destinations) in km."""
+        origin_lat, origin_lng = _coordinates(origins)
+        dest_lat, dest_lng = _coordinates(destinations)
+        return haversine(origin_lat[:, None], origin_lng[:, None], dest_lat[None, :], dest_lng[None, :])
+
+    @staticmethod
+    def _ids(origins, destinations):
+        if not all(isinstance(origin, Origin) for origin in origins):
+            raise TypeError('origins should be of the class Origin')
+        if not all(isinstance(dest, Destination) for dest in destinations):
+            raise TypeError('destinations should be of the class Destination')
+        matrix = shared_matrix(list(origins) + list(destinations))
+        return matrix, matrix.rows(origins), matrix.cols(destinations)
+
+    def fill(self, origins, destinations, modes=None, overwrite=False, block=4096):
+        """Sets estimated times between all origins and destinations for the modes (all modes of the estimator by
+        default). Measured times are kept unless overwrite is True. Origins are processed in blocks so the distance
+        matrix never gets larger than block x destinations."""
+        origins, destinations = list(origins), list(destinations)
+        if not origins or not destinations:
+            return
+        matrix, rows, cols = self._ids(origins, destinations)
+        modes = list(self.coefficients) if modes is None else modes
+
+        for start in range(0, len(origins), block):
+            block_rows = rows[start:start + block]
+            distances = self.distances(origins[start:start + block], destinations)
+            for mode in modes:
+                mask = None if overwrite else matrix.provenance_block(mode, block_rows, cols) != MEASURED
+                matrix.set_block(TIMES, mode, block_rows, cols, self.predict(mode, distances), mask=mask,
+                                 provenance=ESTIMATED)
@@ -1,23 +1,60 @@
+import itertools
+import sys
+import numpy as np
+from .travel_matrix import TravelMatrix, MODES, TIMES, IMPACTS, EMPTY_STATS
+
+_sequence = itertools.count()
+
+
 class Location:
     """A Location is a class that holds location information (obviously). That information is address, postcode,
-    geo codes and information around travel times to other locations."""
+    geo codes and information around travel times to other locations. The travel times themselves are kept in a
+    TravelMatrix that is shared by all locations of a study, the location only knows its row/column in it.
+
+    Pass the matrix of the study as matrix. A location created without one is unbound until the first time it's
+    combined with other locations (see shared_matrix): it then joins their matrix, or a new one when none of them has
+    a matrix yet. There is no process-wide default matrix, a matrix lives as long as its locations do and the
+    row/column of a location is released when the location is garbage collected.
 
-    def __init__(self, postcode=None, address=None, geo=None):
+    Locations are kept small as studies can hold hundreds of thousands of them: there is no __dict__ (__slots__),
+    the mode is stored as its index in the matrix modes, modes is the shared tuple of the matrix, postcodes are
+    interned, geo is kept as two floats and a row/column in the matrix is only allocated on the first write. The
+    target is at most 200 bytes per Origin (including its coordinates, excluding the postcode and address strings),
+    test_locations checks it."""
+
+    __slots__ = ('postcode', 'address', '_lat', '_lng', 'google_place_id', 'matrix', '_mode', '_seq', '_row', '_col')
+    _side = 0  # Origins are stored as rows (-1) and destinations as columns (1) of the TravelMatrix.
+
+    def __init__(self, postcode=None, address=None, geo=None, matrix=None):
         if not postcode and not address:
                 raise TypeError('Either a postcode or an address should be provided')
-        self.postcode = postcode
+        self.postcode = sys.intern(postcode) if isinstance(postcode, str) else postcode
         self.address = address
+        self._lat = None
+        self._lng = None
         self.geo = geo
         self.google_place_id = None
-        self._geo = None
-        self.modes = {'fastest', 'public transport', 'car'}
-        self._mode = 'fastest'
-        self._times = {mode: {} for mode in self.modes}
-        self._impact_times = {mode: {} for mode in self.modes}
+        self._row = None
+        self._col = None
+        self.matrix = matrix
+        self._mode = self.modes.index('fastest') if 'fastest' in self.modes else 0
+        self._seq = next(_sequence)
+
+    def __del__(self):
+        matrix = getattr(self, 'matrix', None)  # Not set yet when __init__ raised.
+        if matrix is not None:
+            matrix.release(self)
+
+    def _bind(self, matrix):
+        """Joins a matrix, keeping the mode by name."""
+        self._mode = matrix._mode_index.get(MODES[self._mode], 0)
+        self.matrix = matrix
 
     @property
     def geo(self):
-        return self._geo
+        if self._lat is None:
+            return None
+        return {'lat': self._lat, 'lng': self._lng}
 
     @geo.setter
     def geo(self, value):
@@ -34,8 +71,8 @@ class Location:
         except KeyError:
             raise KeyError("geo should be set by passing a dict with keys 'lat', 'lng'")
 
-        self._geo = {'lat': lat,
-                     'lng': lng}
+        self._lat = lat
+        self._lng = lng
 
     def lat(self):
         return self.geo['lat']
@@ -60,15 +97,20 @@ class Location:
     def impact_times(self, value):
         raise AttributeError('Impact should be set using the set_impacts method')
 
+    @property
+    def modes(self):
+        """The modes of the TravelMatrix, shared by all its locations (the default MODES while unbound)."""
+        return MODES if self.matrix is None else self.matrix.modes
+
     @property
     def mode(self):
-        return self._mode
+        return self.modes[self._mode]
 
     @mode.setter
     def mode(self, value):
         if value not in self.modes:
             raise TypeError('Type should be either: fastest, public transport or car not '+value)
-        self._mode = value
+        self._mode = self.modes.index(value)
 
     def check_params(self, mode, value, location):
         """The base function that checks if the parameters that are going to be set are valid inputs."""
@@ -78,50 +120,76 @@ class Location:
             raise TypeError('value represents minutes and should be an integer. got ' + value.__class__.__name__)
         if not isinstance(location, Location) or location == self:
             raise TypeError('destination should be of class Location. got ' + value.__class__.__name__)
+        if location.matrix is not self.matrix or self.matrix is None:
+            shared_matrix([self, location])
 
     def set_times(self, mode, value, to_location, mirror=True):
-        """The mirror boolean is used to identify from where the function was called. It is needed to prevent locations
-        from calling each other infinetly."""
+        """Both locations share a single cell in the TravelMatrix so the value is visible from both sides. The mirror
+        boolean is only kept for backwards compatibility."""
 
         self.check_params(mode, value, to_location)
-        self._times[mode][to_location] = value
-        if mirror:
-            to_location.set_times(mode, value, self, mirror=False)
+        self.matrix.set(TIMES, mode, self, to_location, value)
 
     def set_impacts(self, mode, value, to_location, mirror=True):
-        """The mirror boolean is used to identify from where the function was called. It is needed to prevent locations
-        from calling each other infinetly."""
+        """Both locations share a single cell in the TravelMatrix so the value is visible from both sides. The mirror
+        boolean is only kept for backwards compatibility."""
 
         self.check_params(mode, value, to_location)
-        self._impact_times[mode][to_location] = value
-        if mirror:
-            to_location.set_impacts(mode, value, self, mirror=False)
+        self.matrix.set(IMPACTS, mode, self, to_location, value)
+
+    def get_provenance(self, to_location, mode=None):
+        """Returns whether the time to to_location was 'measured' or 'estimated', None when there is no time."""
+        mode = self.mode if mode is None else mode
+        if self.matrix is None:
+            return None
+        return self.matrix.provenance(mode, self, to_location)
 
     def attribute_getter(fn):
         def wrapped(self, mode=None, to_location=None):
-            mode = self._mode if mode is None else mode
-            print(mode)
+            mode = self.mode if mode is None else mode
+            if self.matrix is None:
+                if to_location:
+                    raise KeyError(to_location)
+                return []
             if to_location:
-                resp = fn(self)[mode][to_location]
+                resp = self.matrix.get(fn(self), mode, self, to_location)
             else:
-                resp = [value for value in fn(self)[mode].values()]
+                resp = self.matrix.values(fn(self), mode, self).tolist()
             return resp
         return wrapped
 
     @attribute_getter
     def get_times(self):
-        return self._times
+        return TIMES
 
     @attribute_getter
     def get_impacts(self):
-        return self._impact_times
+        return IMPACTS
+
+    def time_view(self, mode=None):
+        """Read-only view (no copy) of the times of this location: its row in the TravelMatrix for origins, its
+        column for destinations. Indexed by the row/column id of the other location, NaN where there is no time.
+        None when the location has no times yet."""
+        if self.matrix is None:
+            return None
+        return self.matrix.line(TIMES, self.mode if mode is None else mode, self)
+
+    def impact_view(self, mode=None):
+        """Read-only view (no copy) of the impacts of this location, see time_view."""
+        if self.matrix is None:
+            return None
+        return self.matrix.line(IMPACTS, self.mode if mode is None else mode, self)
 
 
 class Origin(Location):
-    """Takes in address/postcode or/and geo-codes. The relation with a destination only exists through the times dict.
-    the destination objects are used as keys for the times"""
-    def __init__(self, postcode=None, address=None, geo=None):
-        super().__init__(postcode, address, geo)
+    """Takes in address/postcode or/and geo-codes. The relation with a destination only exists through the
+    TravelMatrix, origins are stored as its rows."""
+
+    __slots__ = ('_current_destination',)
+    _side = -1
+
+    def __init__(self, postcode=None, address=None, geo=None, matrix=None):
+        super().__init__(postcode, address, geo, matrix)
         self._current_destination = None
 
     @property
@@ -131,31 +199,32 @@ class Origin(Location):
     @current_destination.setter
     def current_destination(self, current_dest):
         if not isinstance(current_dest, Destination):
-            raise TypeError('Current_destination should be of the class Destination got ' + current_dest.__class__.__name__)
-
-        if not all(current_dest in d for d in self._times.values()):
+            raise TypeError('Current_destination should be of the class Destination got ' +
+                            current_dest.__class__.__name__)
+        matrix = self.matrix
+        if matrix is None or current_dest.matrix is not matrix:
+            matrix = shared_matrix([self, current_dest])
+        if (self._row is None or current_dest._col is None or
+                np.isnan(matrix._data[TIMES, :, self._row, current_dest._col]).any()):
             raise TypeError('You can only set a destination as this origins current destination if all times '
                             '("fastest", "public transport", "car") are calculated for this destination.')
-
+        matrix.rebase_row(self._row, current_dest._col)
         self._current_destination = current_dest
 
-        for mode, dict in self._times.items():
-            for dest, time in dict.items():
-                impact = time - dict[current_dest]       # Decrease in time compared to current is negative.
-                self._impact_times[mode][dest] = impact
-                dest.set_impacts(mode, impact, self, mirror=False)
-
 
 class Destination(Location):
-    """The relation with origins is ket within the origin objects. Destination objects only keep times, not a
-    reference to the origin."""
+    """The relation with origins is kept within the TravelMatrix, destinations are stored as its columns. Destination
+    objects only keep times, not a reference to the origin."""
+
+    __slots__ = ()
+    _side = 1
 
-    def __init__(self, address=None, postcode=None, geo=None):
-        super().__init__(address, postcode, geo)
+    def __init__(self, address=None, postcode=None, geo=None, matrix=None):
+        super().__init__(postcode=postcode, address=address, geo=geo, matrix=matrix)
 
     def check_mode(self, mode):
         if mode is None:
-            return self._mode
+            return self.mode
 
         if mode not in self.modes:
             raise TypeError
@@ -164,14 +233,119 @@ class Destination(Location):
 
     def avg_time(self, mode=None):
         mode = self.check_mode(mode)
-        try:
-            return sum(self._times[mode].values())/len(self._times[mode])
-        except ZeroDivisionError:
-            return 0
+        return 0 if self.matrix is None else self.matrix.mean(TIMES, mode, self)
 
     def avg_impact(self, mode=None):
         mode = self.check_mode(mode)
-        try:
-            return sum(self._impact_times[mode].values())/len(self._impact_times[mode])
-        except ZeroDivisionError:
+        return 0 if self.matrix is None else self.matrix.mean(IMPACTS, mode, self)
+
+    def time_stats(self, mode=None):
+        """Running count, sum, sumsq, min, max, mean and std of the times to this destination."""
+        return self._stats(TIMES, self.check_mode(mode))
+
+    def impact_stats(self, mode=None):
+        """Running count, sum, sumsq, min, max, mean and std of the impacts on this destination."""
+        return self._stats(IMPACTS, self.check_mode(mode))
+
+    def _stats(self, kind, mode):
+        if self.matrix is None:
+            return dict(EMPTY_STATS)
+        return self.matrix.stats(kind, mode, self)
+
+    def time_percentile(self, q, mode=None):
+        """Approximate percentile of the times, e.g. q=0.5 for the median or q=0.9 for p90."""
+        return self._quantile(TIMES, self.check_mode(mode), q)
+
+    def impact_percentile(self, q, mode=None):
+        """Approximate percentile of the impacts, e.g. q=0.5 for the median or q=0.9 for p90."""
+        return self._quantile(IMPACTS, self.check_mode(mode), q)
+
+    def _quantile(self, kind, mode, q):
+        if self.matrix is None:
+            if not 0 <= q <= 1:
+                raise ValueError('q should be between 0 and 1 got {}'.format(q))
             return 0
+        return self.matrix.quantile(kind, mode, self, q)
+
+
+def shared_matrix(locations):
+    """Returns the TravelMatrix of a group of locations that are used together, e.g. the origins and destinations of
+    a study. Locations without a matrix join the matrix of the others, or a new matrix when none of them has one.
+    Raises a ValueError when the locations already belong to different matrices."""
+    locations = list(locations)
+    matrices = {id(location.matrix): location.matrix for location in locations if location.matrix is not None}
+    if len(matrices) > 1:
+        raise ValueError('All locations should share the same TravelMatrix, pass the matrix of the study to all '
+                         'locations')
+    matrix = next(iter(matrices.values())) if matrices else TravelMatrix()
+    for location in locations:
+        if location.matrix is None:
+            location._bind(matrix)
+    return matrix
+
+
+def _ids(locations, attribute):
+    return np.fromiter((-1 if getattr(location, attribute) is None else getattr(location, attribute)
+                        for location in locations), dtype=np.intp)
+
+
+def read_times(origins, destinations, modes=None):
+    """Returns the times between many origins and destinations for many modes (all by default) in one go, as an
+    array of shape (modes, origins, destinations) with NaN for pairs without a time. Origins and destinations that were
+    registered together give a read-only view instead of a copy, see TravelMatrix.block."""
+    return _read(TIMES, origins, destinations, modes)
+
+
+def read_impacts(origins, destinations, modes=None):
+    """Like read_times, for the impacts."""
+    return _read(IMPACTS, origins, destinations, modes)
+
+
+def _read(kind, origins, destinations, modes):
+    origins, destinations = list(origins), list(destinations)
+    if not all(isinstance(origin, Origin) for origin in origins):
+        raise TypeError('origins should be of the class Origin')
+    if not all(isinstance(dest, Destination) for dest in destinations):
+        raise TypeError('destinations should be of the class Destination')
+    matrix = shared_matrix(origins + destinations)
+    return matrix.block(kind, _ids(origins, '_row'), _ids(destinations, '_col'), modes)
+
+
+def assign_current_destinations(origins, destinations):
+    """Sets the current destination of many origins at once. destinations is either a single Destination shared by
+    all origins or a sequence with one Destination per origin. All impacts, for all modes, are recalculated in one
+    vectorised pass over the TravelMatrix. As destinations read from the same matrix their averages are updated as
+    well. When an origin is passed more than once its last destination wins."""
+    origins = list(origins)
+    if isinstance(destinations, Destination):
+        destinations = [destinations] * len(origins)
+    destinations = list(destinations)
+    if len(origins) != len(destinations):
+        raise ValueError('Got {} origins but {} destinations'.format(len(origins), len(destinations)))
+    if not origins:
+        return
+    last = {id(origin): i for i, origin in enumerate(origins)}
+    if len(last) < len(origins):
+        keep = sorted(last.values())
+        origins, destinations = [origins[i] for i in keep], [destinations[i] for i in keep]
+
+    for origin, dest in zip(origins, destinations):
+        if not isinstance(origin, Origin):
+            raise TypeError('origins should be of the class Origin got ' + origin.__class__.__name__)
+        if not isinstance(dest, Destination):
+            raise TypeError('Current_destination should be of the class Destination got ' + dest.__class__.__name__)
+    matrix = shared_matrix(origins + destinations)
+    for origin, dest in zip(origins, destinations):
+        if origin._row is None or dest._col is None:
+            raise TypeError('You can only set a destination as this origins current destination if all times '
+                            '("fastest", "public transport", "car") are calculated for this destination.')
+
+    rows = np.fromiter((origin._row for origin in origins), dtype=np.intp, count=len(origins))
+    cols = np.fromiter((dest._col for dest in destinations), dtype=np.intp, count=len(destinations))
+    if np.isnan(matrix._data[TIMES][:, rows, cols]).any():
+        raise TypeError('You can only set a destination as this origins current destination if all times '
+                        '("fastest", "public transport", "car") are calculated for this destination.')
+
+    matrix.rebase(rows, cols)      # Decrease in time compared to current is negative.
+    for origin, dest in zip(origins, destinations):
+        origin._current_destination = dest
@@ -0,0 +1,166 @@
+import zlib
+import numpy as np
+from .travel_matrix import MODES
+
+MISSING_BASE = np.iinfo(np.uint16).max
+MISSING_DELTA = np.iinfo(np.uint8).max
+MAX_DELTA = MISSING_DELTA - 1
+
+
+class TravelProfiles:
+    """Travel times per departure slot (e.g. 24 hourly slots) for every origin x destination pair and mode, for
+    questions like the average impact during the morning rush hour.
+
+    Times are quantized to units of resolution minutes and stored per pair as a uint16 base (the fastest slot) and a
+    uint8 delta per slot on top of it, so a pair costs 2 + slots bytes instead of 8 * slots. Deltas above 254 units are
+    clipped, missing values are 65535 (base) and 255 (delta). Origins are stored in blocks of block origins and every
+    block is zlib compressed (level 1, higher levels compress little better on noisy times at several times the
+    cost). Queries decompress one block at a time, memory stays at a single block next to the compressed data:
+    100k x 500 pairs x 24 slots is 1.3GB per mode before and about 0.6GB after compression for realistic, noisy
+    profiles (against 9.6GB as float64).
+
+    Origins and destinations are numbered 0..n-1, e.g. by their row and column ids in the TravelMatrix."""
+
+    def __init__(self, n_origins, n_destinations, slots=24, modes=MODES, resolution=1.0, block=256, level=1):
+        self.n_origins = n_origins
+        self.n_destinations = n_destinations
+        self.slots = slots
+        self.modes = tuple(modes)
+        self.resolution = resolution
+        self.block = block
+        self.level = level
+        n_blocks = -(-n_origins // block)
+        self._blocks = {mode: [None] * n_blocks for mode in self.modes}
+
+    def _check_mode(self, mode):
+        if mode not in self._blocks:
+            raise KeyError('Mode should be one of: {} not {}'.format(', '.join(self.modes), mode))
+
+    def _block_shape(self, b):
+        return min(self.block, self.n_origins - b * self.block), self.n_destinations
+
+    def _decompress(self, mode, b):
+        """Returns the (base, deltas) arrays of a block, all missing when it was never written."""
+        rows, cols = self._block_shape(b)
+        stored = self._blocks[mode][b]
+        if stored is None:
+            return (np.full((rows, cols), MISSING_BASE, dtype=np.uint16),
+                    np.full((rows, cols, self.slots), MISSING_DELTA, dtype=np.uint8))
+        base = np.frombuffer(zlib.decompress(stored[0]), dtype=np.uint16).reshape(rows, cols)
+        deltas = np.frombuffer(zlib.decompress(stored[1]), dtype=np.uint8).reshape(rows, cols, self.slots)
+        return base, deltas
+
+    def _compress(self, mode, b, base, deltas):
+        self._blocks[mode][b] = (zlib.compress(base.tobytes(), self.level),
+                                 zlib.compress(deltas.tobytes(), self.level))
+
+    def quantize(self, times):
+        """Turns an (..., slots) array of minutes (NaN for missing) into its (base, deltas) representation."""
+        units = np.asarray(times, dtype=np.float64) / self.resolution
+        missing = np.isnan(units)
+        units = np.clip(np.rint(np.where(missing, 0, units)), 0, MISSING_BASE - 1)
+        base = np.where(missing, np.inf, units).min(axis=-1)
+        empty = np.isinf(base)
+        base = np.where(empty, MISSING_BASE, base).astype(np.uint16)
+        deltas = np.minimum(units - np.where(empty, 0, base)[..., None], MAX_DELTA).astype(np.uint8)
+        deltas[missing] = MISSING_DELTA
+        return base, deltas
+
+    def dequantize(self, base, deltas):
+        """The inverse of quantize: minutes as float32, NaN for missing."""
+        times = (base[..., None].astype(np.float32) + deltas) * np.float32(self.resolution)
+        times[(deltas == MISSING_DELTA) | (base == MISSING_BASE)[..., None]] = np.nan
+        return times
+
+    def set(self, mode, start, times):
+        """Writes the profiles of origins start..start + len(times). times is an (origins, destinations, slots) array
+        of minutes with NaN for missing values. Only the blocks that are touched are recompressed."""
+        self._check_mode(mode)
+        times = np.asarray(times, dtype=np.float64)
+        if times.ndim != 3 or times.shape[1:] != (self.n_destinations, self.slots):
+            raise ValueError('times should have the shape (origins, {}, {}) got {}'.format(
+                self.n_destinations, self.slots, times.shape))
+        stop = start + len(times)
+        if start < 0 or stop > self.n_origins:
+            raise IndexError('Origins {} to {} are out of range for {} origins'.format(start, stop, self.n_origins))
+
+        for b in range(start // self.block, -(-stop // self.block)):
+            first = b * self.block
+            low, high = max(start, first), min(stop, first + self.block)
+            new_base, new_deltas = self.quantize(times[low - start:high - start])
+            if low == first and high == first + self._block_shape(b)[0]:
+                base, deltas = new_base, new_deltas
+            else:
+                base, deltas = (array.copy() for array in self._decompress(mode, b))
+                base[low - first:high - first] = new_base
+                deltas[low - first:high - first] = new_deltas
+            self._compress(mode, b, base, deltas)
+
+    def get(self, mode, origins=None):
+        """Returns the profiles of a slice of origins (all by default) as an (origins, destinations, slots) float32
+        array of minutes."""
+        self._check_mode(mode)
+        start, stop, _ = (origins or slice(None)).indices(self.n_origins)
+        parts = []
+        for b in range(start // self.block, -(-stop // self.block)):
+            first = b * self.block
+            base, deltas = self._decompress(mode, b)
+            rows = slice(max(start, first) - first, min(stop, first + self.block) - first)
+            parts.append(self.dequantize(base[rows], deltas[rows]))
+        return np.concatenate(parts) if parts else np.empty((0, self.n_destinations, self.slots), np.float32)
+
+    def slot_range(self, start_hour, end_hour):
+        """The slots covering departures from start_hour up to end_hour, e.g. (8, 9) for 8-9am."""
+        per_hour = self.slots / 24
+        start = int(np.floor(start_hour * per_hour))
+        return slice(start, max(int(np.ceil(end_hour * per_hour)), start + 1))
+
+    def _blocks_window(self, mode, slots):
+        """Yields (first origin, mean time over the slots) per block as (block origins, destinations) float64
+        arrays, NaN where a pair has no time in any of the slots."""
+        self._check_mode(mode)
+        for b in range(len(self._blocks[mode])):
+            base, deltas = self._decompress(mode, b)
+            window = deltas[:, :, slots]
+            valid = (window != MISSING_DELTA) & (base != MISSING_BASE)[..., None]
+            count = valid.sum(axis=2)
+            total = np.where(valid, window, 0).sum(axis=2, dtype=np.float64)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = (base + total / count) * self.resolution
+            yield b * self.block, np.where(count > 0, mean, np.nan)
+
+    def window(self, mode, slots):
+        """Mean time per pair over a range of slots (a slice, see slot_range), an (origins, destinations) array."""
+        return np.concatenate([mean for _, mean in self._blocks_window(mode, slots)])
+
+    def average(self, mode, slots):
+        """Mean time per destination over all origins and the slots, NaN-aware. Returns a (destinations,) array."""
+        total = np.zeros(self.n_destinations)
+        count = np.zeros(self.n_destinations)
+        for _, mean in self._blocks_window(mode, slots):
+            total += np.nansum(mean, axis=0)
+            count += (~np.isnan(mean)).sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return total / count
+
+    def impact(self, mode, slots, current):
+        """Mean impact per destination during the slots: for every origin the difference between its time to the
+        destination and its time to its current destination (current holds a destination index per origin), averaged
+        over the slots and then over all origins with a known time. Returns a (destinations,) array."""
+        current = np.asarray(current, dtype=np.intp)
+        if current.shape != (self.n_origins,):
+            raise ValueError('current should hold a destination per origin')
+        total = np.zeros(self.n_destinations)
+        count = np.zeros(self.n_destinations)
+        for first, mean in self._blocks_window(mode, slots):
+            baseline = mean[np.arange(len(mean)), current[first:first + len(mean)]]
+            impacts = mean - baseline[:, None]
+            total += np.nansum(impacts, axis=0)
+            count += (~np.isnan(impacts)).sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return total / count
+
+    def nbytes(self):
+        """Compressed size of all profiles in bytes."""
+        return sum(len(part) for blocks in self._blocks.values() for stored in blocks if stored is not None
+                   for part in stored)
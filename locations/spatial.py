@@ -0,0 +1,224 @@
+import numpy as np
+
+EARTH_RADIUS = 6371.0088  # km
+KM_PER_DEGREE = np.pi * EARTH_RADIUS / 180
+POINTS_PER_CELL = 16    # The density the cell size is picked for when it isn't given.
+MIN_CELL_KM, MAX_CELL_KM = 0.05, 100.0
+MAX_CANDIDATES = 1 << 20    # Candidate (query, point) pairs query_radius holds at once, queries are split to fit.
+
+
+def haversine(lat1, lng1, lat2, lng2):
+    """Great circle distance in km between points given in degrees. Works element wise on arrays (with
+    broadcasting)."""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(value, dtype=np.float64)) for value in (lat1, lng1, lat2, lng2))
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(h, 1)))
+
+
+def auto_cell_km(lat, lng):
+    """A cell size (km) giving about POINTS_PER_CELL points per cell, from the density of the points in the box
+    between the 1st and 99th percentile of their coordinates (so a few outliers don't spread them out)."""
+    if len(lat) < 2:
+        return MAX_CELL_KM
+    lat_low, lat_high = np.quantile(lat, [0.01, 0.99])
+    lng_low, lng_high = np.quantile(lng, [0.01, 0.99])
+    height = max((lat_high - lat_low) * KM_PER_DEGREE, MIN_CELL_KM)
+    width = max((lng_high - lng_low) * KM_PER_DEGREE * np.cos(np.radians((lat_low + lat_high) / 2)), MIN_CELL_KM)
+    return float(np.clip(np.sqrt(height * width * POINTS_PER_CELL / (0.98 * len(lat))), MIN_CELL_KM, MAX_CELL_KM))
+
+
+def _concat_ranges(starts, stops):
+    """Returns the concatenation of range(start, stop) for all pairs as one array, without a Python loop."""
+    lengths = stops - starts
+    total = lengths.sum()
+    if not total:
+        return np.empty(0, dtype=np.intp)
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(starts - offsets, lengths) + np.arange(total)
+
+
+class SpatialIndex:
+    """A grid index over the geo coordinates of a set of Location objects, used to find e.g. the candidate offices
+    within x km of every employee before sending pairs to the distance matrix API.
+
+    The globe is cut in latitude bands of cell_km and every band in longitude cells of about cell_km wide (so cells
+    are roughly square at every latitude). Points are sorted by cell so all points of a run of cells in a band are one
+    contiguous slice. Queries are batched and fully vectorised: the bands and cell ranges covered by every query
+    circle are searched with one searchsorted, the candidates are filtered on their haversine distance. Building is a
+    single sort, O(n log n). By default cell_km follows the density of the points, see auto_cell_km."""
+
+    def __init__(self, locations, cell_km=None):
+        self.locations = list(locations)
+        if any(location.geo is None for location in self.locations):
+            raise ValueError('All locations should have geo coordinates')
+        lat = np.fromiter((location.geo['lat'] for location in self.locations), np.float64, len(self.locations))
+        lng = np.fromiter((location.geo['lng'] for location in self.locations), np.float64, len(self.locations))
+        self._build(lat, lng, cell_km)
+
+    @classmethod
+    def from_coordinates(cls, lat, lng, cell_km=None):
+        """Builds an index straight from arrays of latitudes and longitudes. Query results are positions in these
+        arrays, locations is None."""
+        index = cls.__new__(cls)
+        index.locations = None
+        index._build(np.asarray(lat, dtype=np.float64), np.asarray(lng, dtype=np.float64), cell_km)
+        return index
+
+    def __len__(self):
+        return len(self._order)
+
+    def _build(self, lat, lng, cell_km):
+        if lat.shape != lng.shape or lat.ndim != 1:
+            raise ValueError('lat and lng should be one dimensional arrays of the same length')
+        cell_km = auto_cell_km(lat, lng) if cell_km is None else cell_km
+        self.cell_km = cell_km
+        self._dlat = cell_km / KM_PER_DEGREE
+        self._n_rows = int(np.ceil(180 / self._dlat))
+
+        row_edges = -90 + self._dlat * np.arange(self._n_rows + 1)
+        widest = np.maximum(np.abs(row_edges[:-1]), np.abs(np.minimum(row_edges[1:], 90)))
+        widest = np.where((row_edges[:-1] < 0) & (row_edges[1:] > 0), 0, widest)  # The band at the equator.
+        self._n_cols = np.maximum(1, (360 * np.cos(np.radians(widest)) * KM_PER_DEGREE / cell_km).astype(np.int64))
+        self._row_offset = np.concatenate([[0], np.cumsum(self._n_cols)])
+
+        cells = self._cells(lat, lng)
+        self._order = np.argsort(cells, kind='stable')
+        self._cell_ids = cells[self._order]
+        self._lat = lat[self._order]
+        self._lng = lng[self._order]
+
+    def _rows(self, lat):
+        return np.clip(((lat + 90) / self._dlat).astype(np.int64), 0, self._n_rows - 1)
+
+    def _cols(self, rows, lng):
+        n_cols = self._n_cols[rows]
+        return np.floor((lng + 180) / 360 * n_cols).astype(np.int64) % n_cols
+
+    def _cells(self, lat, lng):
+        rows = self._rows(lat)
+        return self._row_offset[rows] + self._cols(rows, lng)
+
+    def _ranges(self, lat, lng, radius):
+        """Returns (query, lo, hi), sorted by query: the points in the cells overlapping the circles around the
+        queries are at positions lo to hi in the sorted arrays."""
+        delta = np.minimum(radius / EARTH_RADIUS, np.pi)
+        delta_deg = np.degrees(delta)
+        first = self._rows(np.maximum(lat - delta_deg, -90))
+        last = self._rows(np.minimum(lat + delta_deg, 90))
+        n_rows = last - first + 1
+        query = np.repeat(np.arange(len(lat)), n_rows)
+        rows = np.repeat(first, n_rows) + _concat_ranges(np.zeros_like(n_rows), n_rows)
+
+        # Largest longitude difference of any point within the circle, the whole band when the circle has a pole.
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ratio = np.sin(delta) / np.cos(np.radians(lat))
+        whole = (np.abs(lat) + delta_deg >= 90) | (ratio >= 1)
+        span = np.where(whole, 180, np.degrees(np.arcsin(np.clip(ratio, 0, 1))))[query]
+
+        n_cols = self._n_cols[rows]
+        low = np.floor((lng[query] - span + 180) / 360 * n_cols).astype(np.int64)
+        high = np.floor((lng[query] + span + 180) / 360 * n_cols).astype(np.int64)
+        whole_row = (high - low + 1 >= n_cols) | whole[query]
+        low, high = np.where(whole_row, 0, low), np.where(whole_row, n_cols - 1, high)
+
+        # A range crossing the date line is split in a range at the start and one at the end of the band.
+        wraps_low, wraps_high = low < 0, high >= n_cols
+        starts = [np.where(wraps_low, 0, low), np.where(wraps_low, low + n_cols, np.where(wraps_high, 0, 1))]
+        stops = [np.where(wraps_high, n_cols - 1, high), np.where(wraps_low, n_cols - 1, np.where(wraps_high,
+                                                                                                 high - n_cols, 0))]
+        offset = self._row_offset[rows]
+        query = np.concatenate([query, query])
+        first_cell = np.concatenate([offset + starts[0], offset + starts[1]])
+        last_cell = np.concatenate([offset + stops[0], offset + stops[1]])
+        empty = first_cell > last_cell
+        first_cell, last_cell = first_cell[~empty], last_cell[~empty]
+        query = query[~empty]
+
+        lo = np.searchsorted(self._cell_ids, first_cell, side='left')
+        hi = np.searchsorted(self._cell_ids, last_cell, side='right')
+        order = np.argsort(query, kind='stable')
+        return query[order], lo[order], hi[order]
+
+    def _search(self, lat, lng, radius, query, lo, hi, start, stop):
+        """query_radius for the queries start to stop, given their ranges from _ranges."""
+        query, position = np.repeat(query, hi - lo), _concat_ranges(lo, hi)
+        distance = haversine(lat[query], lng[query], self._lat[position], self._lng[position])
+        keep = distance <= radius[query]
+        query, position, distance = query[keep], position[keep], distance[keep]
+
+        order = np.lexsort((distance, query))
+        query, position, distance = query[order], position[order], distance[order]
+        splits = np.searchsorted(query, np.arange(start + 1, stop))
+        return np.split(self._order[position], splits), np.split(distance, splits)
+
+    def _prepare(self, lat, lng):
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lng = np.atleast_1d(np.asarray(lng, dtype=np.float64))
+        if lat.shape != lng.shape:
+            raise ValueError('lat and lng should have the same shape')
+        return lat, lng
+
+    def query_radius(self, lat, lng, radius_km):
+        """Finds all points within radius_km of every query point. Returns a list with per query an array of indices
+        (into the locations/coordinates the index was built from) and a list with the matching distances in km, both
+        sorted by distance. Queries are searched in batches of at most MAX_CANDIDATES candidate points (or a single
+        query when it has more), so the memory used doesn't grow with the number of queries."""
+        lat, lng = self._prepare(lat, lng)
+        radius = np.broadcast_to(np.asarray(radius_km, dtype=np.float64), lat.shape)
+        query, lo, hi = self._ranges(lat, lng, radius)
+        total = np.cumsum(np.bincount(query, weights=hi - lo, minlength=len(lat)))
+
+        indices, distances = [], []
+        start = 0
+        while start < len(lat):
+            done = total[start - 1] if start else 0
+            stop = max(int(np.searchsorted(total, done + MAX_CANDIDATES, side='right')), start + 1)
+            first, last = np.searchsorted(query, [start, stop])
+            found, found_distances = self._search(lat, lng, radius, query[first:last], lo[first:last],
+                                                  hi[first:last], start, stop)
+            indices.extend(found)
+            distances.extend(found_distances)
+            start = stop
+        return indices, distances
+
+    def query_knn(self, lat, lng, k=1):
+        """Finds the k nearest points of every query point. Returns (distances, indices), both of shape (queries, k)
+        and sorted by distance. When the index has fewer than k points the rest is padded with inf and -1.
+
+        The search radius starts at the radius that holds k points at the density of the query's cell and doubles
+        until k points are found, a query in an empty cell starts at cell_km."""
+        lat, lng = self._prepare(lat, lng)
+        distances = np.full((len(lat), k), np.inf)
+        indices = np.full((len(lat), k), -1, dtype=np.intp)
+        pending = np.arange(len(lat))
+        wanted = min(k, len(self))
+        cells = self._cells(lat, lng)
+        in_cell = np.searchsorted(self._cell_ids, cells, side='right') - np.searchsorted(self._cell_ids, cells)
+        with np.errstate(divide='ignore'):
+            radius = np.where(in_cell > 0, self.cell_km * np.sqrt(max(wanted, 1) / (np.pi * in_cell)), self.cell_km)
+
+        while len(pending):
+            found, found_distances = self.query_radius(lat[pending], lng[pending], radius[pending])
+            done = []
+            for i, (query, index, distance) in enumerate(zip(pending, found, found_distances)):
+                if len(index) >= wanted or radius[query] >= np.pi * EARTH_RADIUS:
+                    indices[query, :min(k, len(index))] = index[:k]
+                    distances[query, :min(k, len(index))] = distance[:k]
+                    done.append(i)
+            radius[pending] *= 2
+            pending = np.delete(pending, done)
+        return distances, indices
+
+    def nearest(self, location, k=1):
+        """Returns the k nearest locations of a Location (which itself is included when it's part of the index)."""
+        if self.locations is None:
+            raise TypeError('nearest needs an index built from locations')
+        _, indices = self.query_knn(location.geo['lat'], location.geo['lng'], k)
+        return [self.locations[i] for i in indices[0] if i >= 0]
+
+    def within(self, location, radius_km):
+        """Returns the locations within radius_km of a Location, nearest first."""
+        if self.locations is None:
+            raise TypeError('within needs an index built from locations')
+        indices, _ = self.query_radius(location.geo['lat'], location.geo['lng'], radius_km)
+        return [self.locations[i] for i in indices[0]]
@@ -0,0 +1,181 @@
+import json
+import os
+import numpy as np
+from .locations import Location, Origin, Destination, read_times, read_impacts, shared_matrix
+from .travel_matrix import TravelMatrix, TIMES, IMPACTS
+
+FORMAT_VERSION = 1
+CLASSES = {-1: Origin, 0: Location, 1: Destination}
+STATS = ('count', 'sum', 'sumsq', 'min', 'max', 'stale', 'sketch', 'sketch_stale')
+COLUMNS = ('side', 'postcode', 'address', 'lat', 'lng', 'place_id', 'row', 'col', 'current')
+
+
+def _check_locations(locations):
+    if not locations:
+        raise ValueError('At least one location is needed')
+    return shared_matrix(locations)
+
+
+def _strings(values):
+    """A fixed width unicode column, None is stored as an empty string."""
+    return np.array(['' if value is None else value for value in values], dtype=str)
+
+
+def save_matrix(path, matrix):
+    """Saves the used part of a TravelMatrix (values, provenance and running statistics) as .npy files in the
+    directory path, next to a meta.json with the modes, dtype and shape."""
+    os.makedirs(path, exist_ok=True)
+    matrix._collect()
+    rows, cols = matrix.n_rows, matrix.n_cols
+    np.save(os.path.join(path, 'data.npy'), matrix._data[:, :, :rows, :cols])
+    np.save(os.path.join(path, 'provenance.npy'), matrix._provenance[:, :rows, :cols])
+    for name in STATS:
+        np.save(os.path.join(path, 'stats_{}.npy'.format(name)), getattr(matrix._stats, name)[:, :, :cols])
+    meta = {'version': FORMAT_VERSION, 'modes': list(matrix.modes), 'dtype': matrix.dtype.str,
+            'n_rows': rows, 'n_cols': cols, 'sketch_accuracy': matrix._stats.accuracy}
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+
+def _read_meta(path):
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    if meta.get('version') != FORMAT_VERSION:
+        raise ValueError('Unsupported format version {} in {}'.format(meta.get('version'), path))
+    return meta
+
+
+def load_matrix(path, mmap=True):
+    """Opens a TravelMatrix saved with save_matrix. With mmap the arrays are memory mapped copy-on-write: opening is
+    instant, only the pages that are read are loaded and writes stay in memory, the files are never changed. Adding
+    locations beyond the saved shape copies the arrays into memory (see TravelMatrix._grow)."""
+    meta = _read_meta(path)
+    mmap_mode = 'c' if mmap else None
+    matrix = TravelMatrix(meta['modes'], dtype=meta['dtype'], capacity=(0, 0),
+                          sketch_accuracy=meta['sketch_accuracy'])
+    matrix._data = np.load(os.path.join(path, 'data.npy'), mmap_mode=mmap_mode)
+    matrix._provenance = np.load(os.path.join(path, 'provenance.npy'), mmap_mode=mmap_mode)
+    for name in STATS:
+        setattr(matrix._stats, name, np.load(os.path.join(path, 'stats_{}.npy'.format(name)), mmap_mode=mmap_mode))
+    if matrix._stats.sketch.shape[-1] != matrix._stats.n_buckets:
+        raise ValueError('The saved sketch has {} buckets, expected {}'.format(matrix._stats.sketch.shape[-1],
+                                                                               matrix._stats.n_buckets))
+    matrix.n_rows, matrix.n_cols = meta['n_rows'], meta['n_cols']
+    return matrix
+
+
+def save(path, locations):
+    """Saves a study: the locations (Origins, Destinations and plain Locations) and the TravelMatrix they share. The
+    locations are stored column by column (kind, postcode, address, lat, lng, place id, row and column id and the
+    current destination of origins) as one .npy file per column, the matrix with save_matrix."""
+    locations = sorted(locations, key=lambda location: location._seq)
+    matrix = _check_locations(locations)
+    position = {id(location): i for i, location in enumerate(locations)}
+
+    def current(location):
+        dest = getattr(location, 'current_destination', None)
+        if dest is None:
+            return -1
+        if id(dest) not in position:
+            raise ValueError('The current destination of every origin should be saved as well')
+        return position[id(dest)]
+
+    def geo(location, key):
+        return np.nan if location.geo is None else location.geo[key]
+
+    columns = {'side': np.array([location._side for location in locations], dtype=np.int8),
+               'postcode': _strings(location.postcode for location in locations),
+               'address': _strings(location.address for location in locations),
+               'lat': np.array([geo(location, 'lat') for location in locations], dtype=np.float64),
+               'lng': np.array([geo(location, 'lng') for location in locations], dtype=np.float64),
+               'place_id': _strings(location.google_place_id for location in locations),
+               'row': np.array([-1 if location._row is None else location._row for location in locations]),
+               'col': np.array([-1 if location._col is None else location._col for location in locations]),
+               'current': np.array([current(location) for location in locations])}
+    save_matrix(path, matrix)
+    for name in COLUMNS:
+        np.save(os.path.join(path, 'locations_{}.npy'.format(name)), columns[name])
+
+
+def load(path, mmap=True):
+    """Opens a study saved with save. Returns a Study, the Location objects are only created when they are first
+    used."""
+    return Study(path, mmap)
+
+
+class Study:
+    """A saved study: matrix is the (memory mapped) TravelMatrix and table holds the location columns as arrays, e.g.
+    table['postcode']. The locations list is built on first access, origins and destinations filter it."""
+
+    def __init__(self, path, mmap=True):
+        self.path = path
+        self.matrix = load_matrix(path, mmap)
+        mmap_mode = 'c' if mmap else None
+        self.table = {name: np.load(os.path.join(path, 'locations_{}.npy'.format(name)), mmap_mode=mmap_mode)
+                      for name in COLUMNS}
+        self._locations = None
+
+    def __len__(self):
+        return len(self.table['side'])
+
+    @property
+    def locations(self):
+        if self._locations is None:
+            self._locations = self._build()
+        return self._locations
+
+    @property
+    def origins(self):
+        return [location for location in self.locations if isinstance(location, Origin)]
+
+    @property
+    def destinations(self):
+        return [location for location in self.locations if isinstance(location, Destination)]
+
+    def _build(self):
+        table = self.table
+        locations = []
+        for i in range(len(self)):
+            side = table['side'][i].item()
+            postcode, address = table['postcode'][i].item() or None, table['address'][i].item() or None
+            lat, lng = table['lat'][i].item(), table['lng'][i].item()
+            geo = None if np.isnan(lat) else {'lat': lat, 'lng': lng}
+            location = CLASSES[side](postcode=postcode, address=address, geo=geo, matrix=self.matrix)
+            location.google_place_id = table['place_id'][i].item() or None
+            row, col = table['row'][i].item(), table['col'][i].item()
+            location._row = None if row < 0 else row
+            location._col = None if col < 0 else col
+            locations.append(location)
+
+        # The impacts are saved with the matrix, so the current destinations are restored without a rebase.
+        for i in np.flatnonzero(table['current'] >= 0):
+            locations[i]._current_destination = locations[table['current'][i]]
+        return locations
+
+
+def import_values(origins, destinations, values, kind=TIMES):
+    """Bulk version of set_times/set_impacts: values maps a mode to an (origins x destinations) array, NaN for pairs
+    without a value. Every mode is written with a single TravelMatrix.set_block."""
+    origins, destinations = list(origins), list(destinations)
+    matrix = _check_locations(origins + destinations)
+    if not all(isinstance(origin, Origin) for origin in origins):
+        raise TypeError('origins should be of the class Origin')
+    if not all(isinstance(dest, Destination) for dest in destinations):
+        raise TypeError('destinations should be of the class Destination')
+    rows, cols = matrix.rows(origins), matrix.cols(destinations)
+    for mode, block in values.items():
+        block = np.asarray(block, dtype=matrix.dtype)
+        if block.shape != (len(origins), len(destinations)):
+            raise ValueError('Expected an array of shape {} for mode {} got {}'.format(
+                (len(origins), len(destinations)), mode, block.shape))
+        matrix.set_block(kind, mode, rows, cols, block)
+
+
+def export_values(origins, destinations, kind=TIMES, modes=None):
+    """Returns a dict with per mode a writable (origins x destinations) copy of the values, NaN for pairs without a
+    value."""
+    origins, destinations = list(origins), list(destinations)
+    matrix = _check_locations(origins + destinations)
+    modes = matrix.modes if modes is None else modes
+    values = read_impacts(origins, destinations, modes) if kind == IMPACTS else read_times(origins, destinations, modes)
+    return {mode: np.array(block) for mode, block in zip(modes, values)}
@@ -0,0 +1,72 @@
+import unittest
+import numpy as np
+from locations import Origin, Destination, TravelMatrix, StraightLineEstimator
+
+
+class TestStraightLineEstimator(unittest.TestCase):
+
+    def setUp(self):
+        self.matrix = TravelMatrix()
+        self.origins = [Origin(postcode='EC4M 8AD', geo={'lat': 51.5 + i / 50, 'lng': -0.1}, matrix=self.matrix)
+                        for i in range(10)]
+        self.destinations = [Destination(postcode='SW1A 1AA', geo={'lat': 51.5, 'lng': -0.1 + i / 50},
+                                         matrix=self.matrix) for i in range(3)]
+        self.estimator = StraightLineEstimator()
+
+    def test_fit(self):
+        distances = np.array([1, 2, 5, 10, 20])
+        np.testing.assert_allclose(self.estimator.fit('car', distances, 3 + 2 * distances), (3, 2))
+        self.assertAlmostEqual(self.estimator.error['car'], 0)
+        np.testing.assert_allclose(self.estimator.predict('car', [0, 4]), [3, 11])
+
+        with self.assertRaises(ValueError):
+            self.estimator.fit('car', [1], [2])
+
+    def test_calibrate(self):
+        geocodes = {'a': {'geo': {'lat': 51.5, 'lng': -0.1}}, 'b': {'geo': {'lat': 51.6, 'lng': -0.1}},
+                    'c': {'geo': {'lat': 51.7, 'lng': -0.1}}}
+        result = {'a': {'b': {'time': 600, 'dist': 13000}, 'c': {'time': 1200, 'dist': 25000}},
+                  'b': {'c': {'time': None, 'dist': None}}}
+        intercept, slope = self.estimator.calibrate('fastest', result, geocodes)
+        self.assertAlmostEqual(intercept, 0)
+        self.assertAlmostEqual(slope, 10 / 11.12, places=2)
+
+    def test_fill(self):
+        self.origins[0].set_times('car', 60, self.destinations[1])
+        self.estimator.fill(self.origins, self.destinations, block=4)
+
+        self.assertEqual(self.origins[0].get_times('car', self.destinations[1]), 60)
+        self.assertEqual(self.origins[0].get_provenance(self.destinations[1], 'car'), 'measured')
+        self.assertEqual(self.origins[0].get_provenance(self.destinations[0], 'car'), 'estimated')
+        self.assertEqual(self.origins[0].get_times('car', self.destinations[0]), 5)
+        self.assertAlmostEqual(self.origins[5].get_times('public transport', self.destinations[0]),
+                               10 + 2.5 * 11.12, places=1)
+        self.assertEqual(self.destinations[2].time_stats('fastest')['count'], 10)
+
+        self.estimator.fill(self.origins, self.destinations, modes=['car'], overwrite=True)
+        self.assertEqual(self.origins[0].get_provenance(self.destinations[1], 'car'), 'estimated')
+        self.assertEqual(self.destinations[1].time_stats('car')['count'], 10)
+
+    def test_calibrate_locations(self):
+        for origin in self.origins[:5]:
+            for dest in self.destinations:
+                km = StraightLineEstimator.distances([origin], [dest])[0, 0]
+                origin.set_times('car', 2 + 3 * km, dest)
+        self.estimator.fill(self.origins, self.destinations, modes=['car'])
+
+        intercept, slope = self.estimator.calibrate_locations('car', self.origins, self.destinations)
+        self.assertAlmostEqual(intercept, 2)
+        self.assertAlmostEqual(slope, 3)
+
+    def test_checks(self):
+        with self.assertRaises(TypeError):
+            self.estimator.fill(self.destinations, self.origins)
+        with self.assertRaises(ValueError):
+            self.estimator.fill([Origin(postcode='EC4M 8AD', matrix=self.matrix)], self.destinations)
+        with self.assertRaises(ValueError):
+            self.estimator.fill(self.origins, [Destination(postcode='EC4M 8AD', geo={'lat': 1, 'lng': 1},
+                                                           matrix=TravelMatrix())])
+
+
+if __name__ == '__main__':
+    unittest.main()
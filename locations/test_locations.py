@@ -1,5 +1,8 @@
+import gc
+import tracemalloc
 import unittest
-from locations import Location, Origin, Destination
+from unittest import mock
+from locations import Location, Origin, Destination, TravelMatrix, assign_current_destinations
 
 
 class TestLocation(unittest.TestCase):
@@ -15,6 +18,15 @@ class TestLocation(unittest.TestCase):
                                   address="St. Paul's Churchyard, London",
                                   geo={'lat': 51.513723, 'lng': -0.099858})
 
+    def test_failed_init(self):
+        with mock.patch('sys.unraisablehook') as hook:
+            with self.assertRaises(TypeError):
+                Location()
+            with self.assertRaises(TypeError):
+                Location(postcode='EC4M 8AD', geo=(51.5, -0.1), matrix=TravelMatrix())
+            gc.collect()
+        hook.assert_not_called()
+
     def test_check_params(self):
         with self.assertRaises(TypeError):
             self.location1.set_times(mode='strongest', value=15, to_location=self.location2)
@@ -56,6 +68,27 @@ class TestLocation(unittest.TestCase):
         with self.assertRaises(KeyError):
             self.location1.geo = {'lat': 5, 'lon': 5}
 
+        self.assertEqual(self.location1.geo, {'lat': 51.513723, 'lng': -0.099858})
+        self.assertIsNone(Location(postcode='EC4M 8AD').geo)
+
+    def test_compact(self):
+        self.assertFalse(hasattr(self.location1, '__dict__'))
+        self.assertFalse(hasattr(Origin(postcode='EC4M 8AD'), '__dict__'))
+        self.assertFalse(hasattr(Destination(postcode='EC4M 8AD'), '__dict__'))
+        self.assertIs(self.location1.modes, self.location2.modes)
+        self.assertIs(self.location1.postcode, Location(postcode=''.join(['EC4M', ' 8AD'])).postcode)
+
+        matrix = TravelMatrix()
+        origins = [None] * 10000
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for i in range(len(origins)):
+            origins[i] = Origin(postcode='EC4M 8AD', geo={'lat': 51.5 + i * 1e-6, 'lng': -0.1 - i * 1e-6},
+                                matrix=matrix)
+        per_origin = (tracemalloc.get_traced_memory()[0] - before) / len(origins)
+        tracemalloc.stop()
+        self.assertLessEqual(per_origin, 200)
+
     def test_mode(self):
         self.location1.set_times('public transport', 15, self.location2)
         self.location1.set_times('car', 23, self.location2)
@@ -64,6 +97,7 @@ class TestLocation(unittest.TestCase):
 
         with self.assertRaises(TypeError):
             self.location1.mode = 'test'
+        self.assertEqual(self.location1.mode, 'fastest')
 
         self.assertEquals(self.location1.times, [])
         with self.assertRaises(KeyError):
@@ -126,6 +160,40 @@ class TestOrigin(unittest.TestCase):
         self.assertEqual(self.origin.get_impacts(to_location=self.destination2, mode='fastest'), -5)
         self.assertEquals(self.destination2.get_impacts(to_location=self.origin, mode='fastest'), -5)
 
+    def test_assign_current_destinations(self):
+        origin2 = Origin(postcode='EC4M 8AD')
+        for mode in self.origin.modes:
+            self.origin.set_times(mode, 30, self.destination1)
+            self.origin.set_times(mode, 25, self.destination2)
+            origin2.set_times(mode, 10, self.destination1)
+            origin2.set_times(mode, 40, self.destination2)
+
+        with self.assertRaises(ValueError):
+            assign_current_destinations([self.origin, origin2], [self.destination1])
+        with self.assertRaises(TypeError):
+            assign_current_destinations([self.origin, origin2], self.origin)
+
+        assign_current_destinations([self.origin, origin2], [self.destination2, self.destination1])
+        self.assertEqual(self.origin.current_destination, self.destination2)
+        self.assertEqual(origin2.current_destination, self.destination1)
+        self.assertEqual(self.origin.get_impacts('car', self.destination1), 5)
+        self.assertEqual(origin2.get_impacts('car', self.destination2), 30)
+        self.assertEqual(self.destination1.avg_impact('car'), 2.5)
+
+        assign_current_destinations([self.origin, origin2], self.destination1)
+        self.assertEqual(self.destination2.get_impacts('fastest'), [-5, 30])
+
+    def test_duplicate_origins(self):
+        for mode in self.origin.modes:
+            self.origin.set_times(mode, 30, self.destination1)
+            self.origin.set_times(mode, 25, self.destination2)
+
+        assign_current_destinations([self.origin, self.origin], [self.destination1, self.destination2])
+        self.assertEqual(self.origin.current_destination, self.destination2)
+        self.assertEqual(self.destination1.impact_stats('car')['count'], 1)
+        self.assertEqual(self.destination1.avg_impact('car'), 5)
+        self.assertEqual(self.destination2.avg_impact('car'), 0)
+
 
 class TestDestination(unittest.TestCase):
 
@@ -165,6 +233,24 @@ class TestDestination(unittest.TestCase):
         self.assertEquals(self.destination.avg_impact('car'), 7.5)
         self.assertEquals(self.destination.avg_impact('fastest'), 0)
 
+    def test_stats(self):
+        self.origin1.set_times(mode='car', value=20, to_location=self.destination)  # Overwrites the previous 30
+        stats = self.destination.time_stats('car')
+        self.assertEqual(stats['count'], 2)
+        self.assertEqual(stats['sum'], 45)
+        self.assertEqual(stats['min'], 20)
+        self.assertEqual(stats['max'], 25)
+        self.assertEqual(self.destination.avg_time('car'), 22.5)
+        self.assertEqual(self.destination.impact_stats('fastest')['count'], 0)
+
+    def test_percentile(self):
+        origins = [Origin(postcode='EC4M 8AD') for _ in range(100)]
+        for i, origin in enumerate(origins):
+            origin.set_times(mode='fastest', value=i + 1, to_location=self.destination)
+        self.assertAlmostEqual(self.destination.time_percentile(0.5, 'fastest'), 50, delta=50 * 0.02)
+        self.assertAlmostEqual(self.destination.time_percentile(0.9, 'fastest'), 90, delta=90 * 0.02)
+        self.assertAlmostEqual(self.destination.impact_percentile(0.5, 'car'), 5, delta=5 * 0.02)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+import numpy as np
+from locations import TravelProfiles
+
+
+class TestTravelProfiles(unittest.TestCase):
+
+    def setUp(self):
+        random = np.random.default_rng(0)
+        hours = np.arange(24)
+        rush = np.exp(-(hours - 8.5) ** 2 / 2) + np.exp(-(hours - 17.5) ** 2 / 2)
+        self.times = np.rint(random.uniform(10, 80, (50, 7, 1)) * (1 + 0.5 * rush))
+        self.profiles = TravelProfiles(50, 7, block=16)
+        self.profiles.set('car', 0, self.times)
+
+    def test_round_trip(self):
+        np.testing.assert_array_equal(self.profiles.get('car'), self.times)
+        np.testing.assert_array_equal(self.profiles.get('car', slice(10, 20)), self.times[10:20])
+        self.assertTrue(np.isnan(self.profiles.get('fastest')).all())
+
+    def test_quantize(self):
+        times = np.array([[[10.4, 12.6, np.nan, 400.0]], [[np.nan] * 4]])
+        profiles = TravelProfiles(2, 1, slots=4)
+        base, deltas = profiles.quantize(times)
+        self.assertEqual(base.tolist(), [[10], [65535]])
+        self.assertEqual(deltas[0, 0].tolist(), [0, 3, 255, 254])
+        profiles.set('car', 0, times)
+        np.testing.assert_array_equal(profiles.get('car')[0, 0], [10, 13, np.nan, 264])
+        self.assertTrue(np.isnan(profiles.get('car')[1]).all())
+
+        half = TravelProfiles(1, 1, slots=4, resolution=0.5)
+        half.set('car', 0, times[:1])
+        np.testing.assert_array_equal(half.get('car')[0, 0, :2], [10.5, 12.5])
+
+    def test_partial_set(self):
+        update = self.times[12:40] + 5
+        self.profiles.set('car', 12, update)
+        np.testing.assert_array_equal(self.profiles.get('car')[12:40], update)
+        np.testing.assert_array_equal(self.profiles.get('car')[:12], self.times[:12])
+        np.testing.assert_array_equal(self.profiles.get('car')[40:], self.times[40:])
+
+        with self.assertRaises(IndexError):
+            self.profiles.set('car', 45, self.times[:10])
+        with self.assertRaises(ValueError):
+            self.profiles.set('car', 0, self.times[:, :3])
+        with self.assertRaises(KeyError):
+            self.profiles.get('bike')
+
+    def test_queries(self):
+        rush = self.profiles.slot_range(8, 9)
+        self.assertEqual(rush, slice(8, 9))
+        self.assertEqual(TravelProfiles(1, 1, slots=96).slot_range(8, 9.5), slice(32, 38))
+
+        np.testing.assert_allclose(self.profiles.window('car', rush), self.times[:, :, 8])
+        np.testing.assert_allclose(self.profiles.average('car', slice(7, 10)), self.times[:, :, 7:10].mean(axis=(0, 2)))
+
+        current = np.arange(50) % 7
+        expected = (self.times[:, :, 8] - self.times[np.arange(50), current, 8][:, None]).mean(axis=0)
+        np.testing.assert_allclose(self.profiles.impact('car', rush, current), expected)
+        with self.assertRaises(ValueError):
+            self.profiles.impact('car', rush, current[:3])
+
+    def test_missing(self):
+        times = self.times.copy()
+        times[0, 0, 8] = np.nan
+        times[1, :, :] = np.nan
+        self.profiles.set('car', 0, times[:2])
+        window = self.profiles.window('car', slice(8, 10))
+        self.assertEqual(window[0, 0], times[0, 0, 9])
+        self.assertTrue(np.isnan(window[1]).all())
+        np.testing.assert_allclose(self.profiles.average('car', slice(8, 9)), np.nanmean(times[:, :, 8], axis=0))
+
+    def test_compressed(self):
+        self.assertLess(self.profiles.nbytes(), self.times.size)
+
+
+if __name__ == '__main__':
+    unittest.main()
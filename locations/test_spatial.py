@@ -0,0 +1,80 @@
+import unittest
+from unittest import mock
+import numpy as np
+from locations import Location, SpatialIndex, haversine
+
+
+class TestSpatialIndex(unittest.TestCase):
+
+    def setUp(self):
+        random = np.random.default_rng(1)
+        self.lat = np.concatenate([random.uniform(51, 52, 500), random.uniform(-90, 90, 500), [89.99, -89.99]])
+        self.lng = np.concatenate([random.uniform(-1, 1, 500), random.uniform(-180, 180, 500), [0, 120]])
+        self.index = SpatialIndex.from_coordinates(self.lat, self.lng, cell_km=10)
+
+    def test_haversine(self):
+        self.assertAlmostEqual(haversine(51.513723, -0.099858, 51.501009, -0.141588), 3.2, places=1)
+        self.assertAlmostEqual(haversine(0, 179.9, 0, -179.9), 22.2, places=1)
+
+    def test_radius(self):
+        queries = [(51.5, 0.0, 20), (0.0, 179.99, 1500), (89.0, 45.0, 500), (-45.0, -179.0, 3000)]
+        lat, lng, radius = (np.array(values) for values in zip(*queries))
+        indices, distances = self.index.query_radius(lat, lng, radius)
+
+        for i, (q_lat, q_lng, q_radius) in enumerate(queries):
+            brute = haversine(q_lat, q_lng, self.lat, self.lng)
+            self.assertEqual(set(indices[i]), set(np.flatnonzero(brute <= q_radius)))
+            np.testing.assert_allclose(distances[i], np.sort(brute[brute <= q_radius]))
+
+    def test_knn(self):
+        lat, lng = np.array([51.5, 0.0, -89.0, 10.0]), np.array([0.0, -179.9, 10.0, 10.0])
+        distances, indices = self.index.query_knn(lat, lng, k=5)
+
+        for i in range(len(lat)):
+            brute = haversine(lat[i], lng[i], self.lat, self.lng)
+            np.testing.assert_allclose(distances[i], np.sort(brute)[:5])
+            self.assertEqual(set(indices[i]), set(np.argsort(brute)[:5]))
+
+    def test_dense(self):
+        random = np.random.default_rng(2)
+        lat, lng = 51.5 + random.uniform(-0.05, 0.05, 20000), -0.1 + random.uniform(-0.08, 0.08, 20000)
+        index = SpatialIndex.from_coordinates(lat, lng)
+        self.assertLess(index.cell_km, 0.5)
+
+        q_lat, q_lng = 51.5 + random.uniform(-0.06, 0.06, 50), -0.1 + random.uniform(-0.09, 0.09, 50)
+        distances, indices = index.query_knn(q_lat, q_lng, k=4)
+        for i in range(len(q_lat)):
+            brute = haversine(q_lat[i], q_lng[i], lat, lng)
+            np.testing.assert_allclose(distances[i], np.sort(brute)[:4])
+
+        found, found_distances = index.query_radius(q_lat, q_lng, 0.3)
+        with mock.patch('locations.spatial.MAX_CANDIDATES', 100):
+            batched, batched_distances = index.query_radius(q_lat, q_lng, 0.3)
+        self.assertEqual(len(batched), 50)
+        for i in range(len(q_lat)):
+            np.testing.assert_array_equal(batched[i], found[i])
+            np.testing.assert_array_equal(batched_distances[i], found_distances[i])
+            brute = haversine(q_lat[i], q_lng[i], lat, lng)
+            self.assertEqual(set(found[i]), set(np.flatnonzero(brute <= 0.3)))
+
+    def test_small_index(self):
+        index = SpatialIndex.from_coordinates([51.5, 40.4], [-0.1, -3.7])
+        distances, indices = index.query_knn(48.9, 2.4, k=3)
+        self.assertEqual(list(indices[0]), [0, 1, -1])
+        self.assertEqual(distances[0][2], np.inf)
+
+    def test_locations(self):
+        paul = Location(postcode='EC4M 8AD', geo={'lat': 51.513723, 'lng': -0.099858})
+        palace = Location(postcode='SW1A 1AA', geo={'lat': 51.501009, 'lng': -0.141588})
+        madrid = Location(address='Puerta del Sol, Madrid', geo={'lat': 40.416775, 'lng': -3.703790})
+        index = SpatialIndex([paul, palace, madrid])
+
+        self.assertEqual(index.nearest(paul, k=2), [paul, palace])
+        self.assertEqual(index.within(palace, 10), [palace, paul])
+
+        with self.assertRaises(ValueError):
+            SpatialIndex([Location(postcode='EC4M 8AD')])
+
+
+if __name__ == '__main__':
+    unittest.main()
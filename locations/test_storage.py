@@ -0,0 +1,109 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from locations import Location, Origin, Destination, TravelMatrix, save, load, import_values, export_values
+from locations.travel_matrix import TIMES, IMPACTS
+
+
+class TestStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'study')
+        self.matrix = TravelMatrix()
+        self.origins = [Origin(postcode='EC4M 8AD', geo={'lat': 51.5, 'lng': -0.1 * i}, matrix=self.matrix)
+                        for i in range(6)]
+        self.destinations = [Destination(address='Pall Mall', matrix=self.matrix) for _ in range(4)]
+        self.other = Location(postcode='SW1A 1AA', matrix=self.matrix)
+        self.times = {mode: np.arange(24, dtype=np.float64).reshape(6, 4) + m
+                      for m, mode in enumerate(self.matrix.modes)}
+        self.times['car'][0, 1] = np.nan
+        import_values(self.origins, self.destinations, self.times)
+        self.origins[1].current_destination = self.destinations[2]
+        self.origins[0].google_place_id = 'place-1'
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_import_export(self):
+        exported = export_values(self.origins, self.destinations)
+        for mode in self.matrix.modes:
+            np.testing.assert_array_equal(exported[mode], self.times[mode])
+        self.assertEqual(self.origins[2].get_times('fastest', self.destinations[3]), 11)
+        self.assertEqual(self.destinations[0].time_stats('car')['count'], 6)
+
+        new = Destination(postcode='E14 5AB', matrix=self.matrix)
+        self.assertTrue(np.isnan(export_values(self.origins, [new], modes=['car'])['car']).all())
+
+        with self.assertRaises(ValueError):
+            import_values(self.origins, self.destinations, {'car': np.zeros((2, 2))})
+        with self.assertRaises(TypeError):
+            import_values(self.destinations, self.origins, {'car': np.zeros((4, 6))})
+
+    def test_round_trip(self):
+        save(self.path, self.origins + self.destinations + [self.other])
+        study = load(self.path)
+        self.assertEqual(len(study), 11)
+        self.assertIsInstance(study.matrix._data, np.memmap)
+        self.assertEqual(list(study.table['postcode'][:2]), ['EC4M 8AD', 'EC4M 8AD'])
+
+        origins, destinations = study.origins, study.destinations
+        self.assertEqual((len(origins), len(destinations)), (6, 4))
+        self.assertEqual(origins[3].geo, {'lat': 51.5, 'lng': -0.1 * 3})
+        self.assertIsNone(destinations[0].postcode)
+        self.assertEqual(destinations[0].address, 'Pall Mall')
+        self.assertEqual(origins[0].google_place_id, 'place-1')
+        self.assertIs(origins[1].current_destination, destinations[2])
+        self.assertIsNone(origins[0].current_destination)
+
+        for mode in self.matrix.modes:
+            np.testing.assert_array_equal(export_values(origins, destinations, modes=[mode])[mode], self.times[mode])
+        np.testing.assert_array_equal(export_values(origins, destinations, IMPACTS)['car'],
+                                      export_values(self.origins, self.destinations, IMPACTS)['car'])
+        self.assertEqual(destinations[1].time_stats('fastest'), self.destinations[1].time_stats('fastest'))
+        self.assertEqual(destinations[1].time_percentile(0.5), self.destinations[1].time_percentile(0.5))
+
+    def test_reassign_after_load(self):
+        save(self.path, self.origins + self.destinations)
+        for mmap in (True, False):
+            study = load(self.path, mmap=mmap)
+            origins, destinations = study.origins, study.destinations
+            origins[1].current_destination = destinations[0]
+            origins[3].current_destination = destinations[3]
+            self.origins[1].current_destination = self.destinations[0]
+            self.origins[3].current_destination = self.destinations[3]
+
+            self.assertEqual(origins[1].get_impacts('car', destinations[3]), 3)
+            self.assertEqual(destinations[2].impact_stats('car'), self.destinations[2].impact_stats('car'))
+            self.assertEqual(destinations[2].impact_percentile(0.5, 'car'),
+                             self.destinations[2].impact_percentile(0.5, 'car'))
+
+    def test_copy_on_write(self):
+        save(self.path, self.origins + self.destinations)
+        study = load(self.path)
+        origins, destinations = study.origins, study.destinations
+        origins[0].set_times('car', 99, destinations[0])
+        extra = Origin(postcode='E1 6AN', matrix=study.matrix)
+        extra.set_times('car', 5, destinations[0])
+        self.assertEqual(destinations[0].time_stats('car')['count'], 7)
+
+        reloaded = load(self.path)
+        self.assertEqual(reloaded.matrix.get(TIMES, 'car', reloaded.origins[0], reloaded.destinations[0]), 2)
+        self.assertEqual(reloaded.matrix.n_rows, 6)
+
+    def test_in_memory(self):
+        save(self.path, self.origins + self.destinations)
+        study = load(self.path, mmap=False)
+        self.assertNotIsInstance(study.matrix._data, np.memmap)
+        self.assertEqual(study.origins[5].get_times('fastest', study.destinations[0]), 20)
+
+    def test_missing_current_destination(self):
+        with self.assertRaises(ValueError):
+            save(self.path, self.origins)
+        with self.assertRaises(ValueError):
+            save(self.path, self.origins[2:3] + [Destination(postcode='E14 5AB', matrix=TravelMatrix())])
+
+
+if __name__ == '__main__':
+    unittest.main()
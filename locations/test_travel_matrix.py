@@ -0,0 +1,226 @@
+import unittest
+import weakref
+import numpy as np
+from locations import Location, Origin, Destination, TravelMatrix, read_times, read_impacts, shared_matrix
+
+
+class TestTravelMatrix(unittest.TestCase):
+
+    def setUp(self):
+        self.matrix = TravelMatrix(capacity=(1, 1))
+        self.origins = [Origin(postcode='EC4M 8AD', matrix=self.matrix) for _ in range(5)]
+        self.destinations = [Destination(postcode='EC4M 8AD', matrix=self.matrix) for _ in range(3)]
+
+    def test_single_store(self):
+        self.origins[0].set_times('car', 30, self.destinations[0])
+        self.destinations[0].set_times('car', 25, self.origins[1])
+
+        self.assertEqual(self.matrix.n_rows, 2)
+        self.assertEqual(self.matrix.n_cols, 1)
+        self.assertEqual(self.origins[1].get_times('car', self.destinations[0]), 25)
+        self.assertEqual(self.destinations[0].get_times('car'), [30, 25])
+
+    def test_grow(self):
+        for i, origin in enumerate(self.origins):
+            for j, destination in enumerate(self.destinations):
+                origin.set_times('fastest', i * 10 + j, destination)
+
+        self.assertEqual(self.matrix.n_rows, 5)
+        self.assertEqual(self.matrix.n_cols, 3)
+        for i, origin in enumerate(self.origins):
+            self.assertEqual(origin.get_times('fastest'), [i * 10, i * 10 + 1, i * 10 + 2])
+
+    def test_stats(self):
+        destination = self.destinations[0]
+        for i, origin in enumerate(self.origins):
+            origin.set_times('car', 10 + i, destination)
+        self.origins[0].set_times('car', 30, destination)
+        self.origins[4].set_times('car', 12, destination)
+
+        stats = self.matrix.stats(0, 'car', destination)
+        self.assertEqual(stats['count'], 5)
+        self.assertEqual(stats['sum'], 30 + 11 + 12 + 13 + 12)
+        self.assertEqual(stats['min'], 11)
+        self.assertEqual(stats['max'], 30)
+        self.assertAlmostEqual(stats['std'], np.std([30, 11, 12, 13, 12]))
+        self.assertAlmostEqual(self.matrix.quantile(0, 'car', destination, 0.5), 12, delta=12 * 0.02)
+        with self.assertRaises(ValueError):
+            self.matrix.quantile(0, 'car', destination, 1.5)
+
+    def test_negative_quantiles(self):
+        destination = self.destinations[1]
+        for i, origin in enumerate(self.origins):
+            origin.set_impacts('car', i - 2, destination)
+        self.assertAlmostEqual(self.matrix.quantile(1, 'car', destination, 0), -2, delta=2 * 0.02)
+        self.assertAlmostEqual(self.matrix.quantile(1, 'car', destination, 0.5), 0)
+        self.assertAlmostEqual(self.matrix.quantile(1, 'car', destination, 1), 2, delta=2 * 0.02)
+
+    def test_rebase_stats(self):
+        for i, origin in enumerate(self.origins):
+            origin.set_times('car', 10 + i, self.destinations[0])
+            origin.set_times('car', 20, self.destinations[1])
+        self.matrix.rebase([o._row for o in self.origins], self.destinations[1]._col)
+
+        stats = self.matrix.stats(1, 'car', self.destinations[0])
+        self.assertEqual(stats['count'], 5)
+        self.assertEqual(stats['sum'], -40)
+        self.assertEqual(stats['min'], -10)
+        self.assertEqual(stats['max'], -6)
+        self.assertAlmostEqual(self.matrix.quantile(1, 'car', self.destinations[0], 0.5), -8, delta=8 * 0.02)
+
+        self.matrix.rebase([o._row for o in self.origins], self.destinations[0]._col)
+        self.assertEqual(self.matrix.stats(1, 'car', self.destinations[0])['max'], 0)
+        self.assertEqual(self.matrix.quantile(1, 'car', self.destinations[0], 0.5), 0)
+
+    def test_rebase_row(self):
+        rng = np.random.default_rng(0)
+        for origin in self.origins:
+            for destination in self.destinations:
+                for mode in self.matrix.modes:
+                    origin.set_times(mode, rng.uniform(5, 60), destination)
+        self.origins[0].current_destination = self.destinations[0]
+        for i in range(20):
+            self.origins[i % 5].current_destination = self.destinations[i % 3]
+        self.assertFalse(self.matrix._stats.sketch_stale.any())
+
+        stats = self.matrix.stats(1, 'car', self.destinations[2])
+        impacts = np.array(self.destinations[2].get_impacts('car'))
+        self.assertEqual(stats['count'], 5)
+        self.assertAlmostEqual(stats['sum'], impacts.sum())
+        self.assertAlmostEqual(stats['std'], impacts.std())
+        self.assertEqual(stats['min'], impacts.min())
+        self.assertEqual(stats['max'], impacts.max())
+        median = np.quantile(impacts, 0.5, method='lower')
+        self.assertAlmostEqual(self.matrix.quantile(1, 'car', self.destinations[2], 0.5), median,
+                               delta=abs(median) * 0.02)
+
+        with self.assertRaises(ValueError):
+            self.matrix.rebase([self.origins[0]._row] * 2, self.destinations[0]._col)
+
+    def test_missing(self):
+        with self.assertRaises(KeyError):
+            self.matrix.get(0, 'car', self.origins[0], self.destinations[0])
+        with self.assertRaises(KeyError):
+            self.matrix.get(0, 'bike', self.origins[0], self.destinations[0])
+        self.assertFalse(self.matrix.has(0, 'car', self.origins[0], self.destinations[0]))
+
+    def test_other_matrix(self):
+        other = Destination(postcode='EC4M 8AD', matrix=TravelMatrix())
+        with self.assertRaises(ValueError):
+            self.origins[0].set_times('car', 10, other)
+
+    def test_orientation(self):
+        location1 = Location(postcode='EC4M 8AD', matrix=self.matrix)
+        location2 = Location(postcode='EC4M 8AD', matrix=self.matrix)
+        location2.set_times('car', 12, location1)
+
+        self.assertEqual(location1._row, 0)
+        self.assertEqual(location2._col, 0)
+        self.assertEqual(location1.get_times('car', location2), 12)
+
+    def test_dtype(self):
+        matrix = TravelMatrix(dtype=np.float32)
+        origin = Origin(postcode='EC4M 8AD', matrix=matrix)
+        destination = Destination(postcode='EC4M 8AD', matrix=matrix)
+        origin.set_times('car', 12.5, destination)
+
+        self.assertEqual(destination.get_times('car', origin), 12.5)
+        self.assertEqual(matrix.nbytes(), 2 * 3 * 4)
+
+    def test_bulk_reads(self):
+        for i, origin in enumerate(self.origins):
+            for j, destination in enumerate(self.destinations):
+                origin.set_times('car', i * 10 + j, destination)
+
+        times = read_times(self.origins[1:4], self.destinations[:2], modes=['car'])
+        self.assertEqual(times.shape, (1, 3, 2))
+        np.testing.assert_array_equal(times[0], [[10, 11], [20, 21], [30, 31]])
+        self.assertFalse(times.flags.writeable)
+        self.assertTrue(np.shares_memory(times, self.matrix._data))
+
+        shuffled = read_times(self.origins[::-1], self.destinations)
+        self.assertEqual(shuffled.shape, (3, 5, 3))
+        np.testing.assert_array_equal(shuffled[2, 0], [40, 41, 42])
+        self.assertTrue(np.isnan(shuffled[0]).all())
+
+        new = Destination(postcode='EC4M 8AD', matrix=self.matrix)
+        self.assertTrue(np.isnan(read_impacts(self.origins, [new] + self.destinations, ['car'])[0, :, 0]).all())
+        with self.assertRaises(TypeError):
+            read_times(self.destinations, self.origins)
+
+    def test_views(self):
+        self.origins[0].set_times('car', 12, self.destinations[1])
+        self.origins[1].set_times('car', 8, self.destinations[1])
+        row, column = self.origins[0].time_view('car'), self.destinations[1].time_view('car')
+        np.testing.assert_array_equal(column, [12, 8])
+        self.assertEqual(row[self.destinations[1]._col], 12)
+        with self.assertRaises(ValueError):
+            row[0] = 1
+
+        self.origins[1].set_times('car', 9, self.destinations[1])
+        self.assertEqual(column[1], 9)
+        self.assertEqual(self.matrix.view(0, 'car').shape, (2, 1))
+        self.assertEqual(self.matrix.view(0).shape, (3, 2, 1))
+        self.assertIsNone(self.origins[4].impact_view())
+
+    def test_release(self):
+        for i, origin in enumerate(self.origins):
+            origin.set_times('car', 10 + i, self.destinations[0])
+            origin.set_times('car', 20 + i, self.destinations[1])
+        row = self.origins[4]._row
+        del self.origins[4], origin
+        stats = self.destinations[0].time_stats('car')
+        self.assertEqual((stats['count'], stats['sum'], stats['max']), (4, 46, 13))
+        self.assertAlmostEqual(self.destinations[1].time_percentile(1, 'car'), 23, delta=23 * 0.02)
+
+        origin = Origin(postcode='EC4M 8AD', matrix=self.matrix)
+        origin.set_times('car', 5, self.destinations[1])
+        self.assertEqual(origin._row, row)
+        self.assertEqual(self.matrix.n_rows, 5)
+        self.assertEqual(origin.get_times('car'), [5])
+        self.assertEqual(self.destinations[1].time_stats('car')['min'], 5)
+
+        col = self.destinations[0]._col
+        del self.destinations[0]
+        destination = Destination(postcode='EC4M 8AD', matrix=self.matrix)
+        self.origins[0].set_times('car', 7, destination)
+        self.assertEqual(destination._col, col)
+        self.assertEqual(destination.get_times('car'), [7])
+        self.assertEqual(destination.time_stats('car')['count'], 1)
+
+
+class TestSharedMatrix(unittest.TestCase):
+
+    def test_bind(self):
+        origin, destination = Origin(postcode='EC4M 8AD'), Destination(postcode='EC4M 8AD')
+        self.assertIsNone(origin.matrix)
+        self.assertEqual(origin.get_times(), [])
+        self.assertEqual(destination.avg_time(), 0)
+        self.assertEqual(destination.time_stats()['count'], 0)
+
+        origin.mode = 'car'
+        origin.set_times('car', 10, destination)
+        self.assertIsNotNone(origin.matrix)
+        self.assertIs(origin.matrix, destination.matrix)
+        self.assertEqual(origin.mode, 'car')
+
+        other = Origin(postcode='EC4M 8AD')
+        self.assertIs(shared_matrix([other, destination]), origin.matrix)
+        with self.assertRaises(ValueError):
+            shared_matrix([origin, Destination(postcode='EC4M 8AD', matrix=TravelMatrix())])
+
+    def test_studies_are_freed(self):
+        def study():
+            origins = [Origin(postcode='EC4M 8AD') for _ in range(20)]
+            destinations = [Destination(postcode='EC4M 8AD') for _ in range(5)]
+            read_times(origins, destinations)
+            for origin in origins:
+                origin.set_times('car', 10, destinations[0])
+            return weakref.ref(origins[0].matrix)
+
+        matrices = [study() for _ in range(3)]
+        self.assertTrue(all(matrix() is None for matrix in matrices))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,527 @@
+import math
+import numpy as np
+
+MODES = ('fastest', 'public transport', 'car')
+TIMES = 0
+IMPACTS = 1
+
+MISSING = 0
+MEASURED = 1
+ESTIMATED = 2
+PROVENANCE = {MISSING: None, MEASURED: 'measured', ESTIMATED: 'estimated'}
+
+# The statistics of a column without any values.
+EMPTY_STATS = {'count': 0, 'sum': 0.0, 'sumsq': 0.0, 'min': None, 'max': None, 'mean': 0, 'std': 0}
+
+
+def _read_only(array):
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+def _run(ids):
+    """Returns ids as a slice when they are consecutive, increasing and all registered, None otherwise."""
+    if not len(ids) or ids[0] < 0:
+        return None
+    if ids[-1] - ids[0] + 1 != len(ids) or (len(ids) > 1 and (np.diff(ids) != 1).any()):
+        return None
+    return slice(ids[0].item(), ids[-1].item() + 1)
+
+
+class ColumnStats:
+    """Running statistics per kind, mode and column of a TravelMatrix: count, sum, sum of squares, min and max, next to
+    a log-bucketed quantile sketch (in the style of DDSketch). Every write to the matrix removes the old value from and
+    adds the new value to the statistics, so means and quantiles can be read without scanning the column.
+
+    The sketch keeps a bucket count per value range where every bucket spans a relative width of the accuracy, so a
+    quantile is within that relative error of the true value. Because buckets are counts, overwritten values can be
+    removed again, which streaming sketches like t-digest can't do. min and max can't be decremented, when the current
+    min or max is overwritten they are flagged stale and recalculated from the column on the next read. Bulk writes
+    (update_block) do the same for the sketch, it's rebuilt from the column on the first quantile read after it."""
+
+    def __init__(self, n_modes, capacity, accuracy=0.02, min_value=0.01, max_value=1e5):
+        self.accuracy = accuracy
+        self.min_value = min_value
+        self._shape = (2, n_modes)
+        if accuracy is None:
+            self.n_buckets = 0
+        else:
+            self._log_gamma = np.log((1 + accuracy) / (1 - accuracy))
+            self._low = int(np.ceil(np.log(min_value) / self._log_gamma))
+            self._side = int(np.ceil(np.log(max_value) / self._log_gamma)) - self._low + 1
+            self.n_buckets = 2 * self._side + 1
+        self._offsets = None
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        shape = self._shape + (capacity,)
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.sum = np.zeros(shape)
+        self.sumsq = np.zeros(shape)
+        self.min = np.full(shape, np.inf)
+        self.max = np.full(shape, -np.inf)
+        self.stale = np.zeros(shape, dtype=bool)
+        self.sketch = np.zeros(shape + (self.n_buckets,), dtype=np.int32)
+        self.sketch_stale = np.zeros(shape, dtype=bool)
+
+    def _sketch_offsets(self):
+        """Offset of the sketch of every (mode, column) within a flat self.sketch[kind], used by update_row. Follows
+        the shape of the sketch, which changes when the stats grow or are loaded by storage.load_matrix."""
+        n_modes, capacity = self.sketch.shape[1:3]
+        if self._offsets is None or self._offsets.shape != (n_modes, capacity):
+            self._offsets = (np.arange(n_modes)[:, None] * capacity + np.arange(capacity)) * self.n_buckets
+        return self._offsets
+
+    def _arrays(self):
+        return [self.count, self.sum, self.sumsq, self.min, self.max, self.stale, self.sketch, self.sketch_stale]
+
+    def grow(self, capacity):
+        old = self._arrays()
+        self._allocate(capacity)
+        for new, values in zip(self._arrays(), old):
+            new[:, :, :values.shape[2]] = values
+
+    def bucket(self, values):
+        """Maps values to their sketch bucket. Bucket self._side holds everything around zero, positive values go
+        above it and negative values below it."""
+        values = np.asarray(values, dtype=np.float64)
+        magnitude = np.abs(values)
+        index = np.log(np.maximum(magnitude, self.min_value))
+        index *= 1 / self._log_gamma
+        np.ceil(index, out=index)
+        index -= self._low - 1
+        np.minimum(index, self._side, out=index)    # Plain ufuncs, np.clip has a lot of overhead on small arrays.
+        np.maximum(index, 1, out=index)
+        index[magnitude < self.min_value] = 0
+        np.copysign(index, values, out=index)
+        index += self._side
+        return index.astype(np.intp)
+
+    def value(self, bucket):
+        """The representative value of a bucket, the inverse of bucket()."""
+        index = abs(bucket - self._side)
+        if index == 0:
+            return 0.0
+        gamma = np.exp(self._log_gamma)
+        magnitude = 2 * gamma ** (index - 1 + self._low) / (gamma + 1)
+        return float(magnitude if bucket > self._side else -magnitude)
+
+    def _bucket_one(self, value):
+        """bucket() for a single Python float, without the array overhead."""
+        magnitude = abs(value)
+        if magnitude < self.min_value:
+            return self._side
+        index = min(max(math.ceil(math.log(magnitude) * (1 / self._log_gamma)) - self._low, 0), self._side - 1) + 1
+        return self._side + (index if value > 0 else -index)
+
+    def update_cell(self, kind, mode, col, old, new):
+        """update() for a single cell with Python floats as old and new value. Writes of single pairs (set_times)
+        are the most common, this keeps them at a few microseconds."""
+        for value, sign in ((old, -1), (new, 1)):
+            if math.isnan(value):
+                continue
+            self.count[kind, mode, col] += sign
+            self.sum[kind, mode, col] += sign * value
+            self.sumsq[kind, mode, col] += sign * value * value
+            if self.n_buckets:
+                self.sketch[kind, mode, col, self._bucket_one(value)] += sign
+            if sign < 0:
+                if value <= self.min[kind, mode, col] or value >= self.max[kind, mode, col]:
+                    self.stale[kind, mode, col] = True
+            else:
+                if value < self.min[kind, mode, col]:
+                    self.min[kind, mode, col] = value
+                if value > self.max[kind, mode, col]:
+                    self.max[kind, mode, col] = value
+
+    def update_block(self, kind, old, new, modes=None, cols=None):
+        """Replaces the old values by the new values of a block of rows. old and new have the shape (modes, rows,
+        columns), modes and cols are the mode and column ids of the block (all modes and the columns from 0 onwards
+        by default). The sums are reduced per column in one go and the sketches of the columns are flagged stale."""
+        modes = np.arange(old.shape[0]) if modes is None else np.asarray(modes)
+        cols = np.arange(old.shape[2]) if cols is None else np.asarray(cols)
+        index = np.ix_(modes, cols)
+        for values, sign in ((old, -1), (new, 1)):
+            valid = ~np.isnan(values)
+            filled = np.where(valid, values, 0)
+            self.count[kind][index] += sign * valid.sum(axis=1)
+            self.sum[kind][index] += sign * filled.sum(axis=1)
+            self.sumsq[kind][index] += sign * np.einsum('mrc,mrc->mc', filled, filled)
+            low, high = np.fmin.reduce(values, axis=1), np.fmax.reduce(values, axis=1)
+            if sign < 0:
+                self.stale[kind][index] |= (low <= self.min[kind][index]) | (high >= self.max[kind][index])
+            else:
+                self.min[kind][index] = np.fmin(self.min[kind][index], low)
+                self.max[kind][index] = np.fmax(self.max[kind][index], high)
+        self.sketch_stale[kind][index] = True
+
+    def update_row(self, kind, old, new):
+        """Replaces the old values by the new values of a single row. old and new have the shape (modes, columns).
+        Unlike update_block the sketches are updated in place instead of being flagged stale. Every cell of the row
+        is hit once, so apart from the sketch this works on slices rather than on scattered indices."""
+        n_cols = old.shape[1]
+        old_valid, new_valid = ~np.isnan(old), ~np.isnan(new)
+        self.count[kind, :, :n_cols] += np.subtract(new_valid, old_valid, dtype=np.int64)
+        old_values, new_values = np.where(old_valid, old, 0), np.where(new_valid, new, 0)
+        difference = new_values - old_values
+        self.sum[kind, :, :n_cols] += difference
+        self.sumsq[kind, :, :n_cols] += difference * (new_values + old_values)
+        low, high = self.min[kind, :, :n_cols], self.max[kind, :, :n_cols]
+        self.stale[kind, :, :n_cols] |= old_valid & (new != old) & ((old_values <= low) | (old_values >= high))
+        np.fmin(low, new, out=low)
+        np.fmax(high, new, out=high)
+        if self.n_buckets:
+            cells = self._sketch_offsets()[:, :n_cols]
+            buckets = self.bucket(np.concatenate((old[old_valid], new[new_valid])))
+            n_old = len(buckets) - int(new_valid.sum())
+            sketch = self.sketch[kind].reshape(-1)
+            sketch[cells[old_valid] + buckets[:n_old]] -= 1
+            sketch[cells[new_valid] + buckets[n_old:]] += 1
+
+    def clear(self, cols):
+        """Resets the statistics of columns to those of empty columns, for all kinds and modes."""
+        self.count[:, :, cols] = 0
+        self.sum[:, :, cols] = 0
+        self.sumsq[:, :, cols] = 0
+        self.min[:, :, cols] = np.inf
+        self.max[:, :, cols] = -np.inf
+        self.stale[:, :, cols] = False
+        self.sketch[:, :, cols] = 0
+        self.sketch_stale[:, :, cols] = False
+
+    def rebuild_sketch(self, kind, mode, col, column):
+        """Recounts the sketch of a column from its values."""
+        column = column[~np.isnan(column)]
+        self.sketch[kind, mode, col] = np.bincount(self.bucket(column), minlength=self.n_buckets)
+        self.sketch_stale[kind, mode, col] = False
+
+    def quantile(self, kind, mode, col, q):
+        count = self.count[kind, mode, col]
+        if not self.n_buckets:
+            raise ValueError('Quantiles are not available when the sketch is disabled')
+        if count == 0:
+            return 0
+        cumulative = np.cumsum(self.sketch[kind, mode, col])
+        return self.value(int(np.searchsorted(cumulative, q * (count - 1), side='right')))
+
+
+class TravelMatrix:
+    """A TravelMatrix is the shared store behind Location objects. Instead of every location keeping its own dicts of
+    times and impacts (and every pair being stored twice because of the mirroring) all values live in one dense NumPy
+    array per kind (times, impacts) and mode, indexed by integer row and column ids.
+
+    Origins are always stored as rows and destinations as columns, so an employee x office study of 50k x 300 takes
+    50k * 300 * 8 bytes per mode and kind. Plain Location objects are placed by creation order. Missing values are
+    stored as NaN. Row and column ids are handed out on the first write that involves a location and are kept on the
+    location itself, the matrix does not hold references to the Location objects. When a location is garbage
+    collected it releases its row/column: the ids are queued and cleared in one go (values, provenance and statistics)
+    before the next registration or column read, and handed out again to new locations."""
+
+    def __init__(self, modes=MODES, dtype=np.float64, capacity=(64, 16), sketch_accuracy=0.02):
+        self.modes = tuple(modes)
+        self._mode_index = {mode: i for i, mode in enumerate(self.modes)}
+        self.dtype = np.dtype(dtype)
+        self.n_rows = 0
+        self.n_cols = 0
+        self._data = np.full((2, len(self.modes), capacity[0], capacity[1]), np.nan, dtype=self.dtype)
+        self._provenance = np.zeros((len(self.modes), capacity[0], capacity[1]), dtype=np.int8)
+        self._stats = ColumnStats(len(self.modes), capacity[1], accuracy=sketch_accuracy)
+        self._released_rows = []
+        self._released_cols = []
+        self._free_rows = []
+        self._free_cols = []
+
+    def mode_index(self, mode):
+        try:
+            return self._mode_index[mode]
+        except KeyError:
+            raise KeyError('Mode should be one of: {} not {}'.format(', '.join(self.modes), mode))
+
+    @staticmethod
+    def orient(location, to_location):
+        """Returns the pair as (row location, column location). Origins go to the rows, destinations to the columns
+        and locations of the same kind are ordered by creation."""
+        if (location._side, location._seq) > (to_location._side, to_location._seq):
+            return to_location, location
+        return location, to_location
+
+    def _grow(self, rows, cols):
+        """Reallocates the underlying array so it fits at least rows x cols. Capacity is doubled to amortise the
+        copying."""
+        _, _, row_cap, col_cap = self._data.shape
+        if rows <= row_cap and cols <= col_cap:
+            return
+        new_rows = max(rows, row_cap * 2 if rows > row_cap else row_cap)
+        new_cols = max(cols, col_cap * 2 if cols > col_cap else col_cap)
+        data = np.full((2, len(self.modes), new_rows, new_cols), np.nan, dtype=self.dtype)
+        data[:, :, :self.n_rows, :self.n_cols] = self._data[:, :, :self.n_rows, :self.n_cols]
+        self._data = data
+        provenance = np.zeros((len(self.modes), new_rows, new_cols), dtype=np.int8)
+        provenance[:, :self.n_rows, :self.n_cols] = self._provenance[:, :self.n_rows, :self.n_cols]
+        self._provenance = provenance
+        if new_cols > col_cap:
+            self._stats.grow(new_cols)
+
+    def release(self, location):
+        """Queues the row/column of a location that goes away, called when the location is garbage collected. This
+        only appends the ids, the clearing is done in batches by _collect."""
+        if location._row is not None:
+            self._released_rows.append(location._row)
+            location._row = None
+        if location._col is not None:
+            self._released_cols.append(location._col)
+            location._col = None
+
+    def _collect(self):
+        """Clears the released rows and columns and makes their ids available for new locations."""
+        if not self._released_rows and not self._released_cols:
+            return
+        rows, self._released_rows = np.array(self._released_rows, dtype=np.intp), []
+        cols, self._released_cols = np.array(self._released_cols, dtype=np.intp), []
+        if len(rows):
+            for kind in (TIMES, IMPACTS):
+                old = self._data[kind, :, rows, :self.n_cols].transpose(1, 0, 2)
+                self._stats.update_block(kind, old, np.full_like(old, np.nan), cols=np.arange(self.n_cols))
+            self._data[:, :, rows, :] = np.nan
+            self._provenance[:, rows, :] = MISSING
+            self._free_rows.extend(rows.tolist())
+        if len(cols):
+            self._data[:, :, :, cols] = np.nan
+            self._provenance[:, :, cols] = MISSING
+            self._stats.clear(cols)
+            self._free_cols.extend(cols.tolist())
+
+    def row(self, location):
+        """Returns the row id of the location, registering it if it doesn't have one yet. Released ids are reused
+        first."""
+        if location._row is None:
+            self._collect()
+            if self._free_rows:
+                location._row = self._free_rows.pop()
+            else:
+                self._grow(self.n_rows + 1, self.n_cols)
+                location._row = self.n_rows
+                self.n_rows += 1
+        return location._row
+
+    def col(self, location):
+        """Returns the column id of the location, registering it if it doesn't have one yet. Released ids are reused
+        first."""
+        if location._col is None:
+            self._collect()
+            if self._free_cols:
+                location._col = self._free_cols.pop()
+            else:
+                self._grow(self.n_rows, self.n_cols + 1)
+                location._col = self.n_cols
+                self.n_cols += 1
+        return location._col
+
+    def _cell(self, location, to_location):
+        """Returns the (row, col) of a pair or None if one of both locations isn't registered."""
+        row_loc, col_loc = self.orient(location, to_location)
+        if row_loc._row is None or col_loc._col is None:
+            return None
+        return row_loc._row, col_loc._col
+
+    def rows(self, locations):
+        """Returns an array with the row ids of the locations, registering the ones that don't have one yet. The
+        matrix is grown once for all new locations."""
+        locations = list(locations)
+        self._collect()
+        new = sum(location._row is None for location in locations) - len(self._free_rows)
+        self._grow(self.n_rows + max(new, 0), self.n_cols)
+        return np.fromiter((self.row(location) for location in locations), dtype=np.intp, count=len(locations))
+
+    def cols(self, locations):
+        """Returns an array with the column ids of the locations, registering the ones that don't have one yet. The
+        matrix is grown once for all new locations."""
+        locations = list(locations)
+        self._collect()
+        new = sum(location._col is None for location in locations) - len(self._free_cols)
+        self._grow(self.n_rows, self.n_cols + max(new, 0))
+        return np.fromiter((self.col(location) for location in locations), dtype=np.intp, count=len(locations))
+
+    def set(self, kind, mode, location, to_location, value, provenance=MEASURED):
+        row_loc, col_loc = self.orient(location, to_location)
+        m = self.mode_index(mode)
+        row, col = self.row(row_loc), self.col(col_loc)
+        old = self._data[kind, m, row, col].item()
+        self._data[kind, m, row, col] = value
+        if kind == TIMES:
+            self._provenance[m, row, col] = provenance
+        self._stats.update_cell(kind, m, col, old, self._data[kind, m, row, col].item())
+
+    def get(self, kind, mode, location, to_location):
+        """Returns the value of a pair. Raises a KeyError if the value was never set."""
+        m = self.mode_index(mode)
+        cell = self._cell(location, to_location)
+        value = np.nan if cell is None else self._data[kind, m, cell[0], cell[1]]
+        if np.isnan(value):
+            raise KeyError(to_location)
+        return value.item()
+
+    def set_block(self, kind, mode, rows, cols, values, mask=None, provenance=MEASURED):
+        """Writes a rows x cols block of values for a mode in one go, rows and cols are arrays of ids (see rows()
+        and cols()). Only the cells where mask is True are written when a mask is given."""
+        m = self.mode_index(mode)
+        index = np.ix_(rows, cols)
+        old = self._data[kind, m][index]
+        new = np.asarray(values, dtype=self.dtype)
+        if mask is not None:
+            new = np.where(mask, new, old)
+        self._data[kind, m][index] = new
+        if kind == TIMES:
+            written = ~np.isnan(new) if mask is None else mask & ~np.isnan(new)
+            self._provenance[m][index] = np.where(written, provenance, self._provenance[m][index])
+        self._stats.update_block(kind, old[None], new[None], modes=[m], cols=cols)
+
+    def provenance(self, mode, location, to_location):
+        """Returns where the time of a pair came from: 'measured', 'estimated' or None when there is no time."""
+        m = self.mode_index(mode)
+        cell = self._cell(location, to_location)
+        return None if cell is None else PROVENANCE[self._provenance[m, cell[0], cell[1]].item()]
+
+    def provenance_block(self, mode, rows, cols):
+        """Returns the provenance codes (MISSING, MEASURED, ESTIMATED) of a rows x cols block."""
+        return self._provenance[self.mode_index(mode)][np.ix_(rows, cols)]
+
+    def has(self, kind, mode, location, to_location):
+        try:
+            self.get(kind, mode, location, to_location)
+        except KeyError:
+            return False
+        return True
+
+    def values(self, kind, mode, location):
+        """Returns an array of all values set between the location and any other location for the mode."""
+        m = self.mode_index(mode)
+        self._collect()
+        parts = []
+        if location._row is not None:
+            parts.append(self._data[kind, m, location._row, :self.n_cols])
+        if location._col is not None:
+            parts.append(self._data[kind, m, :self.n_rows, location._col])
+        if not parts:
+            return np.empty(0, dtype=self.dtype)
+        values = np.concatenate(parts)
+        return values[~np.isnan(values)]
+
+    def view(self, kind, mode=None):
+        """Returns a read-only view (no copy) on the used part of the matrix: rows x cols for a mode or
+        modes x rows x cols for all modes. Views see later writes but not new locations, after the matrix has grown
+        a new view is needed."""
+        self._collect()
+        if mode is None:
+            return _read_only(self._data[kind, :, :self.n_rows, :self.n_cols])
+        return _read_only(self._data[kind, self.mode_index(mode), :self.n_rows, :self.n_cols])
+
+    def line(self, kind, mode, location):
+        """Returns a read-only view on the row of the location (or its column when it only has a column), indexed by
+        column (row) id with NaN where there is no value. None when the location isn't registered."""
+        m = self.mode_index(mode)
+        if location._row is not None:
+            return _read_only(self._data[kind, m, location._row, :self.n_cols])
+        if location._col is not None:
+            return _read_only(self._data[kind, m, :self.n_rows, location._col])
+        return None
+
+    def block(self, kind, rows, cols, modes=None):
+        """Returns the values of rows x cols for the modes (all by default) as an array of shape (modes, rows, cols).
+        When rows and cols are both runs of consecutive ids, e.g. locations registered together, this is a read-only
+        view, otherwise a copy made with a single fancy index. Ids of -1 (locations without a row/column) give NaN."""
+        self._collect()
+        rows, cols = np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)
+        modes = np.arange(len(self.modes)) if modes is None else np.array([self.mode_index(mode) for mode in modes],
+                                                                          dtype=np.intp)
+        mode_run, row_run, col_run = _run(modes), _run(rows), _run(cols)
+        if mode_run is not None and row_run is not None and col_run is not None:
+            return _read_only(self._data[kind, mode_run, row_run, col_run])
+
+        values = self._data[kind][modes[:, None, None], np.maximum(rows, 0)[None, :, None],
+                                  np.maximum(cols, 0)[None, None, :]]
+        if (rows < 0).any() or (cols < 0).any():
+            values[:, rows < 0] = np.nan
+            values[:, :, cols < 0] = np.nan
+        return values
+
+    def rebase(self, rows, cols, block=4096):
+        """Recalculates the impacts of the given rows as the difference between their times and the time in the
+        matching column (the current destination) using broadcast subtraction. Rows are processed in blocks to bound
+        the temporary memory. Pairs without a time are left as they are. Rows should be unique, a single row takes a
+        cheaper path that keeps the quantile sketches up to date."""
+        rows = np.asarray(rows, dtype=np.intp).reshape(-1)
+        cols = np.broadcast_to(np.asarray(cols, dtype=np.intp), rows.shape)
+        if len(rows) == 1:
+            return self.rebase_row(rows[0], cols[0])
+        if len(np.unique(rows)) != len(rows):
+            raise ValueError('Rows should be unique, every row can only have one current destination')
+        times, impacts = self._data[TIMES], self._data[IMPACTS]
+
+        for start in range(0, len(rows), block):
+            block_rows, block_cols = rows[start:start + block], cols[start:start + block]
+            block_times = times[:, block_rows, :self.n_cols]
+            base = times[:, block_rows, block_cols]
+            old_impacts = impacts[:, block_rows, :self.n_cols]
+            block_impacts = np.where(np.isnan(block_times), old_impacts, block_times - base[:, :, None])
+            impacts[:, block_rows, :self.n_cols] = block_impacts
+            self._stats.update_block(IMPACTS, old_impacts, block_impacts)
+
+    def rebase_row(self, row, col):
+        """rebase() for a single row: recalculates its impacts against column col for all modes."""
+        times = self._data[TIMES, :, row, :self.n_cols]
+        old = self._data[IMPACTS, :, row, :self.n_cols]
+        new = np.where(np.isnan(times), old, times - times[:, col, None])
+        self._stats.update_row(IMPACTS, old, new)
+        self._data[IMPACTS, :, row, :self.n_cols] = new
+
+    def stats(self, kind, mode, location):
+        """Returns the running statistics of a column: count, sum, sumsq, min, max, mean and std. These are kept up to
+        date on every write so reading them is O(1) (apart from min/max after their value was overwritten)."""
+        m = self.mode_index(mode)
+        if location._col is None:
+            return dict(EMPTY_STATS)
+        self._collect()
+        col, stats = location._col, self._stats
+        count = stats.count[kind, m, col].item()
+        if count and stats.stale[kind, m, col]:
+            column = self._data[kind, m, :self.n_rows, col]
+            stats.min[kind, m, col], stats.max[kind, m, col] = np.nanmin(column), np.nanmax(column)
+            stats.stale[kind, m, col] = False
+        total, sumsq = stats.sum[kind, m, col].item(), stats.sumsq[kind, m, col].item()
+        mean = total / count if count else 0
+        return {'count': count,
+                'sum': total,
+                'sumsq': sumsq,
+                'min': stats.min[kind, m, col].item() if count else None,
+                'max': stats.max[kind, m, col].item() if count else None,
+                'mean': mean,
+                'std': max(sumsq / count - mean ** 2, 0) ** 0.5 if count else 0}
+
+    def mean(self, kind, mode, location):
+        m = self.mode_index(mode)
+        if location._col is None:
+            return 0
+        self._collect()
+        count = self._stats.count[kind, m, location._col]
+        return (self._stats.sum[kind, m, location._col] / count).item() if count else 0
+
+    def quantile(self, kind, mode, location, q):
+        """Approximate quantile of a column, read from the sketch. The result is within the sketch accuracy
+        (relative) of the true value."""
+        m = self.mode_index(mode)
+        if not 0 <= q <= 1:
+            raise ValueError('q should be between 0 and 1 got {}'.format(q))
+        if location._col is None:
+            return 0
+        self._collect()
+        col, stats = location._col, self._stats
+        if stats.n_buckets and stats.sketch_stale[kind, m, col]:
+            stats.rebuild_sketch(kind, m, col, self._data[kind, m, :self.n_rows, col])
+        return stats.quantile(kind, m, col, q)
+
+    def nbytes(self):
+        """Memory used by the values that are in use (not counting spare capacity)."""
+        return 2 * len(self.modes) * self.n_rows * self.n_cols * self.dtype.itemsize
+
@@ -0,0 +1,3 @@
+from .engine import RelocationEngine, SiteScore
+from .solver import MultiSiteSolver, Solution
+from .scenarios import ScenarioRunner, Scenario, ScenarioResult
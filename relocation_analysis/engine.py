@@ -0,0 +1,161 @@
+import collections
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from locations.travel_matrix import TIMES
+
+METRICS = ('mean_impact', 'median_impact', 'share_worse', 'tail_impact', 'worst_impact', 'count')
+
+SiteScore = collections.namedtuple('SiteScore', ('site',) + METRICS)
+SiteScore.__doc__ = """The aggregate impact of moving everybody to a candidate site. Impacts are in minutes, positive
+means a longer commute than today. share_worse is the fraction of origins whose commute gets longer, tail_impact the
+impact at the tail quantile (0.95 by default) and count the number of origins with a known time."""
+
+
+def _quantiles(impacts, qs):
+    """Quantiles (linear interpolation, like np.quantile) along the rows of impacts, with a single partition."""
+    n = impacts.shape[1]
+    positions = [q * (n - 1) for q in qs]
+    kth = sorted({int(np.floor(p)) for p in positions} | {int(np.ceil(p)) for p in positions})
+    impacts = np.partition(impacts, kth, axis=1)
+    result = []
+    for position in positions:
+        low, high = int(np.floor(position)), int(np.ceil(position))
+        result.append(impacts[:, low] + (impacts[:, high] - impacts[:, low]) * (position - low))
+    return result
+
+
+def _impacts(times, baseline, tile=2048):
+    """Returns times - baseline transposed to one row per candidate so all reductions run over contiguous memory.
+    The transpose is done in tiles of origins, which is a lot friendlier on the cache than transposing in one go."""
+    impacts = np.empty((times.shape[1], times.shape[0]), dtype=np.float64)
+    for start in range(0, times.shape[0], tile):
+        impacts[:, start:start + tile] = times[start:start + tile].T
+        impacts[:, start:start + tile] -= baseline[start:start + tile]
+    return impacts
+
+
+def evaluate_block(times, baseline, tail=0.95):
+    """Calculates the metrics for a block of candidates. times has the shape (origins, candidates), baseline holds the
+    current time of every origin. Returns a dict with an array per metric. Missing (NaN) times are left out."""
+    impacts = _impacts(times, baseline)
+    if not np.isnan(impacts).any():
+        median, tail_impact = _quantiles(impacts, (0.5, tail))
+        return {'mean_impact': impacts.mean(axis=1),
+                'median_impact': median,
+                'share_worse': (impacts > 0).mean(axis=1),
+                'tail_impact': tail_impact,
+                'worst_impact': impacts.max(axis=1),
+                'count': np.full(impacts.shape[0], impacts.shape[1])}
+
+    count = (~np.isnan(impacts)).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        share_worse = (impacts > 0).sum(axis=1) / count
+    empty = count == 0
+    impacts[empty] = 0      # Keeps the nan functions quiet, the metrics of empty candidates are set to NaN.
+    metrics = {'mean_impact': np.nanmean(impacts, axis=1),
+               'median_impact': np.nanmedian(impacts, axis=1),
+               'share_worse': share_worse,
+               'tail_impact': np.nanquantile(impacts, tail, axis=1),
+               'worst_impact': np.nanmax(impacts, axis=1),
+               'count': count}
+    for name in METRICS[:-1]:
+        metrics[name][empty] = np.nan
+    return metrics
+
+
+class RelocationEngine:
+    """Ranks candidate sites by the impact moving the office there would have on the commute of every origin.
+
+    times maps a mode to an (origins x candidates) array of travel times in minutes and baseline maps a mode to the
+    current time of every origin. candidates are the objects returned as site in the ranking, their index by default.
+    Candidates are evaluated in blocks of block columns, vectorised over all origins, and the blocks can be spread
+    over a process pool. Missing times are NaN and left out of the metrics."""
+
+    def __init__(self, times, baseline, candidates=None, tail=0.95, block=64):
+        self.times = {mode: np.asarray(value, dtype=np.float64) for mode, value in times.items()}
+        self.baseline = {mode: np.asarray(value, dtype=np.float64) for mode, value in baseline.items()}
+        for mode, value in self.times.items():
+            if value.ndim != 2 or mode not in self.baseline or self.baseline[mode].shape != value.shape[:1]:
+                raise ValueError('times should be (origins x candidates) with a baseline time per origin, got {} '
+                                 'for mode {}'.format(value.shape, mode))
+        n_candidates = next(iter(self.times.values())).shape[1] if self.times else 0
+        self.candidates = list(range(n_candidates)) if candidates is None else list(candidates)
+        if len(self.candidates) != n_candidates:
+            raise ValueError('Got {} candidates for {} columns of times'.format(len(self.candidates), n_candidates))
+        self.tail = tail
+        self.block = block
+
+    @classmethod
+    def from_locations(cls, origins, candidates, modes=None, **kwargs):
+        """Builds the engine from Origin and Destination objects sharing a TravelMatrix. The baseline of an origin is
+        its time to its current destination."""
+        origins, candidates = list(origins), list(candidates)
+        if not origins:
+            raise ValueError('At least one origin is needed, the TravelMatrix is taken from the origins')
+        if any(origin.current_destination is None for origin in origins):
+            raise ValueError('All origins should have a current destination')
+        matrix = origins[0].matrix
+        modes = matrix.modes if modes is None else modes
+        rows, cols = matrix.rows(origins), matrix.cols(candidates)
+        current = matrix.cols([origin.current_destination for origin in origins])
+
+        times, baseline = {}, {}
+        for mode in modes:
+            m = matrix.mode_index(mode)
+            times[mode] = matrix._data[TIMES, m][np.ix_(rows, cols)]
+            baseline[mode] = matrix._data[TIMES, m, rows, current]
+        return cls(times, baseline, candidates, **kwargs)
+
+    def evaluate(self, mode='fastest', processes=None):
+        """Returns a dict with an array per metric, one value per candidate. processes > 1 spreads the blocks of
+        candidates over a process pool. The times and baseline are then copied into shared memory once and the
+        workers only get the bounds of their blocks."""
+        times, baseline = self.times[mode], self.baseline[mode]
+        starts = range(0, times.shape[1], self.block)
+        blocks = [times[:, start:start + self.block] for start in starts]
+
+        if processes is not None and processes > 1 and len(blocks) > 1:
+            memory = shared_memory.SharedMemory(create=True, size=times.nbytes + baseline.nbytes)
+            try:
+                np.ndarray(times.shape, np.float64, buffer=memory.buf)[:] = times
+                np.ndarray(baseline.shape, np.float64, buffer=memory.buf, offset=times.nbytes)[:] = baseline
+                with ProcessPoolExecutor(processes, initializer=_attach,
+                                         initargs=(memory.name, times.shape, self.tail)) as pool:
+                    results = list(pool.map(_evaluate, [(start, start + self.block) for start in starts]))
+            finally:
+                memory.close()
+                memory.unlink()
+        else:
+            results = [evaluate_block(block, baseline, self.tail) for block in blocks]
+
+        if not results:
+            return {name: np.empty(0) for name in METRICS}
+        return {name: np.concatenate([result[name] for result in results]) for name in METRICS}
+
+    def rank(self, mode='fastest', by='mean_impact', processes=None, top=None):
+        """Returns SiteScores sorted on the metric by, lowest (best) first. Candidates without any known time come
+        last. top limits the number of sites returned."""
+        if by not in METRICS:
+            raise ValueError('by should be one of {} got {}'.format(', '.join(METRICS), by))
+        metrics = self.evaluate(mode, processes)
+        key = metrics[by] if by != 'count' else -metrics[by]
+        order = np.argsort(np.where(np.isnan(key), np.inf, key), kind='stable')[:top]
+        return [SiteScore(self.candidates[i], *(metrics[name][i].item() for name in METRICS)) for i in order]
+
+
+_worker = None
+
+
+def _attach(name, shape, tail):
+    """Maps the shared times and baseline in a worker process, the memory object is kept to keep the mapping."""
+    global _worker
+    memory = shared_memory.SharedMemory(name=name)
+    times = np.ndarray(shape, np.float64, buffer=memory.buf)
+    _worker = (memory, times, np.ndarray(shape[:1], np.float64, buffer=memory.buf, offset=times.nbytes), tail)
+
+
+def _evaluate(bounds):
+    _, times, baseline, tail = _worker
+    start, stop = bounds
+    return evaluate_block(times[:, start:stop], baseline, tail)
@@ -0,0 +1,128 @@
+import collections
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from multiprocessing import shared_memory
+import numpy as np
+from locations.travel_matrix import TIMES
+from .engine import evaluate_block
+
+Scenario = collections.namedtuple('Scenario', ('name', 'current', 'modes', 'candidates'))
+Scenario.__new__.__defaults__ = (None, None, None)
+Scenario.__doc__ = """A what-if over the population of a ScenarioRunner. current holds the destination index of every
+origin (the runner's current destinations when None), modes is a mode name or a mode name per origin (the first mode
+when None) and candidates is a list of destination indices to evaluate (all destinations when None)."""
+
+ScenarioResult = collections.namedtuple('ScenarioResult', ('index', 'scenario', 'sites', 'metrics'))
+ScenarioResult.__doc__ = """The outcome of a scenario: index is its position in the input, sites the destinations
+that were evaluated and metrics a dict with an array per metric, one value per site (see engine.evaluate_block)."""
+
+
+def evaluate_scenario(times, modes, current, scenario, tail=0.95):
+    """Evaluates a scenario on a (modes, origins, destinations) times array. modes is the tuple of mode names of the
+    first axis and current the default destination index per origin. Returns (candidate indices, metrics)."""
+    n_origins, n_destinations = times.shape[1:]
+    origins = np.arange(n_origins)
+    if scenario.modes is None or isinstance(scenario.modes, str):
+        mode = np.full(n_origins, modes.index(scenario.modes or modes[0]))
+    else:
+        mode = np.array([modes.index(name) for name in scenario.modes], dtype=np.intp)
+    current = np.asarray(current if scenario.current is None else scenario.current, dtype=np.intp)
+    candidates = (np.arange(n_destinations) if scenario.candidates is None
+                  else np.asarray(scenario.candidates, dtype=np.intp))
+    if mode.shape != (n_origins,) or current.shape != (n_origins,):
+        raise ValueError('A scenario should have a mode and current destination per origin')
+
+    baseline = times[mode, origins, current]
+    return candidates, evaluate_block(times[mode[:, None], origins[:, None], candidates[None, :]], baseline, tail)
+
+
+class ScenarioRunner:
+    """Evaluates many Scenarios (different current destinations, mode mixes and candidate subsets) over the same
+    origins and destinations.
+
+    times maps a mode to an (origins x destinations) array of travel times in minutes, current holds the current
+    destination index of every origin. With processes > 1 the times are copied into a multiprocessing.shared_memory
+    block once, the workers of the process pool map it as a numpy array and only the scenarios and their metrics are
+    pickled. Results are yielded as they complete, so the order is not the input order."""
+
+    def __init__(self, times, current=None, destinations=None, tail=0.95):
+        self.modes = tuple(times)
+        self.times = np.stack([np.asarray(times[mode], dtype=np.float64) for mode in self.modes])
+        if self.times.ndim != 3:
+            raise ValueError('times should be (origins x destinations) per mode got {}'.format(self.times.shape[1:]))
+        n_origins, n_destinations = self.times.shape[1:]
+        self.current = np.zeros(n_origins, dtype=np.intp) if current is None else np.asarray(current, dtype=np.intp)
+        if self.current.shape != (n_origins,):
+            raise ValueError('current should hold a destination index per origin')
+        self.destinations = list(range(n_destinations)) if destinations is None else list(destinations)
+        if len(self.destinations) != n_destinations:
+            raise ValueError('Got {} destinations for {} columns of times'.format(len(self.destinations),
+                                                                                 n_destinations))
+        self.tail = tail
+
+    @classmethod
+    def from_locations(cls, origins, destinations, modes=None, **kwargs):
+        """Builds the runner from Origin and Destination objects sharing a TravelMatrix. The current destination of
+        every origin should be one of destinations."""
+        origins, destinations = list(origins), list(destinations)
+        if not origins:
+            raise ValueError('At least one origin is needed, the TravelMatrix is taken from the origins')
+        if any(origin.current_destination is None for origin in origins):
+            raise ValueError('All origins should have a current destination')
+        index = {id(destination): i for i, destination in enumerate(destinations)}
+        if any(id(origin.current_destination) not in index for origin in origins):
+            raise ValueError('The current destination of every origin should be one of destinations')
+        matrix = origins[0].matrix
+        modes = matrix.modes if modes is None else tuple(modes)
+        block = matrix.block(TIMES, matrix.rows(origins), matrix.cols(destinations), modes)
+        current = [index[id(origin.current_destination)] for origin in origins]
+        return cls(dict(zip(modes, block)), current, destinations, **kwargs)
+
+    def _result(self, index, scenario, outcome):
+        candidates, metrics = outcome
+        return ScenarioResult(index, scenario, [self.destinations[i] for i in candidates], metrics)
+
+    def run(self, scenarios, processes=None):
+        """Yields a ScenarioResult per scenario as they complete. scenarios can be any iterable, with processes > 1
+        at most twice as many scenarios as there are processes are in flight at any time."""
+        if processes is None or processes <= 1:
+            for index, scenario in enumerate(scenarios):
+                yield self._result(index, scenario,
+                                   evaluate_scenario(self.times, self.modes, self.current, scenario, self.tail))
+            return
+
+        memory = shared_memory.SharedMemory(create=True, size=max(self.times.nbytes, 1))
+        try:
+            np.ndarray(self.times.shape, self.times.dtype, buffer=memory.buf)[:] = self.times
+            initargs = (memory.name, self.times.shape, self.modes, self.current, self.tail)
+            with ProcessPoolExecutor(processes, initializer=_attach, initargs=initargs) as pool:
+                pending = {}
+                scenarios = enumerate(scenarios)
+                while True:
+                    for index, scenario in scenarios:
+                        pending[pool.submit(_evaluate, scenario)] = index, scenario
+                        if len(pending) >= 2 * processes:
+                            break
+                    if not pending:
+                        break
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        index, scenario = pending.pop(future)
+                        yield self._result(index, scenario, future.result())
+        finally:
+            memory.close()
+            memory.unlink()
+
+
+_worker = None
+
+
+def _attach(name, shape, modes, current, tail):
+    """Maps the shared times in a worker process, the memory object is kept with the array to keep the mapping."""
+    global _worker
+    memory = shared_memory.SharedMemory(name=name)
+    _worker = (memory, np.ndarray(shape, np.float64, buffer=memory.buf), modes, current, tail)
+
+
+def _evaluate(scenario):
+    _, times, modes, current, tail = _worker
+    return evaluate_scenario(times, modes, current, scenario, tail)
@@ -0,0 +1,154 @@
+import collections
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from .engine import RelocationEngine
+
+Solution = collections.namedtuple('Solution', ('sites', 'objective', 'assignment', 'iterations'))
+Solution.__doc__ = """The best set of sites found. objective is the mean impact in minutes when every origin goes to its
+nearest chosen site, assignment the position in sites of the site of every origin and iterations the number of
+improving swaps made by the local search."""
+
+
+def _nearest_two(times, sites):
+    """Returns the time to the nearest and second nearest site and the position (in sites) of the nearest site."""
+    chosen = times[:, sites]
+    if len(sites) == 1:
+        return chosen[:, 0], np.full(len(times), np.inf), np.zeros(len(times), dtype=np.intp)
+    order = np.argpartition(chosen, 1, axis=1)[:, :2]
+    rows = np.arange(len(times))
+    return chosen[rows, order[:, 0]], chosen[rows, order[:, 1]], order[:, 0]
+
+
+class MultiSiteSolver:
+    """Picks the set of k sites that minimises the mean impact on the commute when every origin goes to its nearest
+    chosen site, compared to its current time (baseline). Times are minutes in an (origins x candidates) array,
+    missing times (NaN) count as penalty minutes so those sites are avoided.
+
+    The search starts from a greedy solution (the objective is submodular so greedy is a good warm start), then swaps
+    a chosen site for another candidate as long as that improves the objective. Every iteration evaluates all
+    k x candidates swaps at once using the nearest and second nearest site of every origin, which costs two passes
+    over the times array. Restarts use a randomised greedy start and can run on a process pool."""
+
+    def __init__(self, times, baseline, candidates=None, penalty=1e6):
+        times = np.asarray(times, dtype=np.float64)
+        self.times = np.where(np.isnan(times), penalty, times)
+        self.baseline = np.asarray(baseline, dtype=np.float64)
+        if self.times.ndim != 2 or self.baseline.shape != self.times.shape[:1]:
+            raise ValueError('times should be (origins x candidates) with a baseline time per origin, got {} and {}'
+                             .format(self.times.shape, self.baseline.shape))
+        self.candidates = list(range(self.times.shape[1])) if candidates is None else list(candidates)
+        if len(self.candidates) != self.times.shape[1]:
+            raise ValueError('Got {} candidates for {} columns of times'.format(len(self.candidates),
+                                                                                 self.times.shape[1]))
+        self.penalty = penalty
+
+    @classmethod
+    def from_locations(cls, origins, candidates, mode='fastest', **kwargs):
+        """Builds the solver from Origin and Destination objects sharing a TravelMatrix, see
+        RelocationEngine.from_locations."""
+        engine = RelocationEngine.from_locations(origins, candidates, modes=[mode])
+        return cls(engine.times[mode], engine.baseline[mode], engine.candidates, **kwargs)
+
+    def objective(self, sites):
+        return (self.times[:, sites].min(axis=1) - self.baseline).mean().item()
+
+    def greedy(self, k, random=None, spread=3, deadline=None):
+        """Adds the site that lowers the total time the most, k times. With a numpy Generator as random one of the
+        spread best sites is picked at random at every step instead (for restarts). Once the deadline (a time.time())
+        has passed the remaining sites are the best ones of the last step, without updating the totals."""
+        n_origins, n_candidates = self.times.shape
+        if not 0 < k <= n_candidates:
+            raise ValueError('k should be between 1 and {} got {}'.format(n_candidates, k))
+        best = np.full(n_origins, np.inf)
+        sites = []
+        for _ in range(k):
+            totals = np.minimum(self.times, best[:, None]).sum(axis=0)
+            totals[sites] = np.inf
+            if random is None:
+                site = int(np.argmin(totals))
+            else:
+                site = int(random.choice(np.argsort(totals)[:min(spread, n_candidates - len(sites))]))
+            sites.append(site)
+            if deadline is not None and len(sites) < k and time.time() >= deadline:
+                totals[site] = np.inf
+                sites.extend(int(rest) for rest in np.argsort(totals)[:k - len(sites)])
+                break
+            best = np.minimum(best, self.times[:, site])
+        return sites
+
+    def swap_deltas(self, sites):
+        """Returns a (k x candidates) array with the change of the total time when sites[r] is swapped for candidate
+        a. Built from the nearest (d1) and second nearest (d2) site of every origin:
+        delta(r, a) = sum(min(d1, t_a) - d1) + sum over origins of r of (min(d2, t_a) - min(d1, t_a))."""
+        d1, d2, nearest = _nearest_two(self.times, sites)
+        with_d1 = np.minimum(self.times, d1[:, None])
+        deltas = np.tile(with_d1.sum(axis=0) - d1.sum(), (len(sites), 1))
+        for r in range(len(sites)):
+            members = nearest == r
+            deltas[r] += (np.minimum(self.times[members], d2[members, None]) - with_d1[members]).sum(axis=0)
+        deltas[:, sites] = np.inf
+        return deltas
+
+    def local_search(self, sites, deadline=None, progress=None):
+        """Makes the best improving swap until there is none left or the deadline (a time.time()) has passed. Calls
+        progress(iteration, objective) after every swap. Returns the sites and the number of swaps."""
+        sites = list(sites)
+        iterations = 0
+        while deadline is None or time.time() < deadline:
+            deltas = self.swap_deltas(sites)
+            r, a = np.unravel_index(np.argmin(deltas), deltas.shape)
+            if not deltas[r, a] < -1e-9 * len(self.times):
+                break
+            sites[r] = int(a)
+            iterations += 1
+            if progress is not None:
+                progress(iterations, self.objective(sites))
+        return sites, iterations
+
+    def _solution(self, sites, iterations):
+        sites = sorted(sites)
+        assignment = np.argmin(self.times[:, sites], axis=1)
+        return Solution([self.candidates[site] for site in sites], self.objective(sites), assignment, iterations)
+
+    def solve(self, k, restarts=0, processes=None, time_budget=None, progress=None, seed=None):
+        """Returns the best Solution for k sites. restarts adds randomised runs next to the greedy one, on a process
+        pool when processes > 1. time_budget (seconds) stops the greedy starts and local searches, the best solution
+        found so far is returned. progress is called as progress(iteration, objective) during the first run and as
+        progress(restart, best objective) after every restart."""
+        deadline = None if time_budget is None else time.time() + time_budget
+        sites, iterations = self.local_search(self.greedy(k, deadline=deadline), deadline, progress)
+        best = (self.objective(sites), sites, iterations)
+
+        seeds = np.random.SeedSequence(seed).spawn(restarts)
+        if processes is not None and processes > 1 and restarts:
+            with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(self,)) as pool:
+                futures = [pool.submit(_restart, k, child, deadline) for child in seeds]
+                for n, future in enumerate(as_completed(futures), 1):
+                    best = min(best, future.result(), key=lambda result: result[0])
+                    if progress is not None:
+                        progress(n, best[0])
+        else:
+            for n, child in enumerate(seeds, 1):
+                best = min(best, self.restart(k, child, deadline), key=lambda result: result[0])
+                if progress is not None:
+                    progress(n, best[0])
+
+        return self._solution(best[1], best[2])
+
+    def restart(self, k, seed, deadline=None):
+        sites, iterations = self.local_search(self.greedy(k, np.random.default_rng(seed), deadline=deadline), deadline)
+        return self.objective(sites), sites, iterations
+
+
+_worker_solver = None
+
+
+def _init_worker(solver):
+    """Sends the solver (and so the times) to a worker process once instead of with every restart."""
+    global _worker_solver
+    _worker_solver = solver
+
+
+def _restart(k, seed, deadline):
+    return _worker_solver.restart(k, seed, deadline)
@@ -0,0 +1,84 @@
+import unittest
+import numpy as np
+from locations import Origin, Destination, TravelMatrix
+from relocation_analysis import RelocationEngine
+
+
+class TestRelocationEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.times = {'car': np.array([[10., 20., 30.],
+                                       [40., 20., 10.],
+                                       [30., 35., 10.],
+                                       [20., 25., 40.]])}
+        self.baseline = {'car': np.array([20., 20., 20., 20.])}
+        self.engine = RelocationEngine(self.times, self.baseline, candidates=['a', 'b', 'c'], block=2)
+
+    def test_evaluate(self):
+        metrics = self.engine.evaluate('car')
+        np.testing.assert_allclose(metrics['mean_impact'], [5, 5, 2.5])
+        np.testing.assert_allclose(metrics['median_impact'], [5, 2.5, 0])
+        np.testing.assert_allclose(metrics['share_worse'], [0.5, 0.5, 0.5])
+        np.testing.assert_allclose(metrics['worst_impact'], [20, 15, 20])
+        np.testing.assert_allclose(metrics['tail_impact'], np.quantile(self.times['car'] - 20, 0.95, axis=0))
+
+    def test_rank(self):
+        ranking = self.engine.rank('car')
+        self.assertEqual([score.site for score in ranking], ['c', 'a', 'b'])
+        self.assertEqual(ranking[0].mean_impact, 2.5)
+        self.assertEqual([score.site for score in self.engine.rank('car', by='median_impact', top=2)], ['c', 'b'])
+
+        with self.assertRaises(ValueError):
+            self.engine.rank('car', by='best')
+
+    def test_missing(self):
+        times = self.times['car'].copy()
+        times[0, 0] = np.nan
+        times[:, 2] = np.nan
+        engine = RelocationEngine({'car': times}, self.baseline)
+        metrics = engine.evaluate('car')
+
+        self.assertEqual(list(metrics['count']), [3, 4, 0])
+        self.assertAlmostEqual(metrics['mean_impact'][0], 10)
+        self.assertTrue(np.isnan(metrics['mean_impact'][2]))
+        self.assertEqual(engine.rank('car')[-1].site, 2)
+
+    def test_processes(self):
+        random = np.random.default_rng(0)
+        times = {'car': random.uniform(10, 60, (500, 40))}
+        baseline = {'car': random.uniform(10, 60, 500)}
+        engine = RelocationEngine(times, baseline, block=8)
+
+        serial, parallel = engine.evaluate('car'), engine.evaluate('car', processes=2)
+        for name in serial:
+            np.testing.assert_allclose(serial[name], parallel[name])
+
+    def test_from_locations(self):
+        matrix = TravelMatrix()
+        origins = [Origin(postcode='EC4M 8AD', matrix=matrix) for _ in range(4)]
+        candidates = [Destination(postcode='SW1A 1AA', matrix=matrix) for _ in range(3)]
+        current = Destination(postcode='E14 5AB', matrix=matrix)
+        for i, origin in enumerate(origins):
+            for mode in matrix.modes:
+                origin.set_times(mode, 20, current)
+                for j, candidate in enumerate(candidates):
+                    origin.set_times(mode, self.times['car'][i, j], candidate)
+            origin.current_destination = current
+
+        engine = RelocationEngine.from_locations(origins, candidates, modes=['car'])
+        self.assertEqual([score.site for score in engine.rank('car')], [candidates[2], candidates[0], candidates[1]])
+
+        with self.assertRaises(ValueError):
+            RelocationEngine.from_locations([Origin(postcode='EC4M 8AD', matrix=matrix)], candidates)
+        with self.assertRaises(ValueError):
+            RelocationEngine.from_locations([], candidates)
+
+    def test_shapes(self):
+        with self.assertRaises(ValueError):
+            RelocationEngine(self.times, {'car': np.zeros(3)})
+        with self.assertRaises(ValueError):
+            RelocationEngine(self.times, self.baseline, candidates=['a'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+import numpy as np
+from locations import Origin, Destination, TravelMatrix
+from relocation_analysis import RelocationEngine, ScenarioRunner, Scenario
+
+
+class TestScenarioRunner(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.times = {'car': rng.uniform(5, 60, (50, 8)), 'bike': rng.uniform(10, 90, (50, 8))}
+        self.current = rng.integers(0, 8, 50)
+        self.runner = ScenarioRunner(self.times, self.current, destinations=list('abcdefgh'))
+
+    def expected(self, mode, current, candidates=slice(None)):
+        times = self.times[mode]
+        engine = RelocationEngine({mode: times[:, candidates]}, {mode: times[np.arange(50), current]})
+        return engine.evaluate(mode)
+
+    def test_run(self):
+        scenarios = [Scenario('car'), Scenario('bike', modes='bike'),
+                     Scenario('moved', current=np.full(50, 3), candidates=[1, 4])]
+        results = sorted(self.runner.run(scenarios), key=lambda result: result.index)
+        self.assertEqual([result.scenario.name for result in results], ['car', 'bike', 'moved'])
+        self.assertEqual(results[2].sites, ['b', 'e'])
+        np.testing.assert_allclose(results[0].metrics['mean_impact'], self.expected('car', self.current)['mean_impact'])
+        np.testing.assert_allclose(results[1].metrics['tail_impact'],
+                                   self.expected('bike', self.current)['tail_impact'])
+        np.testing.assert_allclose(results[2].metrics['median_impact'],
+                                   self.expected('car', np.full(50, 3), [1, 4])['median_impact'])
+
+    def test_mode_mix(self):
+        modes = ['car', 'bike'] * 25
+        result, = self.runner.run([Scenario('mix', modes=modes)])
+        times = np.where(np.array(modes)[:, None] == 'car', self.times['car'], self.times['bike'])
+        impacts = times - times[np.arange(50), self.current][:, None]
+        np.testing.assert_allclose(result.metrics['mean_impact'], impacts.mean(axis=0))
+
+        with self.assertRaises(ValueError):
+            list(self.runner.run([Scenario('short', modes=['car'] * 10)]))
+
+    def test_processes(self):
+        rng = np.random.default_rng(1)
+        scenarios = [Scenario(i, current=rng.integers(0, 8, 50), modes=rng.choice(['car', 'bike'], 50).tolist(),
+                              candidates=rng.choice(8, 5, replace=False)) for i in range(10)]
+        serial = {result.index: result for result in self.runner.run(scenarios)}
+        parallel = {result.index: result for result in self.runner.run(iter(scenarios), processes=2)}
+        self.assertEqual(sorted(parallel), list(range(10)))
+        for index, result in parallel.items():
+            self.assertEqual(result.sites, serial[index].sites)
+            for name, values in result.metrics.items():
+                np.testing.assert_allclose(values, serial[index].metrics[name])
+
+    def test_from_locations(self):
+        matrix = TravelMatrix()
+        destinations = [Destination(postcode='D{}'.format(i), matrix=matrix) for i in range(3)]
+        origins = [Origin(postcode='O{}'.format(i), matrix=matrix) for i in range(4)]
+        for i, origin in enumerate(origins):
+            for j, destination in enumerate(destinations):
+                for mode in matrix.modes:
+                    origin.set_times(mode, 10. * (i + 1) + j, destination)
+            origin.current_destination = destinations[i % 3]
+
+        runner = ScenarioRunner.from_locations(origins, destinations, modes=['car'])
+        result, = runner.run([Scenario('car', modes='car')])
+        self.assertEqual(result.sites, destinations)
+        np.testing.assert_allclose(result.metrics['mean_impact'], [-0.75, 0.25, 1.25])
+
+        with self.assertRaises(ValueError):
+            ScenarioRunner.from_locations(origins, destinations[:2])
+        with self.assertRaises(ValueError):
+            ScenarioRunner.from_locations(origins + [Origin(postcode='O4', matrix=matrix)], destinations)
+        with self.assertRaises(ValueError):
+            ScenarioRunner.from_locations([], destinations)
+
+
+if __name__ == '__main__':
+    unittest.main()
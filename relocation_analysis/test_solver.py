@@ -0,0 +1,102 @@
+import itertools
+import unittest
+import numpy as np
+from locations import Origin, Destination, TravelMatrix
+from relocation_analysis import MultiSiteSolver
+
+
+def brute_force(times, baseline, k):
+    return min((times[:, list(sites)].min(axis=1) - baseline).mean()
+               for sites in itertools.combinations(range(times.shape[1]), k))
+
+
+class TestMultiSiteSolver(unittest.TestCase):
+
+    def setUp(self):
+        random = np.random.default_rng(1)
+        self.times = random.uniform(5, 90, (200, 15))
+        self.baseline = random.uniform(10, 60, 200)
+        self.solver = MultiSiteSolver(self.times, self.baseline)
+
+    def test_single_site(self):
+        solution = self.solver.solve(1)
+        best = int(np.argmin(self.times.mean(axis=0)))
+        self.assertEqual(solution.sites, [best])
+        self.assertAlmostEqual(solution.objective, (self.times[:, best] - self.baseline).mean())
+        self.assertTrue((solution.assignment == 0).all())
+
+    def test_optimal(self):
+        for k in (2, 3):
+            solution = self.solver.solve(k, restarts=3, seed=0)
+            self.assertEqual(len(solution.sites), k)
+            self.assertAlmostEqual(solution.objective, brute_force(self.times, self.baseline, k))
+
+    def test_swap_deltas(self):
+        sites = [0, 1, 2]
+        deltas = self.solver.swap_deltas(sites)
+        before = self.times[:, sites].min(axis=1).sum()
+        for r, a in itertools.product(range(3), range(3, 15)):
+            swapped = list(sites)
+            swapped[r] = a
+            self.assertAlmostEqual(deltas[r, a], self.times[:, swapped].min(axis=1).sum() - before)
+        self.assertTrue(np.isinf(deltas[:, sites]).all())
+
+    def test_local_search_improves(self):
+        progress = []
+        sites, iterations = self.solver.local_search([0, 1, 2], progress=lambda *args: progress.append(args))
+        self.assertLessEqual(self.solver.objective(sites), self.solver.objective([0, 1, 2]))
+        self.assertEqual(len(progress), iterations)
+        self.assertEqual([objective for _, objective in progress], sorted(objective for _, objective in progress)[::-1])
+
+    def test_time_budget(self):
+        sites, iterations = self.solver.local_search([0, 1, 2], deadline=0)
+        self.assertEqual((sites, iterations), ([0, 1, 2], 0))
+        self.assertEqual(len(self.solver.solve(3, time_budget=0).sites), 3)
+
+        sites = self.solver.greedy(5, deadline=0)
+        totals = self.times.sum(axis=0)
+        self.assertEqual(sites[0], self.solver.greedy(1)[0])
+        self.assertEqual(sites, list(np.argsort(totals)[:5]))
+
+    def test_processes(self):
+        progress = []
+        serial = self.solver.solve(3, restarts=4, seed=2)
+        parallel = self.solver.solve(3, restarts=4, seed=2, processes=2, progress=lambda *args: progress.append(args))
+        self.assertAlmostEqual(serial.objective, parallel.objective)
+        self.assertEqual([n for n, _ in progress[-4:]], [1, 2, 3, 4])
+
+    def test_missing(self):
+        times = self.times[:, :4].copy()
+        times[:, 0] = np.nan
+        solution = MultiSiteSolver(times, self.baseline, candidates='abcd').solve(2)
+        self.assertNotIn('a', solution.sites)
+        self.assertAlmostEqual(solution.objective, brute_force(times[:, 1:], self.baseline, 2))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            self.solver.solve(0)
+        with self.assertRaises(ValueError):
+            self.solver.solve(16)
+        with self.assertRaises(ValueError):
+            MultiSiteSolver(self.times, self.baseline[:3])
+
+    def test_from_locations(self):
+        matrix = TravelMatrix()
+        origins = [Origin(postcode='EC4M 8AD', matrix=matrix) for _ in range(4)]
+        candidates = [Destination(postcode='SW1A 1AA', matrix=matrix) for _ in range(3)]
+        current = Destination(postcode='E14 5AB', matrix=matrix)
+        times = [[10, 50, 50], [50, 10, 50], [50, 50, 10], [12, 50, 11]]
+        for origin, row in zip(origins, times):
+            for mode in matrix.modes:
+                origin.set_times(mode, 20, current)
+                for candidate, value in zip(candidates, row):
+                    origin.set_times(mode, value, candidate)
+            origin.current_destination = current
+
+        solution = MultiSiteSolver.from_locations(origins, candidates, mode='car').solve(2)
+        self.assertAlmostEqual(solution.objective, (10 + 10 + 50 + 11) / 4 - 20)
+        self.assertEqual(len(solution.sites), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
 import unittest
-from chunker import Chunker
+import numpy as np
+from chunker import Chunker, SequenceView
 
 
 class TestChunker(unittest.TestCase):
@@ -42,6 +43,48 @@ class TestChunker(unittest.TestCase):
             dict = {'test': 15, 'test2': 16}
             Chunker(dict)
 
+        with self.assertRaises(TypeError):
+            Chunker(15)
+
+        with self.assertRaises(ValueError):
+            list(Chunker([1, 2]).get_chunks(0))
+
+    def test_views(self):
+        lijst = [i for i in range(10)]
+        chunks = list(Chunker(lijst).get_chunks(4))
+
+        self.assertIsInstance(chunks[0], SequenceView)
+        self.assertEqual(chunks[2], [8, 9])
+        self.assertEqual(chunks[1][1:3], [5, 6])
+        self.assertEqual(chunks[1][-1], 7)
+        lijst[0] = 'changed'
+        self.assertEqual(chunks[0][0], 'changed')
+        with self.assertRaises(IndexError):
+            chunks[2][2]
+
+    def test_array(self):
+        array = np.arange(10)
+        chunks = list(Chunker(array).get_chunks(3))
+
+        self.assertEqual(len(chunks), 4)
+        self.assertTrue(all(np.shares_memory(chunk, array) for chunk in chunks))
+
+        buffer = bytearray(b'abcdefg')
+        chunks = list(Chunker(buffer).get_chunks(3))
+        self.assertIsInstance(chunks[0], memoryview)
+        self.assertEqual(bytes(chunks[2]), b'g')
+
+    def test_generator(self):
+        generator = (i for i in range(7))
+        chunks = list(Chunker(generator).get_chunks(3))
+        self.assertEqual(chunks, [[0, 1, 2], [3, 4, 5], [6]])
+
+    def test_ranges(self):
+        self.assertEqual(list(Chunker(range(7)).ranges(3)), [(0, 3), (3, 6), (6, 7)])
+        self.assertEqual(list(Chunker([]).ranges(3)), [])
+        with self.assertRaises(TypeError):
+            list(Chunker(i for i in range(7)).ranges(3))
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file